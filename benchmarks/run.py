@@ -0,0 +1,115 @@
+"""
+Run the benchmarks and compare them to the baseline
+
+From the root of the repository
+
+    python -m benchmarks.run --save          # Run and make the results the baseline
+    python -m benchmarks.run                 # Run and compare to the baseline
+    python -m benchmarks.run --scale 0.1 sum_loop decode
+
+Each workload is run a number of times and the fastest rate is shown.
+The plain python `REFERENCE` workload is run after each run of a workload,
+and the workload is compared by the median of its rate over the reference's rate,
+so a machine that is busier or slower than when the baseline was saved doesn't look like a regression.
+A workload regresses when its relative speed drops more than the tolerance below the baseline,
+which makes the exit status 1.
+No baseline is kept in the repository, save one with `--save` on the machine before making changes.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from benchmarks.workloads import REFERENCE, WORKLOADS
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def measure(workload, scale, repeat):
+    """
+    Run a workload, with the reference workload after each run of it, and get its speed
+    :param workload: The Workload
+    :param scale: How much bigger or smaller to make the workload
+    :param repeat: How many times to run it
+    :return: The best rate in units per second, and the median of its rate over the reference's rate
+    for each pair of runs, or None if the workload can't be run
+    """
+    trial = workload.setup(scale)
+    if trial is None:
+        return None
+    reference = REFERENCE.setup(scale)
+    best = 0
+    ratios = []
+    for _ in range(repeat):
+        count, seconds = trial()
+        rate = count / seconds
+        best = max(best, rate)
+        count, seconds = reference()
+        ratios.append(rate * seconds / count)
+    return best, statistics.median(ratios)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Find the workloads that are slower than the baseline
+    :param results: Workload name to relative speed
+    :param baseline: Workload name to relative speed
+    :param tolerance: How much slower (as a fraction) a rate can be
+    :return: A list of the names that regressed
+    """
+    return [name for name, rate in results.items()
+            if name in baseline and rate < baseline[name] * (1 - tolerance)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description="Benchmark the interpreter")
+    parser.add_argument('workloads', nargs='*', help="Workloads to run, defaults to all")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply the size of each workload")
+    parser.add_argument('--repeat', type=int, default=9, help="Times to run each workload")
+    parser.add_argument('--baseline', default=BASELINE, help="Baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="Save the results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Slowdown allowed before failing")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif not args.save and not args.json:
+        print("No baseline to compare to, save one with --save")
+
+    workloads = [w for w in WORKLOADS if not args.workloads or w.name in args.workloads]
+    results = {}
+    relative = {}
+    for workload in workloads:
+        measured = measure(workload, args.scale, args.repeat)
+        if measured is None:
+            if not args.json:
+                print("{:<24} skipped".format(workload.name))
+            continue
+        rate, relative[workload.name] = measured
+        results[workload.name] = rate
+        if not args.json:
+            old = baseline.get(workload.name)
+            change = '' if not old else '{:+.1%}'.format(relative[workload.name] / old - 1)
+            print("{:<24} {:>12,.0f} {}/s {:>8}".format(workload.name, rate, workload.unit, change))
+
+    regressions = compare(relative, baseline, args.tolerance)
+    if args.json:
+        print(json.dumps({'results': results, 'relative': relative, 'regressions': regressions}))
+    elif regressions:
+        print("Slower than the baseline: {}".format(', '.join(regressions)))
+
+    if args.save:
+        baseline.update((name, round(speed, 6)) for name, speed in relative.items())
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Representative workloads for measuring the speed of the interpreter
+
+Each workload is set up once and returns a trial,
+a function that runs the workload and returns how many things it did
+(instructions run or lines decoded) and how many seconds it took.
+Trials check their results, so a benchmark of a broken interpreter fails
+instead of reporting a misleading speed.
+
+`REFERENCE` is plain python that doesn't use the interpreter,
+run alongside the workloads to tell how fast the machine is right now.
+"""
+
+import collections
+import time
+import iarm.arm
+import iarm.lanes
+
+Workload = collections.namedtuple('Workload', 'name unit setup')
+
+WORKLOADS = []
+MEMORY_SIZE = 8 * 1024
+
+
+VARIANTS = {
+    'compiled': {'compile_blocks': True},
+    'lazy': {'lazy_flags': True},
+    'dead_flags': {'eliminate_dead_flags': True},
+}
+
+
+def workload(unit, variants=()):
+    """
+    Register a workload setup function
+    :param unit: What the workload counts, like 'instructions'
+    :param variants: Also register versions that run the interpreter with each of these VARIANTS
+    :return:
+    """
+    def register(setup):
+        WORKLOADS.append(Workload(setup.__name__, unit, lambda scale: setup(scale, {})))
+        for variant in variants:
+            WORKLOADS.append(Workload('{}[{}]'.format(setup.__name__, variant), unit,
+                                      lambda scale, options=VARIANTS[variant]: setup(scale, options)))
+        return setup
+    return register
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def reference_loop(scale):
+    """
+    Call small closures that read and write a list, like the interpreter's run loop does
+    """
+    n = int(200000 * scale)
+    regs = [0] * 16
+
+    def add():
+        regs[0] = (regs[0] + regs[1]) & 0xFFFFFFFF
+
+    def subtract():
+        regs[1] -= 1
+        return 0 if regs[1] else None  # Branch back to the start until the count runs out
+
+    program = [add, subtract]
+
+    def trial():
+        regs[0], regs[1] = 0, n
+        i = 0
+        count = 0
+        begin = time.perf_counter()
+        while i < 2:
+            target = program[i]()
+            i = i + 1 if target is None else target
+            count += 1
+        seconds = time.perf_counter() - begin
+        check(regs[0] == (n * (n + 1) // 2) & 0xFFFFFFFF, "Wrong sum")
+        return count, seconds
+    return trial
+
+
+REFERENCE = Workload('reference', 'calls', reference_loop)
+
+
+def execute(source, verify, options):
+    """
+    Make a trial that runs source from the start each time
+    :param source: The program
+    :param verify: Called with the interpreter after each run to check the results
+    :param options: Keyword arguments for the interpreter
+    :return: The trial
+    """
+    interpreter = iarm.arm.Arm(MEMORY_SIZE, False, **options)
+    interpreter.evaluate(source)
+    start = interpreter.snapshot()
+
+    def trial():
+        interpreter.restore(start)
+        begin = time.perf_counter()
+        steps = interpreter.run()
+        seconds = time.perf_counter() - begin
+        verify(interpreter)
+        return steps, seconds
+    return trial
+
+
+@workload('instructions', variants=('compiled', 'lazy', 'dead_flags'))
+def sum_loop(scale, options):
+    n = int(20000 * scale)
+    source = """
+ MOVS R0, #0
+ LDR R1, ={}
+loop ADDS R0, R0, R1
+ SUBS R1, R1, #1
+ BNE loop
+""".format(n)
+
+    def verify(interpreter):
+        check(interpreter.register['R0'] == (n * (n + 1) // 2) & 0xFFFFFFFF, "Wrong sum")
+    return execute(source, verify, options)
+
+
+@workload('instructions', variants=('compiled',))
+def memcpy(scale, options):
+    words = 200
+    repeats = max(int(20 * scale), 1)
+    source = """
+ MOVS R0, #0
+ MOVS R2, #0
+ MOVS R3, #1
+fill STR R3, [R0, R2]
+ ADDS R3, R3, #1
+ ADDS R2, R2, #4
+ CMP R3, #{words}
+ BLS fill
+ MOVS R1, #1
+ LSLS R1, R1, #12
+ MOVS R6, #{repeats}
+again MOVS R2, #0
+ MOVS R3, #{words}
+copy LDR R4, [R0, R2]
+ STR R4, [R1, R2]
+ ADDS R2, R2, #4
+ SUBS R3, R3, #1
+ BNE copy
+ SUBS R6, R6, #1
+ BNE again
+""".format(words=words, repeats=repeats)
+
+    def verify(interpreter):
+        memory = interpreter.memory
+        check(all(memory.read_word(4096 + 4 * i) == i + 1 for i in range(words)), "Memory not copied")
+    return execute(source, verify, options)
+
+
+@workload('instructions', variants=('compiled', 'lazy', 'dead_flags'))
+def bubble_sort(scale, options):
+    n = max(int(60 * scale ** 0.5), 2)
+    source = """
+ MOVS R0, #0
+ MOVS R1, #{n}
+ MOVS R2, #0
+fill STR R1, [R0, R2]
+ ADDS R2, R2, #4
+ SUBS R1, R1, #1
+ BNE fill
+ MOVS R6, #{passes}
+outer MOVS R2, #0
+ MOVS R5, #{passes}
+inner LDR R3, [R0, R2]
+ ADDS R4, R2, #4
+ LDR R1, [R0, R4]
+ CMP R3, R1
+ BLE next
+ STR R1, [R0, R2]
+ STR R3, [R0, R4]
+next MOVS R2, R4
+ SUBS R5, R5, #1
+ BNE inner
+ SUBS R6, R6, #1
+ BNE outer
+""".format(n=n, passes=n - 1)
+
+    def verify(interpreter):
+        values = [interpreter.memory.read_word(4 * i) for i in range(n)]
+        check(values == list(range(1, n + 1)), "Not sorted")
+    return execute(source, verify, options)
+
+
+@workload('instructions', variants=('compiled',))
+def recursion(scale, options):
+    depth = 100
+    repeats = max(int(10 * scale), 1)
+    source = """
+ MOVS R5, #{repeats}
+ MOVS R1, #0
+again MOVS R0, #{depth}
+ BL sum
+ SUBS R5, R5, #1
+ BNE again
+ B done
+sum CMP R0, #0
+ BEQ return
+ PUSH {{R0, LR}}
+ SUBS R0, R0, #1
+ BL sum
+ POP {{R0, R2}}
+ ADDS R1, R1, R0
+ BX R2
+return BX LR
+done MOVS R3, #1
+""".format(depth=depth, repeats=repeats)
+
+    def verify(interpreter):
+        check(interpreter.register['R1'] == repeats * depth * (depth + 1) // 2, "Wrong sum")
+        check(interpreter.register['SP'] == MEMORY_SIZE, "Stack not balanced")
+    return execute(source, verify, options)
+
+
+@workload('instructions')
+def sum_lanes(scale, options):
+    if iarm.lanes.numpy is None:
+        return None  # Lanes need numpy
+
+    lanes = 1000
+    n = int(200 * scale)
+    source = """
+ MOVS R0, #0
+loop ADDS R0, R0, R1
+ SUBS R1, R1, #1
+ BNE loop
+"""
+
+    def trial():
+        engine = iarm.lanes.Lanes(source, lanes, MEMORY_SIZE)
+        counts = [n + lane % 3 for lane in range(lanes)]  # Lanes finish a few iterations apart
+        engine.set_register('R1', counts)
+        begin = time.perf_counter()
+        engine.run()
+        seconds = time.perf_counter() - begin
+        check(list(engine.register('R0')) == [count * (count + 1) // 2 for count in counts], "Wrong sum")
+        return int(engine.steps.sum()), seconds
+    return trial
+
+
+def large_program(lines):
+    """
+    Generate a program with many labels, equates, and branches
+    :param lines: About how many lines of source
+    :return: The source
+    """
+    source = []
+    for i in range(lines // 4):
+        # Equates are replaced as text, so no name can be the start of another
+        source.append("VALUE{:06} EQU #{}".format(i, i % 256))
+        source.append("label{} MOVS R{}, VALUE{:06}".format(i, i % 8, i))
+        source.append(" ADDS R{0}, R{0}, R{1}".format(i % 8, (i + 1) % 8))
+        source.append(" BNE label{}  ; Comments are parsed too".format(i // 2))
+    return '\n'.join(source)
+
+
+@workload('lines')
+def decode(scale, options):
+    source = large_program(int(2000 * scale))
+    lines = source.count('\n') + 1
+
+    def trial():
+        interpreter = iarm.arm.Arm(MEMORY_SIZE, False)  # A new interpreter has nothing cached
+        begin = time.perf_counter()
+        interpreter.evaluate(source)
+        seconds = time.perf_counter() - begin
+        check(len(interpreter.program) == lines * 3 // 4, "Lines missing from the program")
+        return lines, seconds
+    return trial
+
+
+@workload('lines')
+def decode_cached(scale, options):
+    source = large_program(int(2000 * scale))
+    lines = source.count('\n') + 1
+    interpreter = iarm.arm.Arm(MEMORY_SIZE, False)
+    interpreter.evaluate(source)
+    start = interpreter.snapshot()
+
+    def trial():
+        interpreter.restore(start)  # Evaluating the same cell again
+        begin = time.perf_counter()
+        interpreter.evaluate(source)
+        seconds = time.perf_counter() - begin
+        check(len(interpreter.program) == lines * 3 // 2, "Lines missing from the program")
+        return lines, seconds
+    return trial
+
+
+@workload('cells')
+def kernel(scale, options):
+    try:
+        from iarm_kernel.iarmkernel import ArmKernel
+    except ImportError:
+        return None  # The kernel needs ipykernel
+
+    cells = max(int(200 * scale), 1)
+    kernel = ArmKernel()
+    kernel.send_response = lambda *args, **kwargs: None  # Nothing is listening
+    code = " MOVS R0, #1\n ADDS R1, R1, R0\n%run\n%reg R1"
+
+    def trial():
+        begin = time.perf_counter()
+        for _ in range(cells):
+            reply = kernel.do_execute(code, False)
+            check(reply['status'] == 'ok', "Cell failed")
+        seconds = time.perf_counter() - begin
+        return cells, seconds
+    return trial
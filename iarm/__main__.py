@@ -0,0 +1,146 @@
+"""
+Command line interface to the interpreter
+
+    python -m iarm run program.s --steps 1000 --dump regs,mem:0-64 --json
+    python -m iarm batch program.s other.s --timeout 5
+    python -m iarm assemble program.s -o program.bin
+
+Modules are only imported once they are needed, to keep start up fast
+for calling from shell pipelines.
+"""
+
+import sys
+
+DEFAULT_DUMP = 'regs'
+
+
+def parse_dump(dump):
+    """
+    Parse what to print out after running
+
+    The dump is a comma separated list of
+    `regs` for all registers, a register name like `R0` or `SP`,
+    `mem:n` for the byte at n, or `mem:n-k` for the bytes from n to k (inclusive, like `%mem`).
+    :param dump: The dump string, like 'regs,mem:0-64'
+    :return: A list of register names or None for all registers, and a list of memory addresses
+    """
+    registers = []
+    addresses = []
+    for item in dump.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item.lower().startswith('mem:'):
+            first, _, last = item[len('mem:'):].partition('-')
+            first = int(first, 0)
+            last = int(last, 0) if last else first
+            addresses.extend(range(first, last + 1))
+        elif item.lower() == 'regs':
+            registers = None
+        elif registers is not None:
+            registers.append(item)
+    return registers, addresses
+
+
+def run(args):
+    """
+    Evaluate and run a source file, and print the registers and memory asked for
+    :param args: The parsed arguments
+    :return: The exit status
+    """
+    import warnings
+    import iarm.arm
+
+    if args.binary:
+        source = None
+    elif args.file == '-':
+        source = sys.stdin.read()
+    else:
+        with open(args.file) as f:
+            source = f.read()
+
+    registers, addresses = parse_dump(args.dump)
+    interpreter = iarm.arm.Arm(args.memory_size, False, compile_blocks=args.compile_blocks,
+                               memory_file=args.memory_file)
+    error = None
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        try:
+            if args.binary:
+                import iarm.loader
+                iarm.loader.load_file(interpreter, args.file)
+            else:
+                interpreter.evaluate(source, '<stdin>' if args.file == '-' else args.file)
+            interpreter.run(args.steps)
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, ' '.join(str(arg) for arg in e.args))
+
+    if registers is None:
+        registers = interpreter.register.keys()
+    try:
+        register_values = {name: interpreter.register[name] for name in registers}
+        memory_values = {address: interpreter.memory[address] for address in addresses}
+    except Exception as e:
+        print("Can't dump {}".format(e), file=sys.stderr)
+        return 2
+
+    if args.json:
+        import json
+        print(json.dumps({
+            'registers': register_values,
+            'memory': memory_values,
+            'steps': interpreter.steps_run,
+            'warnings': [str(w.message) for w in caught],
+            'error': error,
+        }))
+    else:
+        for w in caught:
+            print('Warning: {}'.format(w.message), file=sys.stderr)
+        if error:
+            print(error, file=sys.stderr)
+        lines = ['{}: {}'.format(name, value) for name, value in register_values.items()]
+        lines += ['{}: {}'.format(address, value) for address, value in memory_values.items()]
+        if lines:
+            print('\n'.join(lines))
+    return 1 if error else 0
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m iarm', description="Interpreted ARM")
+    commands = parser.add_subparsers(dest='command')
+
+    run_parser = commands.add_parser('run', help="Run a source file")
+    run_parser.add_argument('file', help="The source file, or - to read from stdin")
+    run_parser.add_argument('--steps', type=int, help="Most instructions to run, defaults to running to the end")
+    run_parser.add_argument('--dump', default=DEFAULT_DUMP,
+                            help="What to print, a comma separated list of regs, register names, "
+                                 "and mem:n-k byte ranges (default: {})".format(DEFAULT_DUMP))
+    run_parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    run_parser.add_argument('--memory-size', type=int, default=1024, help="Bytes of memory")
+    run_parser.add_argument('--compile-blocks', action='store_true', help="Compile basic blocks")
+    run_parser.add_argument('--memory-file', help="A file to map as memory, instead of --memory-size")
+    run_parser.add_argument('--binary', action='store_true',
+                            help="The file is a Thumb binary (with a .map next to it), see iarm.loader")
+
+    commands.add_parser('batch', add_help=False, help="Run many source files in parallel, see iarm.batch")
+    commands.add_parser('assemble', add_help=False, help="Assemble a source file to a binary, see iarm.assembler")
+
+    args, rest = parser.parse_known_args(argv)
+    if args.command == 'batch':
+        import iarm.batch
+        return iarm.batch.main(rest)
+    if args.command == 'assemble':
+        import iarm.assembler
+        return iarm.assembler.main(rest)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    if rest:
+        parser.error("unrecognized arguments: {}".format(' '.join(rest)))
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
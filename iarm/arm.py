@@ -1,25 +1,78 @@
 #!/usr/bin/env python3
 
+import collections
+import functools
+import re
+import iarm.cpu
 import iarm.exceptions
 import iarm.arm_instructions as instructions
+import iarm.compiler
+import iarm.dead_flags
+import iarm.history
+import iarm.tracer
+import iarm.watch
 import warnings
 
 
+Snapshot = collections.namedtuple('Snapshot', 'registers memory program source labels equates space_pointer title')
+
+
 class Arm(instructions.DataMovement, instructions.Arithmetic,
           instructions.Logic, instructions.Shift, instructions.Memory,
           instructions.ConditionalBranch, instructions.UnconditionalBranch,
           instructions.Misc, instructions.Directives):
+    PRESERVED_REGISTERS = ('PC', 'SP')
+    DECODE_CACHE_SIZE = 4096
+    LABEL_VALUE_OPS = ('ADR', 'LDR')  # Instructions whose decoding uses the value of a label, not just that it exists
+    WORD = re.compile(r'[A-Za-z_.]\w*')  # Anything in the parameters that could be a label
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, compile_blocks=False, lazy_flags=False, eliminate_dead_flags=False, **kwargs):
+        """
+        :param compile_blocks: Should `run` compile basic blocks into python functions instead of
+        calling each instruction in turn
+        :param lazy_flags: Should the NZCV flags only be worked out when they are read,
+        instead of by every instruction that sets them
+        :param eliminate_dead_flags: Should instructions not set flags that are always set again before being read
+        """
+        if lazy_flags:
+            self.REGISTER_FILE = instructions.LazyApsrRegisterFile
         super().__init__(32, 16, 8, *args, **kwargs)
-        self.register.link('PC', 'R15')
-        self.register.link('LR', 'R14')
-        self.register.link('SP', 'R13')
+        self.compile_blocks = compile_blocks
+        self.eliminate_dead_flags = eliminate_dead_flags
+        self.flag_variants = {}  # Instructions and setters to their variants, see iarm.dead_flags
+        self.compiler = iarm.compiler.BlockCompiler(self)
+        # The program without the variants, and its blocks, for runs that can stop part way through
+        self.exact_program = None
+        self.exact_compiler = iarm.compiler.BlockCompiler(self)
+        self.decode_cache = iarm.cpu.DecodeCache(self.DECODE_CACHE_SIZE)
+        self.steps_run = 0  # How many instructions the last call to `run` ran
+        self.source = iarm.cpu.SourceMap()  # Where each instruction in the program came from
+        self.evaluations = 0  # How many times code has been evaluated, to name code without an origin
+        self.profiler = None  # An iarm.profiler.Profiler to profile `run`
+        self.tracer = None  # An iarm.tracer.Tracer to record the steps of `run`
+        self.history = None  # An iarm.history.History to record `run` so it can be stepped back
+        self.breakpoints = {}  # Program index to the instruction its breakpoint replaced
+        self._resume_breakpoint = None  # The index of the breakpoint the last run stopped at
+        self.watcher = iarm.watch.Watcher(self)
+        self.register.alias('PC', 'R15')
+        self.register.alias('LR', 'R14')
+        self.register.alias('SP', 'R13')
         self.register['PC'] = 1  # PC points to the next instruction in THUMB mode
         # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0473f/Babbdajb.html
+        self.register['SP'] = self._memory_size  # Full descending stack starting at the top of memory
 
-    def evaluate(self, code):
+    def evaluate(self, code, origin=None):
+        """
+        Decode code and add it to the end of the program, running it unless execution is postponed
+        :param code: The source code
+        :param origin: Where the code came from, like a file name, used to point errors back to the source
+        :return:
+        """
         parsed = self.parse_lines(code)
+        source_lines = code.split('\n')  # Lines up with parsed
+        self.evaluations += 1
+        if origin is None:
+            origin = '<evaluate {}>'.format(self.evaluations)
 
         # Find all labels (don't need to have them point to anything yet
         temp_labels = {line[0]: None for line in parsed if line[0]}
@@ -27,10 +80,12 @@ class Arm(instructions.DataMovement, instructions.Arithmetic,
 
         # Validate the code and get back a function to execute that instruction
         program = []
+        source = iarm.cpu.SourceMap()
         labels = {}
+        label_values = []  # (line number, line, label) for instructions that use the value of a label
         line_counter = 0
         for line in parsed:
-            line_counter += 1  # TODO this doesnt seem to include lines with new lines
+            line_counter += 1
             if not any(line):
                 continue  # We have a blank line
             label, op, params = line
@@ -62,41 +117,597 @@ class Arm(instructions.DataMovement, instructions.Arithmetic,
             # Next,
             # If the op lookup fails, it was a bad instruction
             if op:
-                try:
-                    func = self.ops[op]
-                except KeyError as e:
+                if op not in self.ops:
                     [self.labels.pop(i, None) for i in temp_labels]  # Clean up the added labels
                     raise iarm.exceptions.ValidationError("Line {}; Error on '{}': Instruction '{}' does not exist".format(line_counter, label + ' ' + op + ' ' + params, op))
 
                 # Run the instruction, if it raised an error, roll back the labels
                 try:
-                    instruction = func(params)
+                    instruction = self.decode(op, params)
                 except Exception as e:
                     # TODO We may have a key error, or something other than an IarmError
                     [self.labels.pop(i, None) for i in temp_labels]  # Clean up the added labels
                     e.args = ("Line {}; Error on '{}': ".format(line_counter, label + ' ' + op + ' ' + params),) + e.args
                     raise
                 else:
-                    program.append(instruction)  # It validated, add it to the temp instruction list
+                    # It validated, add it to the temp instruction list
+                    program.append(self.bind_pc(instruction, len(self.program) + len(program)))
+                    source.append(origin, line_counter, source_lines[line_counter - 1].strip())
+                    if op in self.LABEL_VALUE_OPS and instruction.form == 'rl':
+                        label_values.append((line_counter, label + ' ' + op + ' ' + params, instruction.operands[1]))
+
+        # Labels used before they are defined are looked up when run, so they must have been given a value by now
+        for line_number, text, name in label_values:
+            if labels.get(name, self.labels.get(name, KeyError)) is None:
+                [self.labels.pop(i, None) for i in temp_labels]  # Clean up the added labels
+                raise iarm.exceptions.IarmError("Line {}; Error on '{}': ".format(line_number, text),
+                                                "Label {} has no value".format(name))
 
         # Code block was successfully validated, update the main program
         self.program += program
+        self.source.extend(source)
         self.labels.update(labels)
+        self.compiler.clear()  # Blocks may now continue into the new code
+        self.find_dead_flags()  # The new code can read flags the old code set
 
         if not self._postpone_execution:
             self.run()
 
-    def run(self, steps=float('inf')):
+    def decode(self, op, params):
         """
-        Run to the current end of the program or a number of steps
+        Decode an instruction, reusing an earlier decoding of the same line if possible
+
+        Decoded instructions only depend on their text, the equates, and the labels they name,
+        so those make up the key in the decode cache.
+        :param op: The instruction, like 'ADDS'
+        :param params: The parameters, like 'R0, R1, #1'
+        :return: The decoded instruction
+        """
+        params = params.strip()
+        labels = self.labels
+        if op in self.LABEL_VALUE_OPS:
+            label_state = tuple(labels.get(word, KeyError) for word in self.WORD.findall(params))
+        else:
+            # Only used to warn about labels that don't exist yet
+            label_state = tuple(word in labels for word in self.WORD.findall(params))
+        key = (op, params, tuple(self.equates.items()), label_state)
+
+        entry = self.decode_cache.get(key)
+        if entry is None:
+            # Keep any warnings so they can be given again when the cached instruction is used
+            with warnings.catch_warnings(record=True) as caught:
+                instruction = self.ops[op](params)
+            entry = (instruction, [(w.message, w.category, w.filename, w.lineno) for w in caught])
+            self.decode_cache.put(key, entry)
+
+        instruction, decode_warnings = entry
+        for message, category, filename, lineno in decode_warnings:
+            warnings.warn_explicit(message, category, filename, lineno)
+        return instruction
+
+    def bind_pc(self, instruction, address):
+        """
+        Give an instruction that uses the PC the value of the PC at its address
+
+        The run loop keeps the PC in a local variable,
+        so the PC register is only set before instructions that read or write it.
+        If the instruction writes to the PC, the new PC is returned like a branch.
+        :param instruction: The decoded instruction
+        :param address: Where the instruction is in the program
+        :return: The instruction to put in the program
+        """
+        if not instruction.uses_pc:
+            return instruction
+
+        regs = self.register.data
+        pc = self.register.index('PC')
+        next_pc = address + 1  # PC points to the next instruction
+
+        @functools.wraps(instruction)
+        def uses_pc_func():
+            regs[pc] = next_pc
+            target = instruction()
+            if target is None and regs[pc] != next_pc:
+                return regs[pc]
+            return target
+
+        return uses_pc_func
+
+    def find_dead_flags(self):
+        """
+        Swap in variants of the instructions that don't set flags that are never read,
+        or put the original instructions back if `eliminate_dead_flags` is off
+
+        Which flags are read depends on the whole program, its labels, and its breakpoints,
+        so this is done again whenever they change.
+        The same variants are used each time, so the program only changes when the flags read do.
+        The original instructions are kept as `exact_program`, for `run` to use when it
+        can stop part way through the program.
         :return:
         """
-        while len(self.program) > (self.register['PC'] - 1):
-            steps -= 1
-            if steps < 0:
+        program = [getattr(instruction, 'original', instruction) for instruction in self.program]
+        self.exact_program = None
+        self.exact_compiler.clear()
+        if self.eliminate_dead_flags:
+            self.exact_program = program
+            program = iarm.dead_flags.eliminate(program, self.labels, self.register, self.flag_variants)
+        if program != self.program:
+            self.program[:] = program
+            self.compiler.clear()
+
+    def run(self, steps=None):
+        """
+        Run to the current end of the program or a number of steps
+
+        The PC is kept in a local variable and written back to the PC register
+        when the loop stops, either from running out of steps or program, or an exception.
+        Instructions return the new PC if they branch, and None otherwise.
+        The number of instructions run is kept in `steps_run`, even if an exception stops the loop.
+        A HardFault is given the source line of the instruction that raised it.
+        Instructions that leave out dead flags are only run when the run can't stop part way through,
+        so stepping, stepping back, watching, and tracing see all the flags.
+        :param steps: How many instructions to run, None runs until the end of the program
+        :return: The number of instructions run
+        """
+        if steps is None or steps == float('inf'):
+            steps = -1  # Counting down will never hit zero
+        else:
+            steps = max(int(steps), 0)
+
+        if self.exact_program is not None and (steps >= 0 or self.history is not None or self.watcher or
+                                               self.tracer is not None):
+            program, compiler = self.program, self.compiler
+            self.program, self.compiler = self.exact_program, self.exact_compiler
+            try:
+                return self.run_steps(steps)
+            finally:
+                self.program, self.compiler = program, compiler
+        return self.run_steps(steps)
+
+    def run_steps(self, steps):
+        """
+        Run steps instructions, stepping over the breakpoint the last run stopped at
+        :param steps: How many instructions can be run, negative for no limit
+        :return: The number of instructions run
+        """
+        self.steps_run = 0
+        resume, self._resume_breakpoint = self._resume_breakpoint, None
+        try:
+            if steps and resume == self.register['PC'] - 1:
+                steps = self.step_over_breakpoint(steps)
+            return self.run_loop(steps, self.compile_blocks)
+        except iarm.exceptions.BreakpointHit as e:
+            # The breakpoint stops the program before the instruction, so it isn't a step
+            self.steps_run -= 1
+            self._resume_breakpoint = self.register['PC'] - 1
+            if self.history is not None and self.tracer is None and self.profiler is None:
+                self.history.back()
+            e.args = ("Breakpoint at {}, line {}: '{}'".format(*self.source[self.register['PC'] - 1]),)
+            raise
+        except iarm.exceptions.HardFault as e:
+            # The PC has been written back, pointing after the instruction that raised
+            e.args = (self.locate(self.register['PC'] - 1),) + e.args
+            raise
+
+    def run_loop(self, steps, compile_blocks):
+        """
+        Pick the loop to run the program with
+        :param steps: How many instructions can be run, negative for no limit
+        :param compile_blocks: Can blocks be compiled
+        :return: The number of instructions run
+        """
+        # Chosen here so the loops below don't check for the tracer, profiler, history, or watchpoints
+        if self.watcher and (self.tracer is not None or self.profiler is not None):
+            raise iarm.exceptions.ValidationError("Watchpoints can't be checked while tracing or profiling, "
+                                                  "remove them or turn off the tracer and profiler")
+        if self.history is not None and (self.tracer is not None or self.profiler is not None):
+            self.history.clear()  # The steps run by the other loops can't be stepped back
+        if self.tracer is not None:
+            return self.run_traced(steps)
+        if self.profiler is not None:
+            return self.run_profiled(steps)
+        if self.history is not None or self.watcher:
+            return self.run_recorded(steps)
+        if compile_blocks:
+            # Run whole blocks while they fit in steps, then finish one instruction at a time
+            steps = self.run_blocks(steps)
+        return self.run_instructions(steps)
+
+    def step_over_breakpoint(self, steps):
+        """
+        Run the instruction a breakpoint replaced, when the last run stopped at it
+
+        Running from a breakpoint (or a BKPT instruction) that was hit carries on past it,
+        instead of stopping again.
+        Reaching one any other way, like running out of steps just before it, still stops there.
+        :param steps: How many instructions can be run, negative for no limit
+        :return: How many steps are left
+        """
+        index = self.register['PC'] - 1
+        if index not in self.breakpoints and not (0 <= index < len(self.program) and
+                                                  self.program[index].op == 'BKPT'):
+            return steps
+        breakpoint = self.program[index]
+        original = self.breakpoints.get(index)
+        if original is None or original.op == 'BKPT':
+            def NOP_func():
+                return
+            original = self.decoded(NOP_func, '')
+        self.program[index] = original
+        try:
+            self.run_loop(1, False)  # Blocks compiled with the breakpoint in them can't be used
+        finally:
+            self.program[index] = breakpoint
+        return steps - 1 if steps > 0 else steps
+
+    def run_instructions(self, steps):
+        """
+        Run the program one instruction at a time
+        :param steps: How many instructions can be run, negative for no limit
+        :return: The number of instructions run
+        """
+        program = self.program
+        end = len(program)
+        regs = self.register.data
+        pc = self.register.index('PC')
+        start = steps
+        i = regs[pc] - 1
+        try:
+            while i < end and steps:
+                steps -= 1
+                target = program[i]()
+                i = i + 1 if target is None else target
+        finally:
+            regs[pc] = (i + 1) & self.register.mask
+            self.steps_run += start - steps
+        return self.steps_run
+
+    def run_profiled(self, steps):
+        """
+        Run like `run`, timing and counting each instruction in the profiler
+
+        Blocks are never compiled while profiling, so each instruction can be timed.
+        :param steps: How many instructions can be run, negative for no limit
+        :return: The number of instructions run
+        """
+        profiler = self.profiler
+        program = self.program
+        end = len(program)
+        profiler.grow(end)
+        counts = profiler.counts
+        times = profiler.times
+        clock = profiler.clock
+        regs = self.register.data
+        pc = self.register.index('PC')
+        start = steps
+        i = regs[pc] - 1
+        try:
+            while i < end and steps:
+                steps -= 1
+                counts[i] += 1
+                began = clock()
+                try:
+                    target = program[i]()
+                finally:
+                    times[i] += clock() - began
+                i = i + 1 if target is None else target
+        finally:
+            regs[pc] = (i + 1) & self.register.mask
+            self.steps_run += start - steps
+        return self.steps_run
+
+    def run_traced(self, steps):
+        """
+        Run like `run`, recording the index of each step in the tracer
+
+        The indices are written straight into the tracer's buffer,
+        a segment at a time so the loop doesn't check for the end of the segment,
+        and the values read from memory are kept by shadowing its read methods.
+        Blocks are never compiled while tracing.
+        :param steps: How many instructions can be run, negative for no limit
+        :return: The number of instructions run
+        """
+        tracer = self.tracer
+        tracer.start()
+        stop_watching = tracer.watch_loads(self.memory)
+        program = self.program
+        end = len(program)
+        indices = tracer.indices
+        regs = self.register.data
+        pc = self.register.index('PC')
+        start = steps
+        raised = True
+        i = regs[pc] - 1
+        try:
+            while i < end and steps:
+                position = tracer.position
+                stop = tracer.boundary
+                if 0 < steps < stop - position:
+                    stop = position + steps
+                p = position
+                try:
+                    while i < end and p < stop:
+                        target = program[i]()
+                        indices[p] = i
+                        p += 1
+                        i = i + 1 if target is None else target
+                except BaseException:
+                    steps -= p - position + 1  # The instruction that raised ran, but wasn't recorded
+                    tracer.advance(p - position)
+                    raise
+                steps -= p - position
+                tracer.advance(p - position)
+            raised = False
+        finally:
+            stop_watching()
+            regs[pc] = (i + 1) & self.register.mask
+            tracer.stop(raised)
+            self.steps_run += start - steps
+        return self.steps_run
+
+    def run_recorded(self, steps):
+        """
+        Run like `run`, saving what each step overwrites in the history so it can be undone
+
+        Memory is journaled by shadowing its write methods while the loop runs.
+        A step that raises is still recorded, so what it did before raising can be undone.
+        This loop also checks the watchpoints, stopping after a step that accessed what they watch.
+        Blocks are never compiled while recording.
+        :param steps: How many instructions can be run, negative for no limit
+        :return: The number of instructions run
+        """
+        history = self.history
+        if history is None:
+            history = iarm.history.History(self, limit=0)  # Only recording for the watchpoints
+        watcher = self.watcher
+        watched = watcher.registers
+        hits = watcher.hits
+        del hits[:]
+        program = self.program
+        end = len(program)
+        writes = iarm.history.decode_writes(self.register, program)
+        pcs, registers, values, flags = history.pcs, history.registers, history.values, history.flags
+        extra = history.extra
+        stores = history.stores
+        pending = []
+        remove_journal = history.journal(self.memory, pending)
+        register = self.register
+        regs = register.data
+        pc = register.index('PC')
+        step = history.step
+        mark = step if step % history.interval == 0 else step - step % history.interval + history.interval
+        start = steps
+        i = regs[pc] - 1
+        try:
+            while i < end and steps:
+                steps -= 1
+                if step == mark:
+                    mark = history.checkpoint(step, i + 1)
+                write = writes[i]
+                pcs.append(i + 1)
+                registers.append(write)
+                values.append(regs[write] if write >= 0 else 0)
+                flags.append((register.n << 3) | (register.z << 2) | (register.c << 1) | register.v)
+                if write == -2:
+                    extra[step] = regs[:]
+                step += 1
+                target = program[i]()
+                if pending:
+                    stores[step - 1] = pending[:]
+                    del pending[:]
+                i = i + 1 if target is None else target
+                if write in watched:
+                    watcher.written(write)
+                elif write == -2 and watched:
+                    watcher.compare(extra[step - 1])
+                if hits:
+                    raise iarm.exceptions.WatchpointHit(watcher.report())
+        finally:
+            if pending:
+                stores[step - 1] = pending[:]
+            remove_journal()
+            history.step = step
+            regs[pc] = (i + 1) & self.register.mask
+            self.steps_run += start - steps
+        return self.steps_run
+
+    def run_blocks(self, steps):
+        """
+        Run the program a compiled basic block at a time
+
+        Stops at the end of the program, or before a block that would run more than steps instructions.
+        If a block raises an exception, it sets the PC to point after the instruction that raised,
+        and only the instructions up to and including that one are counted in `steps_run`.
+        :param steps: How many instructions can be run, negative for no limit
+        :return: How many steps are left
+        """
+        end = len(self.program)
+        regs = self.register.data
+        pc = self.register.index('PC')
+        get_block = self.compiler.get
+        loop = steps < 0  # Looping blocks can't stop part way through
+        i = regs[pc] - 1
+        while 0 <= i < end:
+            block = get_block(i, loop)
+            if 0 <= steps < block.size:
                 break
-            self.program[self.register['PC'] - 1]()
-            self.register['PC'] += 1
+            steps -= block.size
+            try:
+                i = block()
+            except BaseException:
+                self.steps_run += regs[pc] - block.start + block.size * block.iterations
+                raise
+            self.steps_run += block.size * (block.iterations + 1)
+        regs[pc] = (i + 1) & self.register.mask
+        return steps
+
+    def snapshot(self):
+        """
+        Save the state of the interpreter so it can be returned to with `restore`
+
+        Registers, memory, the program, labels, and directive state are all saved.
+        Memory is saved with its `save` method and the program as a tuple,
+        so they are not copied again when restored more than once.
+        The saved program can only be run by the interpreter it came from.
+        :return: A Snapshot of the interpreter
+        """
+        registers = list(self.register.data)
+        registers[self.register.index('APSR')] = self.register.apsr
+        program = list(self.program)
+        for index, instruction in self.breakpoints.items():
+            program[index] = instruction  # Breakpoints are not part of the saved program
+        return Snapshot(registers, self.memory.save(), tuple(program), self.source.copy(),
+                        dict(self.labels), dict(self.equates), self.space_pointer, self.title)
+
+    def restore(self, snapshot):
+        """
+        Return the interpreter to the state saved in snapshot
+
+        Everything is restored in place, since decoded instructions hold on to
+        the register file and memory of this interpreter.
+        Breakpoints stay set, unless the restored program is too short to have their instruction.
+        A snapshot whose memory is None leaves memory as it is.
+        :param snapshot: A Snapshot from `snapshot`
+        :return:
+        """
+        self.register.data[:] = snapshot.registers
+        self.register.apsr = snapshot.registers[self.register.index('APSR')]
+        self._resume_breakpoint = None
+        if snapshot.memory is not None:
+            self.memory.restore(snapshot.memory)
+        program = list(snapshot.program)
+        for index in list(self.breakpoints):
+            if index < len(program):
+                # Keep the breakpoints that are in the program
+                self.breakpoints[index] = getattr(program[index], 'original', program[index])
+                program[index] = self.program[index]
+            else:
+                del self.breakpoints[index]
+        if self.program != program:
+            # Compiled blocks are only valid for the program they were compiled from
+            self.program[:] = program
+            self.compiler.clear()
+        if self.source != snapshot.source:
+            self.source = snapshot.source.copy()
+        self.labels.clear()
+        self.labels.update(snapshot.labels)
+        self.equates.clear()
+        self.equates.update(snapshot.equates)
+        self.space_pointer = snapshot.space_pointer
+        self.title = snapshot.title
+        self.find_dead_flags()  # The breakpoints may not have been set when the snapshot was taken
+        if self.history is not None:
+            self.history.clear()  # The recorded steps led to the state before the restore
+
+    def source_text(self, index):
+        """
+        Get the source of the instruction at index in the program
+        :param index: The index of the instruction
+        :return: The line of source, as it was written
+        """
+        return self.source.text(index)
+
+    def locate(self, index):
+        """
+        Describe where the instruction at index in the program came from, for error messages
+        :param index: The index of the instruction
+        :return: A string like "program.s, line 4; Error on 'LDR R0, [R1, #0]': "
+        """
+        origin, line, text = self.source[index]
+        return "{}, line {}; Error on '{}': ".format(origin, line, text)
+
+    def find_instruction(self, location):
+        """
+        Find an instruction in the program
+        :param location: A label, or the index of the instruction in the program
+        :return: The index
+        """
+        if isinstance(location, int):
+            index = location
+        elif self.labels.get(location) is not None:
+            index = self.labels[location]
+        else:
+            raise iarm.exceptions.ValidationError("Label '{}' does not exist".format(location))
+        if not 0 <= index < len(self.program):
+            raise iarm.exceptions.ValidationError("There is no instruction at {}".format(location))
+        return index
+
+    def add_breakpoint(self, location):
+        """
+        Stop `run` before the instruction at location
+
+        The instruction is replaced in the program by a BKPT,
+        so the run loops don't check for breakpoints.
+        `run` raises BreakpointHit when it reaches it, and running again carries on from it.
+        :param location: A label, or the index of the instruction in the program
+        :return: The index of the instruction
+        """
+        index = self.find_instruction(location)
+        if index not in self.breakpoints:
+            self.breakpoints[index] = getattr(self.program[index], 'original', self.program[index])
+            self.program[index] = self.ops['BKPT']('#0')
+            self.compiler.clear()
+            self.find_dead_flags()  # The flags can be looked at when stopped at the breakpoint
+        return index
+
+    def remove_breakpoint(self, location):
+        """
+        Put back the instruction a breakpoint replaced
+        :param location: A label, or the index of the instruction in the program
+        :return:
+        """
+        index = self.find_instruction(location)
+        if index in self.breakpoints:
+            self.program[index] = self.breakpoints.pop(index)
+            self.compiler.clear()
+            self.find_dead_flags()
+
+    def add_watchpoint(self, location, mode='w'):
+        """
+        Stop `run` after a step that accesses a register or range of memory
+
+        `run` raises WatchpointHit after the step, describing what was accessed.
+        Registers can only be watched for writes.
+        While any watchpoint is set, `run` records each step like it does for the history,
+        and blocks are not compiled.
+        Watchpoints can't be checked while tracing or profiling, so they can't be used together.
+        :param location: A register name, a memory address, or a range of memory addresses
+        :param mode: 'r' to stop on reads, 'w' on writes, or 'rw' on both
+        :return: The Watchpoint
+        """
+        if self.tracer is not None or self.profiler is not None:
+            raise iarm.exceptions.ValidationError("Watchpoints can't be checked while tracing or profiling")
+        if mode not in self.watcher.MODES:
+            raise iarm.exceptions.ValidationError("Unknown watch mode '{}', use one of {}".format(
+                mode, ', '.join(self.watcher.MODES)))
+        if isinstance(location, str):
+            if location not in self.register:
+                raise iarm.exceptions.ValidationError("{} is not a register".format(location))
+            if mode != 'w':
+                raise iarm.exceptions.ValidationError("Registers can only be watched for writes")
+            watchpoint = iarm.watch.Watchpoint(location, None, None, self.register.index(location), mode)
+        else:
+            if isinstance(location, int):
+                location = range(location, location + 1)
+            if not location or location.step != 1:
+                raise iarm.exceptions.ValidationError("Can't watch memory {}".format(location))
+            name = str(location.start) if len(location) == 1 else '{}-{}'.format(location.start, location.stop - 1)
+            watchpoint = iarm.watch.Watchpoint(name, location.start, location.stop, None, mode)
+        self.watcher.add(watchpoint)
+        return watchpoint
+
+    def remove_watchpoint(self, location):
+        """
+        Stop watching a register or range of memory
+        :param location: What the watchpoint was added with, or its name
+        :return:
+        """
+        if isinstance(location, int):
+            location = range(location, location + 1)
+        if isinstance(location, range):
+            location = str(location.start) if len(location) == 1 else '{}-{}'.format(location.start, location.stop - 1)
+        if location in self.watcher.watchpoints:
+            self.watcher.remove(location)
 
     def print_status_bits(self):
         print("N: {} Z: {} C: {} V: {}".format(
@@ -14,3 +14,4 @@ from .conditional_branch import ConditionalBranch
 from .unconditional_branch import UnconditionalBranch
 from .misc import Misc
 from .directives import Directives
+from ._meta import ApsrRegisterFile, LazyApsrRegisterFile
@@ -4,18 +4,250 @@ import iarm.cpu
 import warnings
 
 
+class ApsrRegisterFile(iarm.cpu.RegisterFile):
+    """
+    Register file that keeps the condition flags outside of the APSR
+
+    The N, Z, C, and V flags are held as the booleans n, z, c, and v
+    so instructions can set and test them without touching the APSR.
+    They are only packed into the APSR when it is read by name (or through `apsr`),
+    and unpacked from it when it is written.
+    """
+    FLAG_BITS = (('n', 31), ('z', 30), ('c', 29), ('v', 28))
+    FLAG_MASK = 0xF << 28
+
+    def __init__(self, bit_width, registers, special_registers=(), generate_random=False):
+        self.n = self.z = self.c = self.v = False
+        self.sign = 1 << (bit_width - 1)  # The sign bit of a register, the N flag when set in a result
+        super().__init__(bit_width, registers, special_registers, generate_random)
+        self._apsr = self._index['APSR']
+        self.apsr = self.data[self._apsr]
+
+    @property
+    def apsr(self):
+        """
+        The APSR with the current flags packed into it
+        :return:
+        """
+        value = self.data[self._apsr] & ~self.FLAG_MASK
+        for flag, bit in self.FLAG_BITS:
+            if getattr(self, flag):
+                value |= (1 << bit)
+        return value
+
+    @apsr.setter
+    def apsr(self, value):
+        value &= self.mask
+        for flag, bit in self.FLAG_BITS:
+            setattr(self, flag, bool(value & (1 << bit)))
+        self.data[self._apsr] = value & ~self.FLAG_MASK
+
+    def randomize(self, *keep):
+        super().randomize(*keep)
+        if 'APSR' not in keep:
+            value = self.data[self._index['APSR']]
+            for flag, bit in self.FLAG_BITS:
+                setattr(self, flag, bool(value & (1 << bit)))
+
+    def __getitem__(self, item):
+        i = self._index[item]
+        if i == self._apsr:
+            return self.apsr
+        return self.data[i]
+
+    def __setitem__(self, key, value):
+        i = self._index[key]
+        if i == self._apsr:
+            self.apsr = value
+        else:
+            self.data[i] = value & self.mask
+
+    def items(self):
+        return [(name, self[name]) for name in self._names]
+
+    def set_NZ(self, result):
+        """
+        Set the N and Z flags from a result
+        :param result: The result, truncated to the register width
+        :return:
+        """
+        self.n = result >= self.sign
+        self.z = result == 0
+
+    def set_add(self, oper_1, oper_2, total):
+        """
+        Set the NZCV flags for an addition
+        :param oper_1: The first operand
+        :param oper_2: The second operand
+        :param total: The sum of the operands (and carry), before it is truncated to the register width
+        :return:
+        """
+        result = total & self.mask
+        self.n = result >= self.sign
+        self.z = result == 0
+        self.c = total > self.mask
+        self.v = ((oper_1 ^ result) & (oper_2 ^ result) & self.sign) != 0
+
+    def set_sub(self, oper_1, oper_2, total):
+        """
+        Set the NZCV flags for a subtraction
+        :param oper_1: The number subtracted from
+        :param oper_2: The number being subtracted
+        :param total: The difference of the operands, before it is truncated to the register width
+        :return:
+        """
+        result = total & self.mask
+        self.n = result >= self.sign
+        self.z = result == 0
+        self.c = total >= 0  # Set when there was no borrow
+        self.v = ((oper_1 ^ oper_2) & (oper_1 ^ result) & self.sign) != 0
+
+    def set_shift(self, result, carry):
+        """
+        Set the NZC flags for a shift
+        :param result: The shifted value, truncated to the register width
+        :param carry: The last bit shifted out
+        :return:
+        """
+        self.n = result >= self.sign
+        self.z = result == 0
+        self.c = carry
+
+    def set_NZ_of_total(self, oper_1, oper_2, total):
+        """
+        Set only the N and Z flags for an addition or subtraction, leaving C and V as they are
+
+        Swapped in for `set_add` and `set_sub` where nothing reads the C and V flags they would set.
+        :param oper_1: The first operand
+        :param oper_2: The second operand
+        :param total: The result of the operation, before it is truncated to the register width
+        :return:
+        """
+        result = total & self.mask
+        self.n = result >= self.sign
+        self.z = result == 0
+
+
+class LazyApsrRegisterFile(ApsrRegisterFile):
+    """
+    Register file that works out each flag only when it is read
+
+    Flag setting instructions only save the result (for N and Z)
+    and the operation with its operands (for C and V).
+    Most flags are set again before anything reads them,
+    so their values are never worked out.
+    Reading a flag works it out from what was saved, and setting a flag
+    first works out the other flag saved with it, so n, z, c, and v
+    behave exactly as they do in ApsrRegisterFile.
+    """
+    ADD = 0
+    SUB = 1
+
+    def __init__(self, bit_width, registers, special_registers=(), generate_random=False):
+        self.result = None  # What N and Z come from, None when they are held in _n and _z
+        self.operation = None  # (ADD or SUB, oper_1, oper_2, total) C and V come from, None when held in _c and _v
+        self._n = self._z = self._c = self._v = False
+        super().__init__(bit_width, registers, special_registers, generate_random)
+
+    @property
+    def n(self):
+        if self.result is None:
+            return self._n
+        return (self.result & self.mask) >= self.sign
+
+    @n.setter
+    def n(self, value):
+        if self.result is not None:
+            self._z = (self.result & self.mask) == 0
+            self.result = None
+        self._n = bool(value)
+
+    @property
+    def z(self):
+        if self.result is None:
+            return self._z
+        return (self.result & self.mask) == 0
+
+    @z.setter
+    def z(self, value):
+        if self.result is not None:
+            self._n = (self.result & self.mask) >= self.sign
+            self.result = None
+        self._z = bool(value)
+
+    @property
+    def c(self):
+        operation = self.operation
+        if operation is None:
+            return self._c
+        kind, oper_1, oper_2, total = operation
+        if kind == self.ADD:
+            return total > self.mask
+        return total >= 0
+
+    @c.setter
+    def c(self, value):
+        if self.operation is not None:
+            self._v = self.v
+            self.operation = None
+        self._c = bool(value)
+
+    @property
+    def v(self):
+        operation = self.operation
+        if operation is None:
+            return self._v
+        kind, oper_1, oper_2, total = operation
+        result = total & self.mask
+        if kind == self.ADD:
+            return ((oper_1 ^ result) & (oper_2 ^ result) & self.sign) != 0
+        return ((oper_1 ^ oper_2) & (oper_1 ^ result) & self.sign) != 0
+
+    @v.setter
+    def v(self, value):
+        if self.operation is not None:
+            self._c = self.c
+            self.operation = None
+        self._v = bool(value)
+
+    def set_NZ(self, result):
+        self.result = result
+
+    def set_add(self, oper_1, oper_2, total):
+        self.result = total
+        self.operation = (self.ADD, oper_1, oper_2, total)
+
+    def set_sub(self, oper_1, oper_2, total):
+        self.result = total
+        self.operation = (self.SUB, oper_1, oper_2, total)
+
+    def set_shift(self, result, carry):
+        self.c = carry
+        self.result = result
+
+    def set_NZ_of_total(self, oper_1, oper_2, total):
+        self.result = total
+
+
 class _Meta(iarm.cpu.RegisterCpu):
     """
     Give helper functions to the instructions
     """
+    # Patterns are compiled once here instead of on every call
     REGISTER_NUMBER = r'(\d+)'
-    REGISTER_REGEX = r'^R{}$'.format(REGISTER_NUMBER)
+    REGISTER_REGEX = re.compile(r'^R{}$'.format(REGISTER_NUMBER))
     IMMEDIATE_NUMBER = r'(0[xX][0-9a-zA-Z]+|2_\d+|\d+)'
-    IMMEDIATE_REGEX = r'^#{}$'.format(IMMEDIATE_NUMBER)
-    ONE_PARAMETER = r'\s*([^\s,]*)(,\s*[^\s,]*)*\s*'
-    TWO_PARAMETER_COMMA_SEPARATED = r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*'
-    THREE_PARAMETER_COMMA_SEPARATED = r'\s*([^\s,]*),\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*'
+    IMMEDIATE_REGEX = re.compile(r'^#{}$'.format(IMMEDIATE_NUMBER))
+    ONE_PARAMETER = re.compile(r'\s*([^\s,]*)(,\s*[^\s,]*)*\s*')
+    TWO_PARAMETER_COMMA_SEPARATED = re.compile(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*')
+    THREE_PARAMETER_COMMA_SEPARATED = re.compile(r'\s*([^\s,]*),\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*')
     WHITESPACE = r' \t\r\f\v'  # No newline
+    REMOVE_COMMENTS = re.compile(r'^([^;\n]*);?.*$', re.MULTILINE)
+    # TODO labels with spaces between pipes is allowed `|label with space| INST OPER`
+    LINE_PARSER = re.compile(r'^(\w*)?[ \t\r\f\v]*(\S*)[ \t\r\f\v]*(.*)$', re.MULTILINE)
+    SPECIAL_REGISTERS = ('APSR', 'IPSR', 'EPSR', 'PRIMASK', 'FAULTMASK', 'BASEPRI', 'CONTROL')
+    REGISTER_FILE = ApsrRegisterFile
+    FLAGS = {'N': 'n', 'Z': 'z', 'C': 'c', 'V': 'v'}  # APSR flag to ApsrRegisterFile attribute
 
     def parse_lines(self, code):
         """
@@ -30,11 +262,8 @@ class _Meta(iarm.cpu.RegisterCpu):
         :param code: The code to parse
         :return: A list of tuples in the form of (label, instruction, parameters)
         """
-        remove_comments = re.compile(r'^([^;\n]*);?.*$', re.MULTILINE)
-        code = '\n'.join(remove_comments.findall(code))  # TODO can probably do this better
-        # TODO labels with spaces between pipes is allowed `|label with space| INST OPER`
-        parser = re.compile(r'^(\w*)?[ \t\r\f\v]*(\S*)[ \t\r\f\v]*(.*)$', re.MULTILINE)
-        return parser.findall(code)
+        code = '\n'.join(self.REMOVE_COMMENTS.findall(code))  # TODO can probably do this better
+        return self.LINE_PARSER.findall(code)
 
     def is_register(self, R):
         """
@@ -45,7 +274,7 @@ class _Meta(iarm.cpu.RegisterCpu):
         :param R: The parameter to check
         :return: True if the parameter is a register
         """
-        return re.search(self.REGISTER_REGEX, R) is not None
+        return self.REGISTER_REGEX.search(R) is not None
 
     def is_immediate(self, I):
         """
@@ -56,7 +285,7 @@ class _Meta(iarm.cpu.RegisterCpu):
         :param I: The parameter to check
         :return: True if the parameter is an immediate
         """
-        return re.search(self.IMMEDIATE_REGEX, I) is not None
+        return self.IMMEDIATE_REGEX.search(I) is not None
 
     def check_parameter(self, arg):
         """
@@ -83,7 +312,7 @@ class _Meta(iarm.cpu.RegisterCpu):
         :return: The number of the register
         """
         self.check_parameter(arg)
-        match = re.search(self.REGISTER_REGEX, arg)
+        match = self.REGISTER_REGEX.search(arg)
         if match is None:
             raise iarm.exceptions.RuleError("Parameter {} is not a register".format(arg))
         try:
@@ -106,7 +335,7 @@ class _Meta(iarm.cpu.RegisterCpu):
         :return: The value of the immediate
         """
         self.check_parameter(arg)
-        match = re.search(self.IMMEDIATE_REGEX, arg)
+        match = self.IMMEDIATE_REGEX.search(arg)
         if match is None:
             raise iarm.exceptions.RuleError("Parameter {} is not an immediate".format(arg))
         return self.convert_to_integer(match.groups()[0])
@@ -119,6 +348,63 @@ class _Meta(iarm.cpu.RegisterCpu):
         else:
             return int(str)
 
+    def decode_register(self, arg):
+        """
+        Get the index of a register in the register file
+
+        Instructions use this once when they are decoded,
+        so no register names are looked up when they are run.
+        :param arg: The register name, like 'R3' or 'SP'
+        :return: The index of the register
+        """
+        return self.register.index(arg)
+
+    def decode_registers(self, *args):
+        """
+        Get the index of each register in the register file
+        :param args: The register names
+        :return: A tuple of indices
+        """
+        return tuple(self.register.index(arg) for arg in args)
+
+    def decode_register_list(self, args):
+        """
+        Get the indices of a register list like '{R0, R1, LR}'
+
+        :param args: The contents of the braces, like 'R0, R1, LR'
+        :return: A tuple of indices, in the order given
+        """
+        registers = [i.strip() for i in args.split(',')]
+        try:
+            return self.decode_registers(*registers)
+        except KeyError as e:
+            raise iarm.exceptions.RuleError("Parameter {} is not a register".format(e.args[0]))
+
+    def decoded(self, func, form, *operands, uses_pc=False):
+        """
+        Record what an instruction was decoded into on its function
+
+        `form` has one character per operand:
+        'r' a register index, 'i' an immediate value, 'l' a label name,
+        'R' a tuple of register indices, and 's' a special register name.
+        `uses_pc` is also set if any register operand is the PC,
+        the run loop only keeps the PC register up to date for these instructions.
+        :param func: The function that runs the instruction
+        :param form: The kinds of operands
+        :param operands: The decoded operands
+        :param uses_pc: Does the instruction read or write the PC without it being an operand
+        :return: func
+        """
+        pc = self.register.index('PC')
+        for kind, operand in zip(form, operands):
+            if (kind == 'r' and operand == pc) or (kind == 'R' and pc in operand):
+                uses_pc = True
+        func.op = func.__name__[:-len('_func')]
+        func.form = form
+        func.operands = operands
+        func.uses_pc = uses_pc
+        return func
+
     def check_immediate_unsigned_value(self, arg, bit):
         """
         Is the immediate within the unsigned value of 2**bit - 1
@@ -226,19 +512,58 @@ class _Meta(iarm.cpu.RegisterCpu):
         i_num = self.check_immediate_value(arg, 2 ** 25, -2 ** 25)
         self.check_multiple_of(i_num, 4)
 
+    def split_parameters(self, parameters, count):
+        """
+        Split comma separated parameters without a regex
+
+        A fast path for the TWO_PARAMETER_COMMA_SEPARATED and THREE_PARAMETER_COMMA_SEPARATED patterns,
+        giving the same groups as they would.
+        Anything less simple, like extra parameters or whitespace inside a parameter, returns None
+        so the regex can deal with it.
+        :param parameters: The string with the parameters
+        :param count: How many parameters are expected
+        :return: The groups the pattern would have matched, or None
+        """
+        parts = parameters.split(',')
+        if len(parts) != count:
+            return None
+        groups = []
+        for part in parts[:-1]:
+            part = part.lstrip()
+            if part and part.split() != [part]:
+                return None
+            groups.append(part)
+        # Like the pattern, anything after whitespace in the last parameter is ignored
+        last = parts[-1].split(None, 1)
+        groups.append(last[0] if last else '')
+        groups.append(None)  # No extra parameters
+        return tuple(groups)
+
     def get_parameters(self, regex_exp, parameters):
         """
         Given a regex expression and the string with the paramers,
         either return a regex match object or raise an exception if the regex
         did not find a match
-        :param regex_exp:
+        :param regex_exp: A compiled pattern (or pattern string)
         :param parameters:
         :return:
         """
         # TODO find a better way to do the equate replacement
         for rep in self.equates:
             parameters = parameters.replace(rep, str(self.equates[rep]))
-        match = re.match(regex_exp, parameters)
+
+        if regex_exp is self.THREE_PARAMETER_COMMA_SEPARATED:
+            groups = self.split_parameters(parameters, 3)
+        elif regex_exp is self.TWO_PARAMETER_COMMA_SEPARATED:
+            groups = self.split_parameters(parameters, 2)
+        else:
+            groups = None
+        if groups is not None:
+            return groups
+
+        if isinstance(regex_exp, str):
+            regex_exp = re.compile(regex_exp)
+        match = regex_exp.match(parameters)
         if not match:
             raise iarm.exceptions.ParsingError("Parameters are None, did you miss a comma?")
 
@@ -298,44 +623,27 @@ class _Meta(iarm.cpu.RegisterCpu):
         :param value: If value evaulates to true, it is set, cleared otherwise
         :return:
         """
-        if flag == 'N':
-            bit = 31
-        elif flag == 'Z':
-            bit = 30
-        elif flag == 'C':
-            bit = 29
-        elif flag == 'V':
-            bit = 28
-        else:
+        try:
+            setattr(self.register, self.FLAGS[flag], bool(value))
+        except KeyError:
             raise AttributeError("Flag {} does not exist in the APSR".format(flag))
 
-        if value:
-            self.register['APSR'] |= (1 << bit)
-        else:
-            self.register['APSR'] -= (1 << bit) if (self.register['APSR'] & (1 << bit)) else 0
-
     def rule_special_registers(self, arg):
         """Raises an exception if the register is not a special register"""
         # TODO is PSR supposed to be here?
-        special_registers = "PSR APSR IPSR EPSR PRIMASK FAULTMASK BASEPRI CONTROL"
-        if arg not in special_registers.split():
-            raise iarm.exceptions.RuleError("{} is not a special register; Must be [{}]".format(arg, special_registers))
+        special_registers = ('PSR',) + self.SPECIAL_REGISTERS
+        if arg not in special_registers:
+            raise iarm.exceptions.RuleError("{} is not a special register; Must be [{}]".format(arg, ' '.join(special_registers)))
 
     def rule_LR_or_general_purpose_registers(self, arg):
         if (arg != 'LR') and (arg != 'R14'):
             self.check_arguments(general_purpose_registers=(arg,))
 
     def set_N_flag(self, result):
-        if result & (1 << self._bit_width - 1):
-            self.set_APSR_flag_to_value('N', 1)
-        else:
-            self.set_APSR_flag_to_value('N', 0)
+        self.register.n = bool(result & (1 << self._bit_width - 1))
 
     def set_Z_flag(self, result):
-        if result == 0:
-            self.set_APSR_flag_to_value('Z', 1)
-        else:
-            self.set_APSR_flag_to_value('Z', 0)
+        self.register.z = result == 0
 
     def set_C_flag(self, oper_1, oper_2, result, type):
         """
@@ -350,21 +658,15 @@ class _Meta(iarm.cpu.RegisterCpu):
         """
         # TODO is this correct?
         if type == 'add':
-            if result < oper_1:
-                self.set_APSR_flag_to_value('C', 1)
-            else:
-                self.set_APSR_flag_to_value('C', 0)
+            self.register.c = result < oper_1
         elif type == 'sub':
-            if oper_1 < oper_2:
-                # If there was a borrow, then set to zero
-                self.set_APSR_flag_to_value('C', 0)
-            else:
-                self.set_APSR_flag_to_value('C', 1)
+            # If there was a borrow, then set to zero
+            self.register.c = oper_1 >= oper_2
         elif type == 'shift-left':
             if (oper_2 > 0) and (oper_2 < (self._bit_width - 1)):
-                self.set_APSR_flag_to_value('C', oper_1 & (1 << (self._bit_width - oper_2)))
+                self.register.c = bool(oper_1 & (1 << (self._bit_width - oper_2)))
             else:
-                self.set_APSR_flag_to_value('C', 0)
+                self.register.c = False
         else:
             raise iarm.exceptions.BrainFart("_type is not 'add' or 'sub'")
 
@@ -377,39 +679,57 @@ class _Meta(iarm.cpu.RegisterCpu):
         else:
             raise iarm.exceptions.BrainFart("_type is not 'add' or 'sub'")
 
+        sign = 1 << (self._bit_width - 1)
         if (oper_1 + oper_2) >= (1 << 31):
-            if ((oper_1 & (1 << self._bit_width - 1)) and (oper_2 & (1 << self._bit_width - 1)) and not (result & (1 << self._bit_width - 1))) or \
-               (not (oper_1 & (1 << self._bit_width - 1)) and not (oper_2 & (1 << self._bit_width - 1)) and (result & (1 << self._bit_width - 1))):
-                self.set_APSR_flag_to_value('V', 1)
-            else:
-                self.set_APSR_flag_to_value('V', 0)
+            self.register.v = (oper_1 & sign) == (oper_2 & sign) != (result & sign)
         else:
-            self.set_APSR_flag_to_value('V', 0)
+            self.register.v = False
 
     def set_NZ_flags(self, result):
-        self.set_N_flag(result)
-        self.set_Z_flag(result)
+        self.register.set_NZ(result)
 
     def set_NZCV_flags(self, oper_1, oper_2, result, _type):
         self.set_NZ_flags(result)
         self.set_C_flag(oper_1, oper_2, result, _type)
         self.set_V_flag(oper_1, oper_2, result, _type)
 
+    def set_add_flags(self, oper_1, oper_2, total):
+        """
+        Set the NZCV flags for an addition
+
+        Instructions use `register.set_add` directly, so the register file decides how flags are kept.
+        :param oper_1: The first operand
+        :param oper_2: The second operand
+        :param total: The sum of the operands (and carry), before it is truncated to the register width
+        :return:
+        """
+        self.register.set_add(oper_1, oper_2, total)
+
+    def set_sub_flags(self, oper_1, oper_2, total):
+        """
+        Set the NZCV flags for a subtraction
+        :param oper_1: The number subtracted from
+        :param oper_2: The number being subtracted
+        :param total: The difference of the operands, before it is truncated to the register width
+        :return:
+        """
+        self.register.set_sub(oper_1, oper_2, total)
+
     def rule_R0_thru_R14(self, arg):
         if arg not in ('LR', 'R14', 'SP', 'R13'):
             self.check_arguments(general_purpose_registers=(arg,))
 
     def is_N_set(self):
-        return True if (self.register['APSR'] & (1 << 31)) else False
+        return self.register.n
 
     def is_Z_set(self):
-        return True if (self.register['APSR'] & (1 << 30)) else False
+        return self.register.z
 
     def is_C_set(self):
-        return True if (self.register['APSR'] & (1 << 29)) else False
+        return self.register.c
 
     def is_V_set(self):
-        return True if (self.register['APSR'] & (1 << 28)) else False
+        return self.register.v
 
     def rule_label_exists(self, arg):
         if (arg not in self.labels) and (arg != '.'):
@@ -14,17 +14,21 @@ class Arithmetic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        a, c = self.decode_registers(Ra, Rc)
+        register = self.register
+        regs = register.data
+        mask = register.mask
+        set_flags = self.register.set_add
 
         # ADCS Ra, Ra, Rb
         def ADCS_func():
-            # TODO need to rethink the set_NZCV with the C flag
-            oper_1 = self.register[Ra]
-            oper_2 = self.register[Rc]
-            self.register[Ra] = oper_1 + oper_2
-            self.register[Ra] += 1 if self.is_C_set() else 0
-            self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
+            oper_1 = regs[a]
+            oper_2 = regs[c]
+            total = oper_1 + oper_2 + register.c
+            regs[a] = total & mask
+            set_flags(oper_1, oper_2, total)
 
-        return ADCS_func
+        return self.decoded(ADCS_func, 'rr', a, c)
 
     def ADD(self, params):
         """
@@ -36,15 +40,20 @@ class Arithmetic(_Meta):
         Rx, Ry, and Rz can be any register
         """
         Rx, Ry, Rz = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
+        regs = self.register.data
+        mask = self.register.mask
 
         if self.is_register(Rz):
             # ADD Rx, Ry, Rz
             self.check_arguments(any_registers=(Rx, Ry, Rz))
             if Rx != Ry:
                 raise iarm.exceptions.RuleError("Second parameter {} does not equal first parameter {}". format(Ry, Rx))
+            x, y, z = self.decode_registers(Rx, Ry, Rz)
 
             def ADD_func():
-                self.register[Rx] = self.register[Ry] + self.register[Rz]
+                regs[x] = (regs[y] + regs[z]) & mask
+
+            return self.decoded(ADD_func, 'rrr', x, y, z)
         else:
             if Rx == 'SP':
                 # ADD SP, SP, #imm9_4
@@ -56,11 +65,13 @@ class Arithmetic(_Meta):
                 self.check_arguments(any_registers=(Rx,), imm10_4=(Rz,))
                 if Ry not in ('SP', 'PC'):
                     raise iarm.exceptions.RuleError("Second parameter {} is not SP or PC".format(Ry))
+            x, y = self.decode_registers(Rx, Ry)
+            z = self.check_immediate(Rz)
 
             def ADD_func():
-                self.register[Rx] = self.register[Ry] + self.convert_to_integer(Rz[1:])
+                regs[x] = (regs[y] + z) & mask
 
-        return ADD_func
+            return self.decoded(ADD_func, 'rri', x, y, z)
 
     def ADDS(self, params):
         """
@@ -72,37 +83,40 @@ class Arithmetic(_Meta):
         Set the NZCV flags
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
+        regs = self.register.data
+        mask = self.register.mask
+        set_flags = self.register.set_add
 
         if self.is_register(Rc):
             # ADDS Ra, Rb, Rc
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def ADDS_func():
-                oper_1 = self.register[Rb]
-                oper_2 = self.register[Rc]
-                self.register[Ra] = self.register[Rb] + self.register[Rc]
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
+                oper_1 = regs[b]
+                oper_2 = regs[c]
+                total = oper_1 + oper_2
+                regs[a] = total & mask
+                set_flags(oper_1, oper_2, total)
+
+            return self.decoded(ADDS_func, 'rrr', a, b, c)
         elif Ra == Rb:
             # ADDS Ra, Ra, #imm8
             self.check_arguments(low_registers=(Ra,), imm8=(Rc,))
             self.match_first_two_parameters(Ra, Rb)
-
-            def ADDS_func():
-                oper_1 = self.register[Ra]
-                oper_2 = self.convert_to_integer(Rc[1:])
-                self.register[Ra] = self.register[Ra] + oper_2
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
         else:
             # ADDS Ra, Rb, #imm3
             self.check_arguments(low_registers=(Ra, Rb), imm3=(Rc,))
+        a, b = self.decode_registers(Ra, Rb)
+        c = self.check_immediate(Rc)
 
-            def ADDS_func():
-                oper_1 = self.register[Rb]
-                oper_2 = self.convert_to_integer(Rc[1:])
-                self.register[Ra] = self.register[Rb] + oper_2
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
+        def ADDS_func():
+            oper_1 = regs[b]
+            total = oper_1 + c
+            regs[a] = total & mask
+            set_flags(oper_1, c, total)
 
-        return ADDS_func
+        return self.decoded(ADDS_func, 'rri', a, b, c)
 
     def CMN(self, params):
         """
@@ -115,13 +129,15 @@ class Arithmetic(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
+        set_flags = self.register.set_add
 
         # CMN Ra, Rb
         def CMN_func():
-            self.set_NZCV_flags(self.register[Ra], self.register[Rb],
-                                self.register[Ra] + self.register[Rb], 'add')
+            set_flags(regs[a], regs[b], regs[a] + regs[b])
 
-        return CMN_func
+        return self.decoded(CMN_func, 'rr', a, b)
 
     def CMP(self, params):
         """
@@ -132,24 +148,28 @@ class Arithmetic(_Meta):
         Rm and Rn can be R0-R14
         """
         Rm, Rn = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
+        regs = self.register.data
+        set_flags = self.register.set_sub
 
         if self.is_register(Rn):
             # CMP Rm, Rn
             self.check_arguments(R0_thru_R14=(Rm, Rn))
+            m, n = self.decode_registers(Rm, Rn)
 
             def CMP_func():
-                self.set_NZCV_flags(self.register[Rm], self.register[Rn],
-                                    self.register[Rm] - self.register[Rn], 'sub')
+                set_flags(regs[m], regs[n], regs[m] - regs[n])
+
+            return self.decoded(CMP_func, 'rr', m, n)
         else:
             # CMP Rm, #imm8
             self.check_arguments(R0_thru_R14=(Rm,), imm8=(Rn,))
+            m = self.decode_register(Rm)
+            n = self.check_immediate(Rn)
 
             def CMP_func():
-                tmp = self.convert_to_integer(Rn[1:])
-                self.set_NZCV_flags(self.register[Rm], tmp,
-                                    self.register[Rm] - tmp, 'sub')
+                set_flags(regs[m], n, regs[m] - n)
 
-        return CMP_func
+            return self.decoded(CMP_func, 'ri', m, n)
 
     def MULS(self, params):
         """
@@ -165,13 +185,17 @@ class Arithmetic(_Meta):
         self.check_arguments(low_registers=(Ra, Rb, Rc))
         if Ra != Rc:
             raise iarm.exceptions.RuleError("Third parameter {} is not the same as the first parameter {}".format(Rc, Ra))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
+        mask = self.register.mask
+        set_flags = self.register.set_NZ
 
         # MULS Ra, Rb, Ra
         def MULS_func():
-            self.register[Ra] = self.register[Rb] * self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            regs[a] = (regs[b] * regs[a]) & mask
+            set_flags(regs[a])
 
-        return MULS_func
+        return self.decoded(MULS_func, 'rr', a, b)
 
     def NOP(self, params):
         """
@@ -182,7 +206,7 @@ class Arithmetic(_Meta):
         # TODO check for no parameters
         def NOP_func():
             return
-        return NOP_func
+        return self.decoded(NOP_func, '')
 
     def RSBS(self, params):
         """
@@ -197,14 +221,18 @@ class Arithmetic(_Meta):
         self.check_arguments(low_registers=(Ra, Rb))
         if Rc != '#0':
             raise iarm.exceptions.RuleError("Third parameter {} is not #0".format(Rc))
-        # RSBS Ra, Rb, #0
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
+        mask = self.register.mask
+        set_flags = self.register.set_sub
 
+        # RSBS Ra, Rb, #0
         def RSBS_func():
-            oper_2 = self.register[Rb]
-            self.register[Ra] = 0 - self.register[Rb]
-            self.set_NZCV_flags(0, oper_2, self.register[Ra], 'sub')
+            oper_2 = regs[b]
+            regs[a] = -oper_2 & mask
+            set_flags(0, oper_2, -oper_2)
 
-        return RSBS_func
+        return self.decoded(RSBS_func, 'rr', a, b)
 
     def SBCS(self, params):
         """
@@ -218,16 +246,22 @@ class Arithmetic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rb, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        a, c = self.decode_registers(Ra, Rc)
+        register = self.register
+        regs = register.data
+        mask = register.mask
+        set_flags = self.register.set_sub
 
         # SBCS Ra, Ra, Rb
         def SBCS_func():
             # TODO does setting the flags work here?
-            oper_1 = self.register[Rb]
-            oper_2 = self.register[Rc] + (1 if self.is_C_set() else 0)
-            self.register[Ra] = self.register[Rb] - oper_2
-            self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'sub')
+            oper_1 = regs[a]
+            oper_2 = regs[c] + register.c
+            total = oper_1 - oper_2
+            regs[a] = total & mask
+            set_flags(oper_1, oper_2, total)
 
-        return SBCS_func
+        return self.decoded(SBCS_func, 'rr', a, c)
 
     def SUB(self, params):
         """
@@ -242,12 +276,16 @@ class Arithmetic(_Meta):
             raise iarm.exceptions.RuleError("First parameter {} is not equal to SP".format(Ra))
         if Rb != 'SP':
             raise iarm.exceptions.RuleError("Second parameter {} is not equal to SP".format(Rb))
+        a = self.decode_register(Ra)
+        c = self.check_immediate(Rc)
+        regs = self.register.data
+        mask = self.register.mask
 
         # SUB SP, SP, #imm9_4
         def SUB_func():
-            self.register[Ra] = self.register[Rb] - self.convert_to_integer(Rc[1:])
+            regs[a] = (regs[a] - c) & mask
 
-        return SUB_func
+        return self.decoded(SUB_func, 'rri', a, a, c)
 
     def SUBS(self, params):
         """
@@ -259,32 +297,36 @@ class Arithmetic(_Meta):
         Ra, Rb, and Rc must be low registers
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
+        regs = self.register.data
+        mask = self.register.mask
+        set_flags = self.register.set_sub
 
         if self.is_register(Rc):
             # SUBS Ra, Rb, Rc
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def SUBS_func():
-                oper_1 = self.register[Rb]
-                oper_2 = self.register[Rc]
-                self.register[Ra] = self.register[Rb] - self.register[Rc]
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'sub')
+                oper_1 = regs[b]
+                oper_2 = regs[c]
+                total = oper_1 - oper_2
+                regs[a] = total & mask
+                set_flags(oper_1, oper_2, total)
+
+            return self.decoded(SUBS_func, 'rrr', a, b, c)
+        elif Ra == Rb:
+            # SUBS Ra, Ra, #imm8
+            self.check_arguments(low_registers=(Ra,), imm8=(Rc,))
         else:
-            if Ra == Rb:
-                # SUBS Ra, Ra, #imm8
-                self.check_arguments(low_registers=(Ra,), imm8=(Rc,))
-
-                def SUBS_func():
-                    oper_1 = self.register[Ra]
-                    self.register[Ra] = self.register[Ra] - self.convert_to_integer(Rc[1:])
-                    self.set_NZCV_flags(oper_1, self.convert_to_integer(Rc[1:]), self.register[Ra], 'sub')
-            else:
-                # SUBS Ra, Rb, #imm3
-                self.check_arguments(low_registers=(Ra, Rb), imm3=(Rc,))
+            # SUBS Ra, Rb, #imm3
+            self.check_arguments(low_registers=(Ra, Rb), imm3=(Rc,))
+        a, b = self.decode_registers(Ra, Rb)
+        c = self.check_immediate(Rc)
 
-                def SUBS_func():
-                    oper_1 = self.register[Rb]
-                    self.register[Ra] = self.register[Rb] - self.convert_to_integer(Rc[1:])
-                    self.set_NZCV_flags(oper_1, self.convert_to_integer(Rc[1:]), self.register[Ra], 'sub')
+        def SUBS_func():
+            oper_1 = regs[b]
+            total = oper_1 - c
+            regs[a] = total & mask
+            set_flags(oper_1, c, total)
 
-        return SUBS_func
+        return self.decoded(SUBS_func, 'rri', a, b, c)
@@ -11,13 +11,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BCC label
         def BCC_func():
-            if not self.is_C_set():
-                self.register['PC'] = self.labels[label]
+            if not register.c:
+                return labels[label]
 
-        return BCC_func
+        return self.decoded(BCC_func, 'l', label)
 
     def BCS(self, params):
         """
@@ -28,13 +30,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BCS label
         def BCS_func():
-            if self.is_C_set():
-                self.register['PC'] = self.labels[label]
+            if register.c:
+                return labels[label]
 
-        return BCS_func
+        return self.decoded(BCS_func, 'l', label)
 
     def BEQ(self, params):
         """
@@ -45,13 +49,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BEQ label
         def BEQ_func():
-            if self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+            if register.z:
+                return labels[label]
 
-        return BEQ_func
+        return self.decoded(BEQ_func, 'l', label)
 
     def BGE(self, params):
         """
@@ -62,13 +68,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BGE label
         def BGE_func():
-            if self.is_N_set() == self.is_V_set():
-                self.register['PC'] = self.labels[label]
+            if register.n == register.v:
+                return labels[label]
 
-        return BGE_func
+        return self.decoded(BGE_func, 'l', label)
 
     def BGT(self, params):
         """
@@ -79,13 +87,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BGT label
         def BGT_func():
-            if (self.is_N_set() == self.is_V_set()) and not self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+            if (register.n == register.v) and not register.z:
+                return labels[label]
 
-        return BGT_func
+        return self.decoded(BGT_func, 'l', label)
 
     def BHI(self, params):
         """
@@ -96,13 +106,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BHI label
         def BHI_func():
-            if self.is_C_set() and not self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+            if register.c and not register.z:
+                return labels[label]
 
-        return BHI_func
+        return self.decoded(BHI_func, 'l', label)
 
     def BHS(self, params):
         """
@@ -113,13 +125,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BHS label
         def BHS_func():
-            if self.is_C_set():
-                self.register['PC'] = self.labels[label]
+            if register.c:
+                return labels[label]
 
-        return BHS_func
+        return self.decoded(BHS_func, 'l', label)
 
     def BLE(self, params):
         """
@@ -130,13 +144,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BLE label
         def BLE_func():
-            if self.is_Z_set() or (self.is_N_set() != self.is_V_set()):
-                self.register['PC'] = self.labels[label]
+            if register.z or (register.n != register.v):
+                return labels[label]
 
-        return BLE_func
+        return self.decoded(BLE_func, 'l', label)
 
     def BLO(self, params):
         """
@@ -147,13 +163,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BLO label
         def BLO_func():
-            if not self.is_C_set():
-                self.register['PC'] = self.labels[label]
+            if not register.c:
+                return labels[label]
 
-        return BLO_func
+        return self.decoded(BLO_func, 'l', label)
 
     def BLS(self, params):
         """
@@ -164,13 +182,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BLS label
         def BLS_func():
-            if (not self.is_C_set()) or self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+            if (not register.c) or register.z:
+                return labels[label]
 
-        return BLS_func
+        return self.decoded(BLS_func, 'l', label)
 
     def BLT(self, params):
         """
@@ -181,13 +201,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BLT label
         def BLT_func():
-            if self.is_N_set() != self.is_V_set():
-                self.register['PC'] = self.labels[label]
+            if register.n != register.v:
+                return labels[label]
 
-        return BLT_func
+        return self.decoded(BLT_func, 'l', label)
 
     def BMI(self, params):
         """
@@ -198,13 +220,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BMI label
         def BMI_func():
-            if self.is_N_set():
-                self.register['PC'] = self.labels[label]
+            if register.n:
+                return labels[label]
 
-        return BMI_func
+        return self.decoded(BMI_func, 'l', label)
 
     def BNE(self, params):
         """
@@ -215,13 +239,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BNE label
         def BNE_func():
-            if not self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+            if not register.z:
+                return labels[label]
 
-        return BNE_func
+        return self.decoded(BNE_func, 'l', label)
 
     def BPL(self, params):
         """
@@ -232,13 +258,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BPL label
         def BPL_func():
-            if not self.is_N_set():
-                self.register['PC'] = self.labels[label]
+            if not register.n:
+                return labels[label]
 
-        return BPL_func
+        return self.decoded(BPL_func, 'l', label)
 
     def BVC(self, params):
         """
@@ -249,13 +277,15 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BVC label
         def BVC_func():
-            if not self.is_V_set():
-                self.register['PC'] = self.labels[label]
+            if not register.v:
+                return labels[label]
 
-        return BVC_func
+        return self.decoded(BVC_func, 'l', label)
 
     def BVS(self, params):
         """
@@ -266,10 +296,12 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        register = self.register
+        labels = self.labels
 
         # BVS label
         def BVS_func():
-            if self.is_V_set():
-                self.register['PC'] = self.labels[label]
+            if register.v:
+                return labels[label]
 
-        return BVS_func
+        return self.decoded(BVS_func, 'l', label)
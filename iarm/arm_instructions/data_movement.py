@@ -18,11 +18,13 @@ class DataMovement(_Meta):
         Rx, Ry = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(any_registers=(Rx, Ry))
+        x, y = self.decode_registers(Rx, Ry)
+        regs = self.register.data
 
         def MOV_func():
-            self.register[Rx] = self.register[Ry]
+            regs[x] = regs[y]
 
-        return MOV_func
+        return self.decoded(MOV_func, 'rr', x, y)
 
     def MOVS(self, params):
         """
@@ -33,26 +35,31 @@ class DataMovement(_Meta):
         Ra and Rb must be low registers
         """
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
+        regs = self.register.data
+        set_flags = self.register.set_NZ
 
         if self.is_immediate(Rb):
             self.check_arguments(low_registers=[Ra], imm8=[Rb])
+            a = self.decode_register(Ra)
+            b = self.check_immediate(Rb)
 
             def MOVS_func():
-                self.register[Ra] = self.convert_to_integer(Rb[1:])
+                regs[a] = b
 
                 # Set N and Z status flags
-                self.set_NZ_flags(self.register[Ra])
+                set_flags(b)
 
-            return MOVS_func
+            return self.decoded(MOVS_func, 'ri', a, b)
         elif self.is_register(Rb):
             self.check_arguments(low_registers=(Ra, Rb))
+            a, b = self.decode_registers(Ra, Rb)
 
             def MOVS_func():
-                self.register[Ra] = self.register[Rb]
+                regs[a] = regs[b]
 
-                self.set_NZ_flags(self.register[Ra])
+                set_flags(regs[a])
 
-            return MOVS_func
+            return self.decoded(MOVS_func, 'rr', a, b)
         else:
             raise iarm.exceptions.ParsingError("Unknown parameter: {}".format(Rb))
 
@@ -66,17 +73,26 @@ class DataMovement(_Meta):
         Rj, Rspecial = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,), special_registers=(Rspecial,))
+        j = self.decode_register(Rj)
+        register = self.register
+        regs = register.data
+
+        # TODO add combination registers IEPSR, IAPSR, and EAPSR
+        # TODO needs to use APSR, IPSR, EPSR, IEPSR, IAPSR, EAPSR, PSR, MSP, PSP, PRIMASK, or CONTROL.
+        # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0553a/CHDBIBGJ.html
+        if Rspecial == 'PSR':
+            sources = ('APSR', 'IPSR', 'EPSR')
+        else:
+            sources = (Rspecial,)
 
         def MRS_func():
-            # TODO add combination registers IEPSR, IAPSR, and EAPSR
-            # TODO needs to use APSR, IPSR, EPSR, IEPSR, IAPSR, EAPSR, PSR, MSP, PSP, PRIMASK, or CONTROL.
-            # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0553a/CHDBIBGJ.html
-            if Rspecial == 'PSR':
-                self.register[Rj] = self.register['APSR'] | self.register['IPSR'] | self.register['EPSR']
-            else:
-                self.register[Rj] = self.register[Rspecial]
+            # Read by name so the flags get packed into the APSR
+            value = 0
+            for source in sources:
+                value |= register[source]
+            regs[j] = value
 
-        return MRS_func
+        return self.decoded(MRS_func, 'rs', j, Rspecial)
 
     def MSR(self, params):
         """
@@ -88,19 +104,22 @@ class DataMovement(_Meta):
         Rspecial, Rj = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,), special_registers=(Rspecial,))
-
-        def MSR_func():
-            # TODO add combination registers IEPSR, IAPSR, and EAPSR
-            # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0553a/CHDBIBGJ.html
-            # TODO update N Z C V flags
-            if Rspecial in ('PSR', 'APSR'):
-                # PSR ignores writes to IPSR and EPSR
-                self.register['APSR'] = self.register[Rj]
-            else:
-                # Do nothing
+        j = self.decode_register(Rj)
+        register = self.register
+        regs = register.data
+
+        # TODO add combination registers IEPSR, IAPSR, and EAPSR
+        # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0553a/CHDBIBGJ.html
+        if Rspecial in ('PSR', 'APSR'):
+            # PSR ignores writes to IPSR and EPSR
+            def MSR_func():
+                register.apsr = regs[j]
+        else:
+            # Do nothing
+            def MSR_func():
                 pass
 
-        return MSR_func
+        return self.decoded(MSR_func, 'sr', Rspecial, j)
 
     def MVNS(self, params):
         """
@@ -112,12 +131,16 @@ class DataMovement(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
+        mask = self.register.mask
+        set_flags = self.register.set_NZ
 
         def MVNS_func():
-            self.register[Ra] = ~self.register[Rb]
-            self.set_NZ_flags(self.register[Ra])
+            regs[a] = ~regs[b] & mask
+            set_flags(regs[a])
 
-        return MVNS_func
+        return self.decoded(MVNS_func, 'rr', a, b)
 
     def REV(self, params):
         """
@@ -128,14 +151,17 @@ class DataMovement(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
 
         def REV_func():
-            self.register[Ra] = ((self.register[Rb] & 0xFF000000) >> 24) | \
-                                ((self.register[Rb] & 0x00FF0000) >> 8) | \
-                                ((self.register[Rb] & 0x0000FF00) << 8) | \
-                                ((self.register[Rb] & 0x000000FF) << 24)
+            value = regs[b]
+            regs[a] = ((value & 0xFF000000) >> 24) | \
+                      ((value & 0x00FF0000) >> 8) | \
+                      ((value & 0x0000FF00) << 8) | \
+                      ((value & 0x000000FF) << 24)
 
-        return REV_func
+        return self.decoded(REV_func, 'rr', a, b)
 
     def REV16(self, params):
         """
@@ -146,12 +172,15 @@ class DataMovement(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
 
         def REV16_func():
-            self.register[Ra] = ((self.register[Rb] & 0xFF00FF00) >> 8) | \
-                                ((self.register[Rb] & 0x00FF00FF) << 8)
+            value = regs[b]
+            regs[a] = ((value & 0xFF00FF00) >> 8) | \
+                      ((value & 0x00FF00FF) << 8)
 
-        return REV16_func
+        return self.decoded(REV16_func, 'rr', a, b)
 
     def REVSH(self, params):
         """
@@ -160,17 +189,20 @@ class DataMovement(_Meta):
         Reverse the byte order in the lower half word in Rb and store the result in Ra.
         If the result of the result is signed, then sign extend
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
 
         def REVSH_func():
-            self.register[Ra] = ((self.register[Rb] & 0x0000FF00) >> 8) | \
-                                ((self.register[Rb] & 0x000000FF) << 8)
-            if self.register[Ra] & (1 << 15):
-                self.register[Ra] |= 0xFFFF0000
+            value = ((regs[b] & 0x0000FF00) >> 8) | \
+                    ((regs[b] & 0x000000FF) << 8)
+            if value & (1 << 15):
+                value |= 0xFFFF0000
+            regs[a] = value
 
-        return REVSH_func
+        return self.decoded(REVSH_func, 'rr', a, b)
 
     def SXTB(self, params):
         """
@@ -178,17 +210,19 @@ class DataMovement(_Meta):
 
         Sign extend the byte in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
 
         def SXTB_func():
-            if self.register[Rb] & (1 << 7):
-                self.register[Ra] = 0xFFFFFF00 + (self.register[Rb] & 0xFF)
+            if regs[b] & (1 << 7):
+                regs[a] = 0xFFFFFF00 + (regs[b] & 0xFF)
             else:
-                self.register[Ra] = (self.register[Rb] & 0xFF)
+                regs[a] = (regs[b] & 0xFF)
 
-        return SXTB_func
+        return self.decoded(SXTB_func, 'rr', a, b)
 
     def SXTH(self, params):
         """
@@ -196,17 +230,19 @@ class DataMovement(_Meta):
 
         Sign extend the half word in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
 
         def SXTH_func():
-            if self.register[Rb] & (1 << 15):
-                self.register[Ra] = 0xFFFF0000 + (self.register[Rb] & 0xFFFF)
+            if regs[b] & (1 << 15):
+                regs[a] = 0xFFFF0000 + (regs[b] & 0xFFFF)
             else:
-                self.register[Ra] = (self.register[Rb] & 0xFFFF)
+                regs[a] = (regs[b] & 0xFFFF)
 
-        return SXTH_func
+        return self.decoded(SXTH_func, 'rr', a, b)
 
     def UXTB(self, params):
         """
@@ -214,14 +250,16 @@ class DataMovement(_Meta):
 
         Zero extend the byte in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
 
         def UXTB_func():
-            self.register[Ra] = (self.register[Rb] & 0xFF)
+            regs[a] = (regs[b] & 0xFF)
 
-        return UXTB_func
+        return self.decoded(UXTB_func, 'rr', a, b)
 
     def UXTH(self, params):
         """
@@ -229,11 +267,13 @@ class DataMovement(_Meta):
 
         Zero extend the half word in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
 
         def UXTH_func():
-            self.register[Ra] = (self.register[Rb] & 0xFFFF)
+            regs[a] = (regs[b] & 0xFFFF)
 
-        return UXTH_func
+        return self.decoded(UXTH_func, 'rr', a, b)
@@ -1,7 +1,7 @@
 import iarm.exceptions
 from ._meta import _Meta
+import iarm.cpu
 import warnings
-import inspect
 
 
 class Directives(_Meta):
@@ -12,19 +12,15 @@ class Directives(_Meta):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.equates = {}
-        self.directives = {}
+        self.directives = iarm.cpu.BoundMethods(self, self._DIRECTIVES)
         self.space_pointer = 0  # Refers to a place in memory
         self.title = ""
 
-        # Get all instructions and rules
-        for obj in inspect.getmembers(self, predicate=inspect.ismethod):
-            # Is returned in the form of (method name, method)
-            name = obj[0]
-            method = obj[1]
-
-            # Directives are defiined by starting with 'directive_'
-            if str.startswith(name, 'directive_'):
-                self.directives[name[len('directive_'):]] = method
+    @classmethod
+    def _build_tables(cls):
+        super()._build_tables()
+        # Directives are defined by starting with 'directive_'
+        cls._DIRECTIVES = cls._find_methods(lambda name: name.startswith('directive_'), 'directive_')
 
     def directive_TTL(self, label, params):
         self.title = params
@@ -113,8 +109,7 @@ class Directives(_Meta):
         self.labels[label] = self.space_pointer
         if params in self.equates:
             params = self.equates[params]
-        for i in range(4):
-            self.memory[self.space_pointer + i] = (self.convert_to_integer(params) >> (8*i)) & 0xFF
+        self.memory.write_word(self.space_pointer, self.convert_to_integer(params))
         self.space_pointer += 4
 
     def directive_DCH(self, label, params):
@@ -132,8 +127,7 @@ class Directives(_Meta):
         self.labels[label] = self.space_pointer
         if params in self.equates:
             params = self.equates[params]
-        for i in range(2):
-            self.memory[self.space_pointer + i] = (self.convert_to_integer(params) >> (8 * i)) & 0xFF
+        self.memory.write_halfword(self.space_pointer, self.convert_to_integer(params))
         self.space_pointer += 2
 
     def directive_DCB(self, label, params):
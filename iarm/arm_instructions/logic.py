@@ -16,13 +16,16 @@ class Logic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        a, c = self.decode_registers(Ra, Rc)
+        regs = self.register.data
+        set_flags = self.register.set_NZ
 
         # ANDS Ra, Ra, Rb
         def ANDS_func():
-            self.register[Ra] = self.register[Ra] & self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            regs[a] = regs[a] & regs[c]
+            set_flags(regs[a])
 
-        return ANDS_func
+        return self.decoded(ANDS_func, 'rr', a, c)
 
     def BICS(self, params):
         """
@@ -37,13 +40,16 @@ class Logic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        a, c = self.decode_registers(Ra, Rc)
+        regs = self.register.data
+        set_flags = self.register.set_NZ
 
         # BICS Ra, Ra, Rb
         def BICS_func():
-            self.register[Ra] = self.register[Ra] & (~self.register[Rc])
-            self.set_NZ_flags(self.register[Ra])
+            regs[a] = regs[a] & ~regs[c]
+            set_flags(regs[a])
 
-        return BICS_func
+        return self.decoded(BICS_func, 'rr', a, c)
 
     def EORS(self, params):
         """
@@ -54,17 +60,20 @@ class Logic(_Meta):
         Updates NZ flags
         Ra and Rb must be low registers
         """
-        Ra, Rb, Rc = self.get_three_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        a, c = self.decode_registers(Ra, Rc)
+        regs = self.register.data
+        set_flags = self.register.set_NZ
 
         # EORS Ra, Ra, Rb
         def EORS_func():
-            self.register[Ra] = self.register[Ra] ^ self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            regs[a] = regs[a] ^ regs[c]
+            set_flags(regs[a])
 
-        return EORS_func
+        return self.decoded(EORS_func, 'rr', a, c)
 
     def ORRS(self, params):
         """
@@ -75,17 +84,20 @@ class Logic(_Meta):
         Updates NZ flags
         Ra and Rb must be low registers
         """
-        Ra, Rb, Rc = self.get_three_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        a, c = self.decode_registers(Ra, Rc)
+        regs = self.register.data
+        set_flags = self.register.set_NZ
 
         # ORRS Ra, Ra, Rb
         def ORRS_func():
-            self.register[Ra] = self.register[Ra] | self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            regs[a] = regs[a] | regs[c]
+            set_flags(regs[a])
 
-        return ORRS_func
+        return self.decoded(ORRS_func, 'rr', a, c)
 
     def TST(self, params):
         """
@@ -98,9 +110,11 @@ class Logic(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        regs = self.register.data
+        set_flags = self.register.set_NZ
 
         def TST_func():
-            result = self.register[Ra] & self.register[Rb]
-            self.set_NZ_flags(result)
+            set_flags(regs[a] & regs[b])
 
-        return TST_func
+        return self.decoded(TST_func, 'rr', a, b)
@@ -1,9 +1,13 @@
+import re
 import iarm.exceptions
 from ._meta import _Meta
 
 
 class Memory(_Meta):
-    THREE_PARAMETER_WITH_BRACKETS = r'\s*([^\s,]*),\s*\[([^\s,]*),\s*([^\s,]*)\](,\s*[^\s,]*)*\s*'
+    THREE_PARAMETER_WITH_BRACKETS = re.compile(r'\s*([^\s,]*),\s*\[([^\s,]*),\s*([^\s,]*)\](,\s*[^\s,]*)*\s*')
+    TWO_PARAMETER_WITH_BRACKETS = re.compile(r'\s*([^\s,]*),\s*\[([^\s,]*)\](,\s*[^\s,]*)*\s*')
+    REGISTER_LIST = re.compile(r'\s*{(.*)}(.*)')
+    REGISTER_LIST_WRITE_BACK = re.compile(r'\s*([^\s,]*)!,\s*{(.*)}(.*)')
 
     def ADR(self, params):
         """
@@ -15,6 +19,8 @@ class Memory(_Meta):
         """
         # TODO may need to rethink how I do PC, may need to be byte alligned
         # TODO This is wrong as each address is a word, not a byte. The filled value with its location (Do we want that, or the value at that location [Decompiled instruction])
+        regs = self.register.data
+        mask = self.register.mask
         try:
             Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
         except iarm.exceptions.ParsingError:
@@ -22,20 +28,24 @@ class Memory(_Meta):
 
             # TODO the address must be within 1020 bytes of current PC
             self.check_arguments(low_registers=(Ra,), label_exists=(label,))
+            a = self.decode_register(Ra)
+            labels = self.labels
 
             def ADR_func():
-                self.register[Ra] = self.labels[label]  # TODO is this correct?
+                regs[a] = labels[label]  # TODO is this correct?
 
-            return ADR_func
+            return self.decoded(ADR_func, 'rl', a, label)
 
         self.check_arguments(low_registers=(Ra,), imm10_4=(Rc,))
         if Rb != 'PC':
             raise iarm.exceptions.IarmError("Second position argument is not PC: {}".format(Rb))
+        a, b = self.decode_registers(Ra, Rb)
+        c = self.check_immediate(Rc)
 
         def ADR_func():
-            self.register[Ra] = self.register[Rb] + self.convert_to_integer(Rc[1:])
+            regs[a] = (regs[b] + c) & mask
 
-        return ADR_func
+        return self.decoded(ADR_func, 'rri', a, b, c)
 
     def LDM(self, params):
         """
@@ -45,20 +55,25 @@ class Memory(_Meta):
         """
         # TODO what registers can be stored?
         # TODO add the load multiple with Ra in RLoList
-        Ra, RLoList = self.get_two_parameters(r'\s*([^\s,]*)!,\s*{(.*)}(.*)', params).split(',')
+        Ra, RLoList = self.get_two_parameters(self.REGISTER_LIST_WRITE_BACK, params)
         RLoList = RLoList.split(',')
         RLoList = [i.strip() for i in RLoList]
 
         self.check_arguments(low_registers=[Ra] + RLoList)
+        a = self.decode_register(Ra)
+        registers = self.decode_registers(*RLoList)
+        regs = self.register.data
+        mask = self.register.mask
+        memory = self.memory
 
         def LDM_func():
-            for i in range(len(RLoList)):
-                for j in range(4):
-                    self.memory[self.register[Ra] + 4*i + j] = ((self.register[RLoList[i]] >> (8 * j)) & 0xFF)
-                    self.register[RLoList[i]] = self.memory[self.register[Ra] + (4 * i) + j]
-            self.register[Ra] += 4*len(RLoList)
+            address = regs[a]
+            for register in registers:
+                regs[register] = memory.read_word(address)
+                address += 4
+            regs[a] = address & mask
 
-        return LDM_func
+        return self.decoded(LDM_func, 'rR', a, registers)
 
     def LDR(self, params):
         """
@@ -73,6 +88,8 @@ class Memory(_Meta):
         Ra, Rb, and Rc must be low registers
         """
         # TODO definition for PC is Ra <- M[PC + Imm10_4], Imm10_4 = PC - label, need to figure this one out
+        regs = self.register.data
+        memory = self.memory
         try:
             Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
         except iarm.exceptions.ParsingError:
@@ -85,89 +102,97 @@ class Memory(_Meta):
                 # TODO This does not work on instruction loading. This interpreter follows a harvard like architecture,
                 # TODO while ARMv6-M (Cortex-M0+) is a Von Neumann architeture. Instructions will not be decompiled
                 self.check_arguments(low_registers=(Ra,))
-                if label in self.labels:
-                    label = self.labels[label]
+                if label in self.labels and self.labels[label] is None:
+                    # The label is further on in the code being evaluated, so look it up when this runs
+                    a = self.decode_register(Ra)
+                    labels = self.labels
+                    mask = self.register.mask
+
+                    def LDR_func():
+                        regs[a] = labels[label] & mask
+
+                    return self.decoded(LDR_func, 'rl', a, label)
+                elif label in self.labels:
+                    value = self.labels[label]
                 elif label in self.equates:
-                    label = self.equates[label]
+                    value = self.equates[label]
+                    if isinstance(value, str):
+                        value = self.convert_to_integer(value.strip())
                 else:
                     try:
-                        label = int(self.convert_to_integer(label))
+                        value = int(self.convert_to_integer(label))
                     except ValueError:
                         raise iarm.exceptions.IarmError("'{}' is not a label, equate, or parsable integer".format(label))
 
                 # TODO this crashes if SPACE has not been hit yet.
                 # TODO find a way to defer this if it is not yet available
-                if int(label) % 4 != 0:
-                    raise iarm.exceptions.IarmError("Memory access not word aligned; Immediate: {}".format(int(label)))
+                if int(value) % 4 != 0:
+                    raise iarm.exceptions.IarmError("Memory access not word aligned; Immediate: {}".format(int(value)))
+                a = self.decode_register(Ra)
+                value &= self.register.mask
+
+                def LDR_func():
+                    regs[a] = value
+
+                return self.decoded(LDR_func, 'ri', a, value)
             elif label.startswith('[') and label.endswith(']'):
                 # TODO improve this
                 Rb = label[1:-1]
                 if Rb == 'SP' or Rb == 'R13':
                     self.check_arguments(low_registers=(Ra,))
                 else:
-                    self.check_arguments(low_registers=(Ra, label))
-
-                def LDR_func():
-                    if self.memory[Rb] % 4 != 0:
-                        raise iarm.exceptions.HardFault(
-                            "Memory access not word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                                 self.convert_to_integer(
-                                                                                                     Rc[1:])))
-                    self.register[Ra] = 0
-                    for i in range(4):
-                        self.register[Ra] |= (self.memory[self.register[Rb] + i] << (8 * i))
-                return LDR_func
+                    self.check_arguments(low_registers=(Ra, Rb))
+                Rc = '#0'
             else:
                 self.check_arguments(low_registers=(Ra,), label_exists=(label,))
-                try:
-                    label_value = self.labels[label]
-                    if label_value >= 1024:
-                        raise iarm.exceptions.IarmError("Label {} has value {} and is greater than 1020".format(label, label_value))
-                    if label_value % 4 != 0:
-                        raise iarm.exceptions.IarmError("Lable {} has value {} and is not word aligned".format(label, label_value))
-                    label = label_value  # TODO All converted values should be label_value
-                except KeyError:
+                a = self.decode_register(Ra)
+                labels = self.labels
+                if labels.get(label) is not None:
+                    value = labels[label]
+                    if value >= 1024:
+                        raise iarm.exceptions.IarmError("Label {} has value {} and is greater than 1020".format(label, value))
+                    if value % 4 != 0:
+                        raise iarm.exceptions.IarmError("Lable {} has value {} and is not word aligned".format(label, value))
+
+                    def LDR_func():
+                        regs[a] = value
+                else:
                     # Label doesn't exist, nothing we can do about that except maybe raise an exception now,
                     # But we're avoiding that elsewhere, might as well avoid it here too
-                    pass
-
-            def LDR_func():
-                # TODO dont overload label, make a new variable
-                try:
-                    self.register[Ra] = int(label)
-                except ValueError:
-                    self.register[Ra] = self.labels[label]
+                    def LDR_func():
+                        regs[a] = labels[label]
 
-            return LDR_func
+                return self.decoded(LDR_func, 'rl', a, label)
 
         if self.is_immediate(Rc):
-            if Rb == 'SP' or Rb == 'R15':
+            if Rb in ('SP', 'R13', 'R15'):
                 self.check_arguments(low_registers=(Ra,), imm10_4=(Rc,))
             else:
                 self.check_arguments(low_registers=(Ra, Rb), imm7_4=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
+            c = self.check_immediate(Rc)
 
             def LDR_func():
                 # TODO does memory read up?
-                if (self.register[Rb] + self.convert_to_integer(Rc[1:])) % 4 != 0:
-                    raise iarm.exceptions.HardFault("Memory access not word aligned; Register: {}  Immediate: {}".format(self.register[Rb], self.convert_to_integer(Rc[1:])))
-                self.register[Ra] = 0
-                for i in range(4):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] << (8 * i))
+                address = regs[b] + c
+                if address % 4 != 0:
+                    raise iarm.exceptions.HardFault("Memory access not word aligned; Register: {}  Immediate: {}".format(regs[b], c))
+                regs[a] = memory.read_word(address)
+
+            return self.decoded(LDR_func, 'rri', a, b, c)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def LDR_func():
                 # TODO does memory read up?
-                if (self.register[Rb] + self.register[Rc]) % 4 != 0:
+                address = regs[b] + regs[c]
+                if address % 4 != 0:
                     raise iarm.exceptions.HardFault(
-                        "Memory access not word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                             self.convert_to_integer(
-                                                                                                 Rc[1:])))
-                self.register[Ra] = 0
-                for i in range(4):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.register[Rc] + i] << (8 * i))
+                        "Memory access not word aligned; Register: {}  Register: {}".format(regs[b], regs[c]))
+                regs[a] = memory.read_word(address)
 
-        return LDR_func
+            return self.decoded(LDR_func, 'rrr', a, b, c)
 
     def LDRB(self, params):
         """
@@ -181,21 +206,28 @@ class Memory(_Meta):
             Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
         except iarm.exceptions.ParsingError:
             # LDRB Rn, [Rk] translates to an offset of zero
-            Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*\[([^\s,]*)\](,\s*[^\s,]*)*\s*', params)
+            Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_WITH_BRACKETS, params)
             Rc = '#0'
+        regs = self.register.data
+        memory = self.memory
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
+            c = self.check_immediate(Rc)
 
             def LDRB_func():
-                self.register[Ra] = self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:])]
+                regs[a] = memory.read_byte(regs[b] + c)
+
+            return self.decoded(LDRB_func, 'rri', a, b, c)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def LDRB_func():
-                self.register[Ra] = self.memory[self.register[Rb] + self.register[Rc]]
+                regs[a] = memory.read_byte(regs[b] + regs[c])
 
-        return LDRB_func
+            return self.decoded(LDRB_func, 'rrr', a, b, c)
 
     def LDRH(self, params):
         """
@@ -209,36 +241,37 @@ class Memory(_Meta):
             Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
         except iarm.exceptions.ParsingError:
             # LDRB Rn, [Rk] translates to an offset of zero
-            Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*\[([^\s,]*)\](,\s*[^\s,]*)*\s*', params)
+            Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_WITH_BRACKETS, params)
             Rc = '#0'
+        regs = self.register.data
+        memory = self.memory
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm6_2=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
+            c = self.check_immediate(Rc)
 
             def LDRH_func():
                 # TODO does memory read up?
-                if (self.register[Rb]) % 2 != 0:
+                if regs[b] % 2 != 0:
                     raise iarm.exceptions.HardFault(
-                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                                  self.convert_to_integer(
-                                                                                                      Rc[1:])))
-                self.register[Ra] = 0
-                for i in range(2):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] << (8 * i))
+                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(regs[b], c))
+                regs[a] = memory.read_halfword(regs[b] + c)
+
+            return self.decoded(LDRH_func, 'rri', a, b, c)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def LDRH_func():
                 # TODO does memory read up?
-                if (self.register[Rb] + self.register[Rc]) % 2 != 0:
+                address = regs[b] + regs[c]
+                if address % 2 != 0:
                     raise iarm.exceptions.HardFault(
-                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                                  self.register[Rc]))
-                self.register[Ra] = 0
-                for i in range(2):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.register[Rc] + i] << (8 * i))
+                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(regs[b], regs[c]))
+                regs[a] = memory.read_halfword(address)
 
-        return LDRH_func
+            return self.decoded(LDRH_func, 'rrr', a, b, c)
 
     def LDRSB(self, params):
         """
@@ -251,15 +284,18 @@ class Memory(_Meta):
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
 
         self.check_arguments(low_registers=(Ra, Rb, Rc))
+        a, b, c = self.decode_registers(Ra, Rb, Rc)
+        regs = self.register.data
+        memory = self.memory
 
         def LDRSB_func():
             # TODO does memory read up?
-            self.register[Ra] = 0
-            self.register[Ra] |= self.memory[self.register[Rb] + self.register[Rc]]
-            if self.register[Ra] & (1 << 7):
-                self.register[Ra] |= (0xFFFFFF << 8)
+            value = memory.read_byte(regs[b] + regs[c])
+            if value & (1 << 7):
+                value |= (0xFFFFFF << 8)
+            regs[a] = value
 
-        return LDRSB_func
+        return self.decoded(LDRSB_func, 'rrr', a, b, c)
 
     def LDRSH(self, params):
         """
@@ -272,20 +308,22 @@ class Memory(_Meta):
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
 
         self.check_arguments(low_registers=(Ra, Rb, Rc))
+        a, b, c = self.decode_registers(Ra, Rb, Rc)
+        regs = self.register.data
+        memory = self.memory
 
         def LDRSH_func():
             # TODO does memory read up?
-            if (self.register[Rb] + self.register[Rc]) % 2 != 0:
+            address = regs[b] + regs[c]
+            if address % 2 != 0:
                 raise iarm.exceptions.HardFault(
-                    "Memory access not half word aligned\nR{}: {}\nR{}: {}".format(Rb, self.register[Rb],
-                                                                                   Rc, self.register[Rc]))
-            self.register[Ra] = 0
-            for i in range(2):
-                self.register[Ra] |= (self.memory[self.register[Rb] + self.register[Rc] + i] << (8 * i))
-            if self.register[Ra] & (1 << 15):
-                self.register[Ra] |= (0xFFFF << 16)
+                    "Memory access not half word aligned\nR{}: {}\nR{}: {}".format(b, regs[b], c, regs[c]))
+            value = memory.read_halfword(address)
+            if value & (1 << 15):
+                value |= (0xFFFF << 16)
+            regs[a] = value
 
-        return LDRSH_func
+        return self.decoded(LDRSH_func, 'rrr', a, b, c)
 
     def POP(self, params):
         """
@@ -299,22 +337,20 @@ class Memory(_Meta):
         # TODO what registeres are allowed to POP to? Low Registers and PC
         # TODO need to support ranges, ie {R2, R5-R7}
         # TODO PUSH should reverse the list, not POP
-        RPopList = self.get_one_parameter(r'\s*{(.*)}(.*)', params).split(',')
-        RPopList.reverse()
-        RPopList = [i.strip() for i in RPopList]
+        RPopList = self.get_one_parameter(self.REGISTER_LIST, params)
+        registers = self.decode_register_list(RPopList)[::-1]
+        sp = self.decode_register('SP')
+        regs = self.register.data
+        mask = self.register.mask
+        memory = self.memory
 
         def POP_func():
-            for register in RPopList:
-                # Get 4 bytes
-                value = 0
-                for i in range(4):
-                    # TODO use memory width instead of constants
-                    value |= self.memory[self.register['SP'] + i] << (8 * i)
-
-                self.register[register] = value
-                self.register['SP'] += 4
+            for register in registers:
+                address = regs[sp]
+                regs[sp] = (address + 4) & mask
+                regs[register] = memory.read_word(address)
 
-        return POP_func
+        return self.decoded(POP_func, 'R', registers)
 
     def PUSH(self, params):
         """
@@ -325,18 +361,20 @@ class Memory(_Meta):
         """
         # TODO what registers are allowed to PUSH to? Low registers and LR
         # TODO PUSH should reverse the list, not POP
-        RPushList = self.get_one_parameter(r'\s*{(.*)}(.*)', params).split(',')
-        RPushList = [i.strip() for i in RPushList]
+        RPushList = self.get_one_parameter(self.REGISTER_LIST, params)
+        registers = self.decode_register_list(RPushList)
+        sp = self.decode_register('SP')
+        regs = self.register.data
+        mask = self.register.mask
+        memory = self.memory
 
         def PUSH_func():
-            for register in RPushList:
-                self.register['SP'] -= 4
+            for register in registers:
+                address = (regs[sp] - 4) & mask
+                regs[sp] = address
+                memory.write_word(address, regs[register])
 
-                for i in range(4):
-                    # TODO is this the same as with POP?
-                    self.memory[self.register['SP'] + i] = ((self.register[register] >> (8 * i)) & 0xFF)
-
-        return PUSH_func
+        return self.decoded(PUSH_func, 'R', registers)
 
     def STM(self, params):
         """
@@ -345,19 +383,25 @@ class Memory(_Meta):
         Store multiple registers into memory
         """
         # TODO what registers can be stored?
-        Ra, RLoList = self.get_two_parameters(r'\s*([^\s,]*)!,\s*{(.*)}(.*)', params).split(',')
+        Ra, RLoList = self.get_two_parameters(self.REGISTER_LIST_WRITE_BACK, params)
         RLoList = RLoList.split(',')
         RLoList = [i.strip() for i in RLoList]
 
         self.check_arguments(low_registers=[Ra] + RLoList)
+        a = self.decode_register(Ra)
+        registers = self.decode_registers(*RLoList)
+        regs = self.register.data
+        mask = self.register.mask
+        memory = self.memory
 
         def STM_func():
-            for i in range(len(RLoList)):
-                for j in range(4):
-                    self.memory[self.register[Ra] + 4*i + j] = ((self.register[RLoList[i]] >> (8 * j)) & 0xFF)
-            self.register[Ra] += 4*len(RLoList)
+            address = regs[a]
+            for register in registers:
+                memory.write_word(address, regs[register])
+                address += 4
+            regs[a] = address & mask
 
-        return STM_func
+        return self.decoded(STM_func, 'rR', a, registers)
 
     def STR(self, params):
         """
@@ -369,24 +413,29 @@ class Memory(_Meta):
         Ra, Rb, and Rc must be low registers
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
+        regs = self.register.data
+        memory = self.memory
 
         if self.is_immediate(Rc):
             if Rb == 'SP':
                 self.check_arguments(low_registers=(Ra,), imm10_4=(Rc,))
             else:
                 self.check_arguments(low_registers=(Ra, Rb), imm7_4=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
+            c = self.check_immediate(Rc)
 
             def STR_func():
-                for i in range(4):
-                    self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                memory.write_word(regs[b] + c, regs[a])
+
+            return self.decoded(STR_func, 'rri', a, b, c)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def STR_func():
-                for i in range(4):
-                    self.memory[self.register[Rb] + self.register[Rc] + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                memory.write_word(regs[b] + regs[c], regs[a])
 
-        return STR_func
+            return self.decoded(STR_func, 'rrr', a, b, c)
 
     def STRB(self, params):
         """
@@ -397,19 +446,26 @@ class Memory(_Meta):
         Ra, Rb, and Rc must be low registers
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
+        regs = self.register.data
+        memory = self.memory
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
+            c = self.check_immediate(Rc)
 
             def STRB_func():
-                self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:])] = (self.register[Ra] & 0xFF)
+                memory.write_byte(regs[b] + c, regs[a])
+
+            return self.decoded(STRB_func, 'rri', a, b, c)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def STRB_func():
-                self.memory[self.register[Rb] + self.register[Rc]] = (self.register[Ra] & 0xFF)
+                memory.write_byte(regs[b] + regs[c], regs[a])
 
-        return STRB_func
+            return self.decoded(STRB_func, 'rrr', a, b, c)
 
     def STRH(self, params):
         """
@@ -420,18 +476,23 @@ class Memory(_Meta):
         Ra, Rb, and Rc must be low registers
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
+        regs = self.register.data
+        memory = self.memory
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
+            c = self.check_immediate(Rc)
 
             def STRH_func():
-                for i in range(2):
-                    self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                memory.write_halfword(regs[b] + c, regs[a])
+
+            return self.decoded(STRH_func, 'rri', a, b, c)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            a, b, c = self.decode_registers(Ra, Rb, Rc)
 
             def STRH_func():
-                for i in range(2):
-                    self.memory[self.register[Rb] + self.register[Rc] + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                memory.write_halfword(regs[b] + regs[c], regs[a])
 
-        return STRH_func
+            return self.decoded(STRH_func, 'rrr', a, b, c)
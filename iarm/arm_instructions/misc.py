@@ -3,8 +3,22 @@ from ._meta import _Meta
 
 
 class Misc(_Meta):
-    def BKPT(self):
-        raise iarm.exceptions.NotImplementedError
+    def BKPT(self, params):
+        """
+        BKPT #imm8
+
+        Stop the program before this instruction, like a breakpoint
+        Running again carries on after it
+        The immediate is ignored
+        """
+        Rx = self.get_one_parameter(self.ONE_PARAMETER, params) or '#0'
+        self.check_arguments(imm8=(Rx,))
+        imm = self.check_immediate(Rx)
+
+        def BKPT_func():
+            raise iarm.exceptions.BreakpointHit()
+
+        return self.decoded(BKPT_func, 'i', imm)
 
     def CPSID(self):
         raise iarm.exceptions.NotImplementedError
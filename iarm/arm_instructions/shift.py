@@ -14,45 +14,49 @@ class Shift(_Meta):
         Ra, Rb, and Rc must be low registers
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
+        register = self.register
+        regs = register.data
+        set_flags = self.register.set_shift
+        mask = register.mask
+        bit_width = self._bit_width
 
         if self.is_register(Rc):
             # ASRS Ra, Ra, Rb
             self.check_arguments(low_registers=(Ra, Rc))
             self.match_first_two_parameters(Ra, Rb)
+            a, c = self.decode_registers(Ra, Rc)
 
             def ASRS_func():
-                # Set the C flag, or the last shifted out bit
-                if (self.register[Rc] > 0) and (self.register[Rb] & (1 << (self.register[Rc] - 1))):
-                    self.set_APSR_flag_to_value('C', 1)
-                else:
-                    self.set_APSR_flag_to_value('C', 0)
+                shift_amount = regs[c]
+                # The C flag is the last shifted out bit
+                carry = bool((shift_amount > 0) and (regs[a] & (1 << (shift_amount - 1))))
 
-                if self.register[Ra] & (1 << (self._bit_width - 1)):
-                    self.register[Ra] = (self.register[Ra] >> self.register[Rc]) | (
-                        int('1' * self.register[Rc], 2) << (self._bit_width - self.register[Rc]))
+                if regs[a] & (1 << (bit_width - 1)):
+                    # Fill the shifted in bits with the sign bit
+                    regs[a] = (regs[a] >> shift_amount) | (mask ^ (mask >> shift_amount))
                 else:
-                    self.register[Ra] = self.register[Ra] >> self.register[Rc]
-                self.set_NZ_flags(self.register[Ra])
+                    regs[a] = regs[a] >> shift_amount
+                set_flags(regs[a], carry)
+
+            return self.decoded(ASRS_func, 'rr', a, c)
         else:
             # ASRS Ra, Rb, #imm5_counting
             self.check_arguments(low_registers=(Ra, Rb), imm5_counting=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
             shift_amount = self.check_immediate(Rc)
+            sign_extension = mask ^ (mask >> shift_amount)
 
             def ASRS_func():
-                # Set the C flag, or the last shifted out bit
-                if self.register[Rb] & (1 << (shift_amount - 1)):
-                    self.set_APSR_flag_to_value('C', 1)
-                else:
-                    self.set_APSR_flag_to_value('C', 0)
+                # The C flag is the last shifted out bit
+                carry = bool(regs[b] & (1 << (shift_amount - 1)))
 
-                if self.register[Ra] & (1 << (self._bit_width - 1)):
-                    self.register[Ra] = (self.register[Ra] >> shift_amount) | (
-                        int('1' * shift_amount, 2) << (self._bit_width - shift_amount))
+                if regs[b] & (1 << (bit_width - 1)):
+                    regs[a] = (regs[b] >> shift_amount) | sign_extension
                 else:
-                    self.register[Ra] = self.register[Rb] >> shift_amount
-                self.set_NZ_flags(self.register[Ra])
+                    regs[a] = regs[b] >> shift_amount
+                set_flags(regs[a], carry)
 
-        return ASRS_func
+            return self.decoded(ASRS_func, 'rri', a, b, shift_amount)
 
     def LSLS(self, params):
         """
@@ -60,42 +64,56 @@ class Shift(_Meta):
         LSLS Ra, Rb, #imm5
 
         Logical shift left Rb by Rc or imm5 and store the result in Ra
-        imm5 is [0, 31]
+        imm5 is [0, 31], shifting by 0 leaves the C flag alone
         In the register shift, the first two operands must be the same register
         Ra, Rb, and Rc must be low registers
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
+        register = self.register
+        regs = register.data
+        set_flags = self.register.set_shift
+        mask = register.mask
+        bit_width = self._bit_width
 
         if self.is_register(Rc):
             # LSLS Ra, Ra, Rb
             self.check_arguments(low_registers=(Ra, Rc))
             self.match_first_two_parameters(Ra, Rb)
+            a, c = self.decode_registers(Ra, Rc)
 
             def LSLS_func():
-                # Set the C flag, or the last shifted out bit
-                if (self.register[Rc] < self._bit_width) and (self.register[Ra] & (1 << (self._bit_width - self.register[Rc]))):
-                    self.set_APSR_flag_to_value('C', 1)
-                else:
-                    self.set_APSR_flag_to_value('C', 0)
+                shift_amount = regs[c]
+                # The C flag is the last shifted out bit
+                carry = bool((shift_amount < bit_width) and (regs[a] & (1 << (bit_width - shift_amount))))
+
+                regs[a] = (regs[a] << shift_amount) & mask
+                set_flags(regs[a], carry)
 
-                self.register[Ra] = self.register[Ra] << self.register[Rc]
-                self.set_NZ_flags(self.register[Ra])
+            return self.decoded(LSLS_func, 'rr', a, c)
         else:
             # LSLS Ra, Rb, #imm5
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
             shift_amount = self.check_immediate(Rc)
 
+            if shift_amount == 0:
+                # Shifting by 0 is MOVS Ra, Rb, which leaves the C flag alone
+                set_flags = register.set_NZ
+
+                def LSLS_func():
+                    regs[a] = regs[b]
+                    set_flags(regs[a])
+
+                return self.decoded(LSLS_func, 'rri', a, b, shift_amount)
+
             def LSLS_func():
-                # Set the C flag, or the last shifted out bit
-                if (shift_amount < self._bit_width) and (self.register[Rb] & (1 << (self._bit_width - shift_amount))):
-                    self.set_APSR_flag_to_value('C', 1)
-                else:
-                    self.set_APSR_flag_to_value('C', 0)
+                # The C flag is the last shifted out bit
+                carry = bool((shift_amount < bit_width) and (regs[b] & (1 << (bit_width - shift_amount))))
 
-                self.register[Ra] = self.register[Rb] << shift_amount
-                self.set_NZ_flags(self.register[Ra])
+                regs[a] = (regs[b] << shift_amount) & mask
+                set_flags(regs[a], carry)
 
-        return LSLS_func
+            return self.decoded(LSLS_func, 'rri', a, b, shift_amount)
 
     def LSRS(self, params):
         """
@@ -108,37 +126,39 @@ class Shift(_Meta):
         Ra, Rb, and Rc must be low registers
         """
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
+        register = self.register
+        regs = register.data
+        set_flags = self.register.set_shift
 
         if self.is_register(Rc):
             # LSRS Ra, Ra, Rb
             self.check_arguments(low_registers=(Ra, Rc))
             self.match_first_two_parameters(Ra, Rb)
+            a, c = self.decode_registers(Ra, Rc)
 
             def LSRS_func():
-                # Set the C flag, or the last shifted out bit
-                if (self.register[Rc] > 0) and (self.register[Rb] & (1 << (self.register[Rc] - 1))):
-                    self.set_APSR_flag_to_value('C', 1)
-                else:
-                    self.set_APSR_flag_to_value('C', 0)
+                shift_amount = regs[c]
+                # The C flag is the last shifted out bit
+                carry = bool((shift_amount > 0) and (regs[a] & (1 << (shift_amount - 1))))
+
+                regs[a] = regs[a] >> shift_amount
+                set_flags(regs[a], carry)
 
-                self.register[Ra] = self.register[Ra] >> self.register[Rc]
-                self.set_NZ_flags(self.register[Ra])
+            return self.decoded(LSRS_func, 'rr', a, c)
         else:
             # LSRS Ra, Rb, #imm5_counting
             self.check_arguments(low_registers=(Ra, Rb), imm5_counting=(Rc,))
+            a, b = self.decode_registers(Ra, Rb)
             shift_amount = self.check_immediate(Rc)
 
             def LSRS_func():
-                # Set the C flag, or the last shifted out bit
-                if self.register[Rb] & (1 << (shift_amount - 1)):
-                    self.set_APSR_flag_to_value('C', 1)
-                else:
-                    self.set_APSR_flag_to_value('C', 0)
+                # The C flag is the last shifted out bit
+                carry = bool(regs[b] & (1 << (shift_amount - 1)))
 
-                self.register[Ra] = self.register[Rb] >> shift_amount
-                self.set_NZ_flags(self.register[Ra])
+                regs[a] = regs[b] >> shift_amount
+                set_flags(regs[a], carry)
 
-        return LSRS_func
+            return self.decoded(LSRS_func, 'rri', a, b, shift_amount)
 
     def RORS(self, params):
         """
@@ -14,13 +14,15 @@ class UnconditionalBranch(_Meta):
         self.check_arguments(label_exists=(label,))
         # TODO check if label is within +- 2 KB
 
+        labels = self.labels
+
         # B label
         def B_func():
             if label == '.':
                 raise iarm.exceptions.EndOfProgram("You have reached an infinite loop")
-            self.register['PC'] = self.labels[label]
+            return labels[label]
 
-        return B_func
+        return self.decoded(B_func, 'l', label)
 
     def BAL(self, params):
         """
@@ -41,12 +43,16 @@ class UnconditionalBranch(_Meta):
         self.check_arguments(label_exists=(label,))
         # TODO check if label is within +- 16 MB
 
+        pc, lr = self.decode_registers('PC', 'LR')
+        regs = self.register.data
+        labels = self.labels
+
         # BL label
         def BL_func():
-            self.register['LR'] = self.register['PC']  # No need for the + 1, PC already points to the next instruction
-            self.register['PC'] = self.labels[label]
+            regs[lr] = regs[pc]  # No need for the + 1, PC already points to the next instruction
+            return labels[label]
 
-        return BL_func
+        return self.decoded(BL_func, 'l', label, uses_pc=True)
 
     def BLX(self, params):
         """
@@ -57,12 +63,16 @@ class UnconditionalBranch(_Meta):
         Rj = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,))
+        j = self.decode_register(Rj)
+        pc, lr = self.decode_registers('PC', 'LR')
+        regs = self.register.data
 
         def BLX_func():
-            self.register['LR'] = self.register['PC']  # No need for the + 1, PC already points to the next instruction
-            self.register['PC'] = self.register[Rj]
+            target = regs[j]
+            regs[lr] = regs[pc]  # No need for the + 1, PC already points to the next instruction
+            return target
 
-        return BLX_func
+        return self.decoded(BLX_func, 'r', j, uses_pc=True)
 
     def BX(self, params):
         """
@@ -73,8 +83,10 @@ class UnconditionalBranch(_Meta):
         Rj = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,))
+        j = self.decode_register(Rj)
+        regs = self.register.data
 
         def BX_func():
-            self.register['PC'] = self.register[Rj]
+            return regs[j]
 
-        return BX_func
+        return self.decoded(BX_func, 'r', j)
@@ -0,0 +1,553 @@
+"""
+Assemble a program into Thumb machine code
+
+    image = iarm.assembler.assemble(source)
+    image.data      # The bytes of the program
+    image.symbols   # Label to byte address
+    image.code      # The (start, end) byte addresses of each run of instructions
+    image.save('program.bin')  # Also writes program.map
+
+The interpreter runs a list of decoded instructions, so its labels are instruction indices
+and data from DCD, DCH, DCB, and SPACE is kept in memory apart from the code.
+The assembler lays out the instructions and the data in the order they are written,
+at byte addresses from `base`, like a real assembler would.
+
+The source is evaluated by an `Arm` first, so it is checked the same way as when it is run,
+and each instruction is encoded from what it was decoded into (its op, form, and operands).
+Every instruction is 16 bits, except BL, MRS, and MSR which are 32.
+`LDR Ra, =value` loads the value from a literal pool put after everything else,
+which has to be within 1020 bytes of the LDR.
+Values and labels that can't be encoded, like a branch that is too far,
+raise a ValidationError pointing at the line.
+The symbol map marks where the code and data are with ARM mapping symbols,
+`$t` at the start of each run of instructions and `$d` at the start of each run of data,
+so the loader only decodes the code.
+
+From the command line
+
+    python -m iarm assemble program.s -o program.bin
+"""
+
+import argparse
+import collections
+import os
+import struct
+import sys
+import iarm.arm
+import iarm.exceptions
+
+# Condition codes of the conditional branches
+CONDITIONS = {
+    'BEQ': 0x0, 'BNE': 0x1, 'BCS': 0x2, 'BHS': 0x2, 'BCC': 0x3, 'BLO': 0x3, 'BMI': 0x4, 'BPL': 0x5,
+    'BVS': 0x6, 'BVC': 0x7, 'BHI': 0x8, 'BLS': 0x9, 'BGE': 0xA, 'BLT': 0xB, 'BGT': 0xC, 'BLE': 0xD,
+}
+
+# Instructions encoded as an opcode with Rm (or Rn) in bits 3-5 and Rd in bits 0-2,
+# by the position of those two registers in the decoded operands
+TWO_LOW_REGISTERS = {
+    'ANDS': 0x4000, 'EORS': 0x4040, 'ADCS': 0x4140, 'SBCS': 0x4180, 'TST': 0x4200, 'RSBS': 0x4240,
+    'CMN': 0x42C0, 'ORRS': 0x4300, 'MULS': 0x4340, 'BICS': 0x4380, 'MVNS': 0x43C0,
+    'SXTH': 0xB200, 'SXTB': 0xB240, 'UXTH': 0xB280, 'UXTB': 0xB2C0,
+    'REV': 0xBA00, 'REV16': 0xBA40, 'REVSH': 0xBAC0, 'MOVS': 0x0000,
+}
+
+# Shifts: (by register, by immediate)
+SHIFTS = {'LSLS': (0x4080, 0x0000), 'LSRS': (0x40C0, 0x0800), 'ASRS': (0x4100, 0x1000)}
+
+# Loads and stores: (register offset, immediate offset, bytes accessed)
+LOADS_STORES = {
+    'STR': (0x5000, 0x6000, 4), 'LDR': (0x5800, 0x6800, 4),
+    'STRB': (0x5400, 0x7000, 1), 'LDRB': (0x5C00, 0x7800, 1),
+    'STRH': (0x5200, 0x8000, 2), 'LDRH': (0x5A00, 0x8800, 2),
+    'LDRSB': (0x5600, None, 1), 'LDRSH': (0x5E00, None, 2),
+}
+
+# SYSm of the special registers, for MRS and MSR
+SPECIAL_REGISTERS = {
+    'APSR': 0, 'IAPSR': 1, 'EAPSR': 2, 'PSR': 3, 'XPSR': 3, 'IPSR': 5, 'EPSR': 6, 'IEPSR': 7,
+    'MSP': 8, 'PSP': 9, 'PRIMASK': 16, 'BASEPRI': 17, 'FAULTMASK': 19, 'CONTROL': 20,
+}
+
+SP, LR, PC = 13, 14, 15
+
+# Mapping symbols, marking the start of Thumb code and of data
+CODE_SYMBOL = '$t'
+DATA_SYMBOL = '$d'
+
+# An instruction or data in the image
+# address is its byte address, size its number of bytes,
+# and index its place in the program for instructions (None for data)
+Item = collections.namedtuple('Item', 'address size index line text')
+
+
+class Image(object):
+    """
+    An assembled program: its bytes, and where each label and instruction is
+    """
+    def __init__(self, base=0):
+        """
+        :param base: The byte address of the start of the image
+        """
+        self.base = base
+        self.data = bytearray()
+        self.symbols = {}  # Label to byte address
+        self.addresses = []  # The byte address of each instruction in the program, by index
+        self.items = []  # Item of each instruction, piece of data, and the literal pool, in order
+
+    @property
+    def code(self):
+        """
+        :return: A list of the (start, end) byte addresses of each run of instructions, in order
+        """
+        ranges = []
+        for item in self.items:
+            if item.index is None:
+                continue
+            if ranges and ranges[-1][1] == item.address:
+                ranges[-1] = (ranges[-1][0], item.address + item.size)
+            else:
+                ranges.append((item.address, item.address + item.size))
+        return ranges
+
+    def __len__(self):
+        return len(self.data)
+
+    def halfword(self, address):
+        """
+        :param address: A byte address in the image
+        :return: The little endian halfword there
+        """
+        return struct.unpack_from('<H', self.data, address - self.base)[0]
+
+    def format_map(self):
+        """
+        List the labels and their addresses, and the mapping symbols of the code and data, in address order
+        :return: The text of the symbol map
+        """
+        symbols = list(self.symbols.items())
+        code = self.code
+        if self.data and (not code or code[0][0] > self.base):
+            symbols.append((DATA_SYMBOL, self.base))
+        for start, end in code:
+            symbols.append((CODE_SYMBOL, start))
+            if end < self.base + len(self.data):
+                symbols.append((DATA_SYMBOL, end))
+        lines = ['0x{:08X} {}'.format(address, label)
+                 for label, address in sorted(symbols, key=lambda item: (item[1], item[0]))]
+        return '\n'.join(lines) + '\n'
+
+    def format_listing(self):
+        """
+        List each instruction and piece of data with its address and bytes
+        :return: The text of the listing
+        """
+        lines = []
+        for item in self.items:
+            start = item.address - self.base
+            encoding = ' '.join('{:02X}'.format(b) for b in self.data[start:start + min(item.size, 4)])
+            if item.size > 4:
+                encoding += ' ...'
+            lines.append('0x{:08X}  {:<14} {}'.format(item.address, encoding, item.text))
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path, map_path=None):
+        """
+        Write the image as a flat binary, and its symbol map
+        :param path: Where to write the binary
+        :param map_path: Where to write the symbol map, defaults to path with a .map extension
+        :return:
+        """
+        if map_path is None:
+            map_path = os.path.splitext(path)[0] + '.map'
+        with open(path, 'wb') as f:
+            f.write(self.data)
+        with open(map_path, 'w') as f:
+            f.write(self.format_map())
+
+
+class Assembler(object):
+    """
+    Lays out a program at byte addresses and encodes its instructions
+    """
+    DATA_DIRECTIVES = {'DCD': (4, 4), 'DCH': (2, 2), 'DCB': (1, 1)}  # Bytes per value and alignment
+
+    def __init__(self, base=0, memory_size=1024):
+        """
+        :param base: The byte address the image starts at
+        :param memory_size: The memory of the interpreter the source is checked with
+        """
+        if base % 4:
+            raise iarm.exceptions.ValidationError("The base address {} is not word aligned".format(base))
+        self.base = base
+        self.memory_size = memory_size
+
+    def assemble(self, source, origin=None):
+        """
+        Assemble source into an image
+        :param source: The program
+        :param origin: Where the program came from, for error messages
+        :return: The Image
+        """
+        cpu = iarm.arm.Arm(self.memory_size, False)
+        cpu.evaluate(source, origin)  # Execution is postponed, this checks and decodes the program
+        self.cpu = cpu
+        image = Image(self.base)
+        self.literals = collections.OrderedDict()  # Each literal value (or Label), in the order they are used
+        self.loads = {}  # Index of each `LDR Ra, =value` to the literal it loads
+        pieces = self.lay_out(cpu.parse_lines(source), image)
+
+        end = image.items[-1].address + image.items[-1].size if image.items else image.base
+        pool = self.align(end, 4)
+        literal_addresses = {value: pool + 4 * i for i, value in enumerate(self.literals)}
+
+        for item, piece in zip(image.items, pieces):
+            if item.index is not None:
+                try:
+                    piece = self.encode(cpu.program[item.index], item, image.symbols, literal_addresses)
+                except iarm.exceptions.IarmError as e:
+                    e.args = (cpu.locate(item.index),) + e.args
+                    raise
+            image.data += b'\x00' * (item.address - image.base - len(image.data))  # Alignment padding
+            image.data += piece
+
+        if self.literals:
+            image.data += b'\x00' * (pool - image.base - len(image.data))
+            image.items.append(Item(pool, 4 * len(self.literals), None, None, '(literal pool)'))
+            for value in self.literals:
+                if isinstance(value, Label):
+                    value = image.symbols[value]
+                image.data += struct.pack('<I', value & 0xFFFFFFFF)
+        return image
+
+    @staticmethod
+    def align(address, alignment):
+        return address + (-address % alignment)
+
+    def lay_out(self, lines, image):
+        """
+        Give each instruction and piece of data its address, and each label the address of what follows it
+        :param lines: The parsed source lines
+        :param image: The Image, whose items, addresses, and symbols are filled in
+        :return: The bytes of each item, None for instructions until they are encoded
+        """
+        cpu = self.cpu
+        address = image.base
+        index = 0
+        waiting = []  # Labels on lines without anything, given the address of the next item
+        pieces = []
+        for line_number, (label, op, params) in enumerate(lines, 1):
+            if label and op not in ('EQU',):
+                waiting.append(label)
+            if not op:
+                continue
+            text = ' '.join(part for part in (label, op, params.strip()) if part)
+
+            if op in cpu.directives:
+                piece, alignment = self.directive(op, params, line_number)
+                if piece is None:
+                    continue
+            else:
+                instruction = cpu.program[index]
+                piece = None
+                alignment = 2
+                if op == 'LDR' and params.split(',', 1)[1].strip().startswith('='):
+                    self.loads[index] = self.literal(params)
+                    self.literals[self.loads[index]] = None
+
+            address = self.align(address, alignment)
+            for name in waiting:
+                image.symbols[name] = address
+            waiting = []
+            if piece is None:
+                size = 4 if instruction.op in ('BL', 'MRS', 'MSR') else 2
+                image.addresses.append(address)
+                image.items.append(Item(address, size, index, line_number, text))
+                index += 1
+            else:
+                size = len(piece)
+                image.items.append(Item(address, size, None, line_number, text))
+            pieces.append(piece)
+            address += size
+
+        for name in waiting:
+            image.symbols[name] = address
+        return pieces
+
+    def literal(self, params):
+        """
+        Get the value of `LDR Ra, =value` as it will be in the image
+        :param params: The parameters of the LDR
+        :return: The value, or the label whose address is the value
+        """
+        value = params.split(',', 1)[1].strip()[1:]
+        if value in self.cpu.labels:
+            return Label(value)
+        if value in self.cpu.equates:
+            value = str(self.cpu.equates[value]).strip()
+        return self.cpu.convert_to_integer(value)
+
+    def directive(self, op, params, line_number):
+        """
+        Lay out a directive that puts data in the image
+        :param op: The directive
+        :param params: Its parameters
+        :param line_number: The line it is on
+        :return: The bytes and their alignment, or None and None for directives that don't add anything
+        """
+        params = params.strip()
+        if op == 'SPACE':
+            return bytes(self.value(params, line_number)), 1
+        if op == 'ALIGN':
+            return b'', self.value(params, line_number) if params else 4
+        if op not in self.DATA_DIRECTIVES:
+            return None, None
+        size, alignment = self.DATA_DIRECTIVES[op]
+        piece = bytearray()
+        for value in params.split(','):
+            value = self.value(value.strip(), line_number)
+            if not -(1 << (8 * size - 1)) <= value < (1 << (8 * size)):
+                raise iarm.exceptions.ValidationError("Line {}; {} value {} does not fit in {} bytes".format(
+                    line_number, op, value, size))
+            piece += (value & ((1 << (8 * size)) - 1)).to_bytes(size, 'little')
+        return bytes(piece), alignment
+
+    def value(self, text, line_number):
+        """
+        :param text: A number or equate
+        :param line_number: The line it is on
+        :return: Its value
+        """
+        if text in self.cpu.equates:
+            text = str(self.cpu.equates[text]).strip()
+        try:
+            return self.cpu.convert_to_integer(text.lstrip('#'))
+        except ValueError:
+            raise iarm.exceptions.ValidationError("Line {}; '{}' is not a number".format(line_number, text))
+
+    def encode(self, instruction, item, symbols, literal_addresses):
+        """
+        Encode a decoded instruction
+        :param instruction: The decoded instruction
+        :param item: Its Item in the image
+        :param symbols: Label to byte address
+        :param literal_addresses: Literal value to its address in the literal pool
+        :return: The bytes of the instruction
+        """
+        op = instruction.op
+        form = instruction.form
+        operands = instruction.operands
+        address = item.address
+
+        def target(label):
+            if label == '.':
+                return address
+            if symbols.get(label) is None:
+                raise iarm.exceptions.ValidationError("Label {} is not defined".format(label))
+            return symbols[label]
+
+        def offset(label, low, high):
+            # Branches are relative to the PC, which is 4 bytes after the instruction
+            distance = target(label) - (address + 4)
+            if not low <= distance <= high:
+                raise iarm.exceptions.ValidationError("{} is {} bytes away, more than a {} can reach".format(
+                    label, distance, op))
+            return distance
+
+        def word_offset(value_address, description):
+            # Loads from the PC are relative to the word aligned PC, and can only go forward
+            distance = value_address - ((address + 4) & ~3)
+            if not 0 <= distance <= 1020 or distance % 4:
+                raise iarm.exceptions.ValidationError("{} at {} can't be reached from {}".format(
+                    description, value_address, address))
+            return distance >> 2
+
+        if op in CONDITIONS:
+            return halfwords(0xD000 | CONDITIONS[op] << 8 | (offset(operands[0], -256, 254) >> 1) & 0xFF)
+        if op == 'B':
+            return halfwords(0xE000 | (offset(operands[0], -2048, 2046) >> 1) & 0x7FF)
+        if op == 'BL':
+            distance = offset(operands[0], -(1 << 24), (1 << 24) - 2)
+            s = (distance >> 24) & 1
+            j1 = (~(distance >> 23) ^ s) & 1
+            j2 = (~(distance >> 22) ^ s) & 1
+            return halfwords(0xF000 | s << 10 | (distance >> 12) & 0x3FF,
+                             0xD000 | j1 << 13 | j2 << 11 | (distance >> 1) & 0x7FF)
+        if op in ('BX', 'BLX'):
+            return halfwords((0x4700 if op == 'BX' else 0x4780) | operands[0] << 3)
+        if op == 'NOP':
+            return halfwords(0xBF00)
+        if op == 'BKPT':
+            return halfwords(0xBE00 | imm(operands[0], 8))
+        if op == 'MRS':
+            return halfwords(0xF3EF, 0x8000 | operands[0] << 8 | special(operands[1]))
+        if op == 'MSR':
+            return halfwords(0xF380 | operands[1], 0x8800 | special(operands[0]))
+
+        if op in TWO_LOW_REGISTERS and form == 'rr':
+            d, m = operands
+            return halfwords(TWO_LOW_REGISTERS[op] | low(m) << 3 | low(d))
+        if op == 'MOVS':
+            d, value = operands
+            return halfwords(0x2000 | low(d) << 8 | imm(value, 8))
+        if op == 'MOV':
+            d, m = operands
+            return halfwords(0x4600 | (d & 8) << 4 | m << 3 | d & 7)
+        if op in SHIFTS:
+            by_register, by_immediate = SHIFTS[op]
+            if form == 'rr':
+                d, m = operands
+                return halfwords(by_register | low(m) << 3 | low(d))
+            d, m, amount = operands
+            return halfwords(by_immediate | imm(amount & 31, 5) << 6 | low(m) << 3 | low(d))
+
+        if op in ('ADDS', 'SUBS'):
+            d, n, m = operands
+            subtract = 0x0200 if op == 'SUBS' else 0
+            if form == 'rrr':
+                return halfwords(0x1800 | subtract | low(m) << 6 | low(n) << 3 | low(d))
+            if d == n:
+                return halfwords((0x3000 | subtract << 2) | low(d) << 8 | imm(m, 8))
+            return halfwords(0x1C00 | subtract | imm(m, 3) << 6 | low(n) << 3 | low(d))
+        if op == 'CMP':
+            n, m = operands
+            if form == 'ri':
+                return halfwords(0x2800 | low(n) << 8 | imm(m, 8))
+            if n < 8 and m < 8:
+                return halfwords(0x4280 | m << 3 | n)
+            return halfwords(0x4500 | (n & 8) << 4 | m << 3 | n & 7)
+        if op == 'ADD':
+            d, n, m = operands
+            if form == 'rrr':
+                return halfwords(0x4400 | (d & 8) << 4 | m << 3 | d & 7)
+            if d == SP:
+                return halfwords(0xB000 | imm(m, 9, 4))
+            return halfwords((0xA800 if n == SP else 0xA000) | low(d) << 8 | imm(m, 10, 4))
+        if op == 'SUB':
+            return halfwords(0xB080 | imm(operands[2], 9, 4))
+
+        if op == 'ADR':
+            if form == 'rl':
+                d, label = operands
+                return halfwords(0xA000 | low(d) << 8 | word_offset(target(label), label))
+            d, n, value = operands
+            return halfwords(0xA000 | low(d) << 8 | imm(value, 10, 4))
+        if op == 'LDR' and item.index in self.loads:
+            literal_address = literal_addresses[self.loads[item.index]]
+            return halfwords(0x4800 | low(operands[0]) << 8 | word_offset(literal_address, 'The literal pool'))
+        if op == 'LDR' and form == 'rl':
+            d, label = operands
+            return halfwords(0x4800 | low(d) << 8 | word_offset(target(label), label))
+        if op in LOADS_STORES:
+            by_register, by_immediate, size = LOADS_STORES[op]
+            t, n, m = operands
+            if form == 'rrr':
+                return halfwords(by_register | low(m) << 6 | low(n) << 3 | low(t))
+            if n in (SP, PC) and size == 4:
+                if n == PC:
+                    return halfwords(0x4800 | low(t) << 8 | imm(m, 10, 4))
+                return halfwords((0x9800 if op == 'LDR' else 0x9000) | low(t) << 8 | imm(m, 10, 4))
+            scale = size.bit_length() - 1
+            return halfwords(by_immediate | imm(m, 5 + scale, size) << 6 | low(n) << 3 | low(t))
+
+        if op in ('LDM', 'STM'):
+            n, registers = operands
+            return halfwords((0xC800 if op == 'LDM' else 0xC000) | low(n) << 8 | register_list(registers))
+        if op in ('PUSH', 'POP'):
+            extra = LR if op == 'PUSH' else PC
+            bits = register_list([r for r in operands[0] if r != extra])
+            if extra in operands[0]:
+                bits |= 0x100
+            return halfwords((0xB400 if op == 'PUSH' else 0xBC00) | bits)
+
+        raise iarm.exceptions.NotImplementedError("{} {} can't be assembled".format(op, form))
+
+
+class Label(str):
+    """
+    A literal that is the address of a label, filled in once the label has an address
+    """
+
+
+def halfwords(*values):
+    """
+    :param values: The halfwords of an instruction, in order
+    :return: Their little endian bytes
+    """
+    return struct.pack('<{}H'.format(len(values)), *values)
+
+
+def low(register):
+    """
+    :param register: A register index
+    :return: The index, if it is a low register
+    """
+    if register > 7:
+        raise iarm.exceptions.ValidationError("R{} can't be encoded here, it must be a low register".format(register))
+    return register
+
+
+def imm(value, bits, scale=1):
+    """
+    Check an immediate fits its field
+    :param value: The immediate
+    :param bits: How many bits it can use (before being scaled down)
+    :param scale: What it must be a multiple of, it is divided by this to be encoded
+    :return: The encoded immediate
+    """
+    if value % scale or not 0 <= value < (1 << bits):
+        raise iarm.exceptions.ValidationError("The immediate {} can't be encoded in {} bits{}".format(
+            value, bits, " as a multiple of {}".format(scale) if scale > 1 else ''))
+    return value // scale
+
+
+def special(name):
+    return SPECIAL_REGISTERS[name]
+
+
+def register_list(registers):
+    """
+    :param registers: Low register indices
+    :return: A bit set for each register
+    """
+    bits = 0
+    for register in registers:
+        bits |= 1 << low(register)
+    return bits
+
+
+def assemble(source, origin=None, base=0):
+    """
+    Assemble source into an image
+    :param source: The program
+    :param origin: Where the program came from, for error messages
+    :param base: The byte address the image starts at
+    :return: The Image
+    """
+    return Assembler(base).assemble(source, origin)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m iarm.assembler', description="Assemble Thumb machine code")
+    parser.add_argument('file', help="The source file")
+    parser.add_argument('-o', '--output', help="The binary to write, defaults to the source with a .bin extension")
+    parser.add_argument('--map', help="The symbol map to write, defaults to the binary with a .map extension")
+    parser.add_argument('--base', type=lambda text: int(text, 0), default=0, help="Address of the start of the code")
+    parser.add_argument('--listing', action='store_true', help="Print the address and bytes of each line")
+    args = parser.parse_args(argv)
+
+    with open(args.file) as f:
+        source = f.read()
+    output = args.output or os.path.splitext(args.file)[0] + '.bin'
+    try:
+        image = assemble(source, args.file, args.base)
+    except iarm.exceptions.IarmError as e:
+        print('{}: {}'.format(type(e).__name__, ' '.join(str(arg) for arg in e.args)), file=sys.stderr)
+        return 1
+    image.save(output, args.map)
+    if args.listing:
+        print(image.format_listing(), end='')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Run many independent programs in parallel
+
+Each program (and set of inputs) is a Job, run in a pool of worker processes.
+Every worker builds one interpreter when it starts and restores it to a blank
+snapshot before each job, so jobs don't pay for building a new interpreter
+and share its decode cache.
+
+Jobs are run a chunk of instructions at a time, checking the time between chunks,
+so a job that loops forever stops at its step limit or timeout
+instead of tying up its worker.
+
+Run from the command line with
+
+    python -m iarm.batch program.s other.s --steps 10000 --timeout 5
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import sys
+import time
+
+Job = collections.namedtuple('Job', 'name source registers memory steps timeout')
+Job.__new__.__defaults__ = (None, None, None, None)  # Only the name and source are needed
+Job.__doc__ = """
+A program to run, with its inputs
+
+registers is a dict of register names to values, set after the program is evaluated.
+memory is a dict of byte addresses to words, written after the program is evaluated.
+steps is the most instructions to run, and timeout the most seconds to run for, None for no limit.
+"""
+
+Result = collections.namedtuple('Result', 'name registers memory steps error')
+Result.__doc__ = """
+The outcome of a Job
+
+registers is a dict of all register names to their final values.
+memory is a dict of the byte addresses changed by running the program to their new values.
+steps is how many instructions were run.
+error is None, or the name of the exception and its message if the job failed.
+"""
+
+
+class Timeout(Exception):
+    """
+    Raised when a job has run for longer than its timeout
+    """
+
+
+CHUNK_STEPS = 10000  # Instructions to run between checking the time
+MEMORY_SIZE = 1024
+
+_interpreter = None  # Each worker process's interpreter, and the snapshot to restore it to
+_blank = None
+
+
+def _start_worker(memory_size, compile_blocks, memory_file=None):
+    """
+    Build the interpreter a worker process uses for all of its jobs
+    :param memory_size: The memory size of the interpreter
+    :param compile_blocks: Should the interpreter compile basic blocks
+    :param memory_file: A file to map as the memory of the interpreter, instead of memory_size bytes
+    :return:
+    """
+    global _interpreter, _blank
+    import iarm.arm
+    _interpreter = iarm.arm.Arm(memory_size, False, compile_blocks=compile_blocks, memory_file=memory_file)
+    _blank = _interpreter.snapshot()
+    if memory_file is not None:
+        # Mapping the file again is quicker than copying it back, and keeps the pages shared between workers
+        _blank = _blank._replace(memory=None)
+
+
+def _run_for(interpreter, steps, timeout):
+    """
+    Run until the end of the program, steps instructions, or timeout seconds
+    :param interpreter: The interpreter to run
+    :param steps: The most instructions to run, None for no limit
+    :param timeout: The most seconds to run for, None for no limit
+    :return: The number of instructions run
+    """
+    if timeout is None:
+        return interpreter.run(steps)
+
+    deadline = time.monotonic() + timeout
+    total = 0
+    while True:
+        chunk = CHUNK_STEPS if steps is None else min(CHUNK_STEPS, steps - total)
+        if chunk <= 0:
+            return total
+        try:
+            interpreter.run(chunk)
+        finally:
+            # Keep the count for the whole job, even if the chunk raised
+            ran = interpreter.steps_run
+            total += ran
+            interpreter.steps_run = total
+        if ran < chunk:
+            return total  # Reached the end of the program
+        if time.monotonic() > deadline:
+            raise Timeout("Ran for more than {} seconds".format(timeout))
+
+
+def run_job(job):
+    """
+    Run a single job in this process
+    :param job: The Job to run
+    :return: The Result
+    """
+    if _interpreter is None:
+        _start_worker(MEMORY_SIZE, False)
+    interpreter = _interpreter
+    if _blank.memory is None:
+        interpreter.memory.remap()
+    interpreter.restore(_blank)
+    interpreter.steps_run = 0
+    before = interpreter.memory.save()
+    error = None
+    try:
+        interpreter.evaluate(job.source, job.name)
+        for name, value in (job.registers or {}).items():
+            interpreter.register[name] = value
+        for address, value in (job.memory or {}).items():
+            interpreter.memory.write_word(int(address), value)
+        before = interpreter.memory.save()  # Only report what running the program changed
+        _run_for(interpreter, job.steps, job.timeout)
+    except Exception as e:
+        error = '{}: {}'.format(type(e).__name__, ' '.join(str(arg) for arg in e.args))
+
+    return Result(job.name, dict(interpreter.register.items()), interpreter.memory.changes(before),
+                  interpreter.steps_run, error)
+
+
+def run_jobs(jobs, workers=None, memory_size=MEMORY_SIZE, compile_blocks=False, memory_file=None):
+    """
+    Run jobs in a pool of worker processes
+    :param jobs: An iterable of Job
+    :param workers: How many processes to use, None for one per CPU, 0 to run in this process
+    :param memory_size: The memory size of each interpreter
+    :param compile_blocks: Should the interpreters compile basic blocks
+    :param memory_file: A file each job starts with as its memory, mapped so the workers share it
+    :return: An iterator of Result, in the same order as jobs
+    """
+    if workers == 0:
+        _start_worker(memory_size, compile_blocks, memory_file)
+        return map(run_job, jobs)
+
+    executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=_start_worker,
+                                                      initargs=(memory_size, compile_blocks, memory_file))
+
+    def results():
+        with executor:
+            yield from executor.map(run_job, jobs)
+    return results()
+
+
+def load_jobs(paths, vectors=None, steps=None, timeout=None):
+    """
+    Make the jobs for a set of source files
+    :param paths: The paths to the source files
+    :param vectors: A dict of path to a list of inputs, each a dict with optional 'registers' and 'memory'.
+    A job is made for each input, files without any inputs get one job
+    :param steps: The most instructions each job can run
+    :param timeout: The most seconds each job can run for
+    :return: A list of Job
+    """
+    vectors = vectors or {}
+    jobs = []
+    for path in paths:
+        with open(path) as f:
+            source = f.read()
+        inputs = vectors.get(path) or [{}]
+        for i, vector in enumerate(inputs):
+            name = path if len(inputs) == 1 else '{}[{}]'.format(path, i)
+            jobs.append(Job(name, source, vector.get('registers'), vector.get('memory'), steps, timeout))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m iarm.batch', description="Run many ARM programs in parallel")
+    parser.add_argument('files', nargs='+', help="Source files to run")
+    parser.add_argument('--vectors', help="JSON file mapping each source file to a list of inputs, "
+                                          "like [{\"registers\": {\"R0\": 1}, \"memory\": {\"0\": 5}}]")
+    parser.add_argument('--steps', type=int, help="Most instructions to run for each job")
+    parser.add_argument('--timeout', type=float, help="Most seconds to run for each job")
+    parser.add_argument('--workers', type=int, help="Worker processes, defaults to one per CPU")
+    parser.add_argument('--memory-size', type=int, default=MEMORY_SIZE, help="Bytes of memory for each job")
+    parser.add_argument('--compile-blocks', action='store_true', help="Compile basic blocks")
+    parser.add_argument('--memory-file', help="A file to start each job's memory with, instead of --memory-size")
+    args = parser.parse_args(argv)
+
+    vectors = None
+    if args.vectors:
+        with open(args.vectors) as f:
+            vectors = json.load(f)
+
+    jobs = load_jobs(args.files, vectors, args.steps, args.timeout)
+    failed = False
+    for result in run_jobs(jobs, args.workers, args.memory_size, args.compile_blocks, args.memory_file):
+        failed = failed or result.error is not None
+        print(json.dumps(result._asdict()))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,545 @@
+"""
+Compile basic blocks of a program into single python functions
+
+A basic block runs from an instruction up to and including the next branch,
+or up to the next labeled instruction.
+Each block is turned into python source, with the registers and flags it uses
+held in local variables, and compiled with `compile`.
+Instructions that don't have a template are called like they are in the run loop,
+with the locals written back to the register file around them.
+
+A block that ends by branching back to its own start (a tight loop)
+can also be compiled into a python `while` loop, only writing the locals back once it exits.
+As it runs any number of times in one call, it is only used when the steps are not limited.
+"""
+
+import re
+
+
+class BlockCompiler(object):
+    """
+    Compile and cache the basic blocks of an interpreter's program
+
+    Blocks are compiled the first time they are entered and are keyed by the
+    index of their first instruction.
+    The cache must be cleared with `clear` whenever the program or labels change.
+    """
+    BRANCHES = ('B', 'BL', 'BLX', 'BX', 'BCC', 'BCS', 'BEQ', 'BGE', 'BGT', 'BHI', 'BHS', 'BLE',
+                'BLO', 'BLS', 'BLT', 'BMI', 'BNE', 'BPL', 'BVC', 'BVS')
+    CONDITIONS = {
+        'BCC': 'not c',
+        'BCS': 'c',
+        'BEQ': 'z',
+        'BGE': 'n == v',
+        'BGT': '(n == v) and not z',
+        'BHI': 'c and not z',
+        'BHS': 'c',
+        'BLE': 'z or (n != v)',
+        'BLO': 'not c',
+        'BLS': '(not c) or z',
+        'BLT': 'n != v',
+        'BMI': 'n',
+        'BNE': 'not z',
+        'BPL': 'not n',
+        'BVC': 'not v',
+        'BVS': 'v',
+    }
+    FLAGS = ('n', 'z', 'c', 'v')
+
+    def __init__(self, cpu):
+        """
+        :param cpu: The interpreter whose program is compiled
+        """
+        self.cpu = cpu
+        self.blocks = {}  # Start index to compiled block
+
+    def clear(self):
+        """
+        Forget all compiled blocks
+        :return:
+        """
+        self.blocks.clear()
+
+    def get(self, start, loop=False):
+        """
+        Get the block starting at start, compiling it if it hasn't been yet
+        :param start: The index of the first instruction in the block
+        :param loop: Can the block loop back to its start without returning
+        :return: The block function. Calling it runs the block and returns the index of the next instruction
+        """
+        block = self.blocks.get((start, loop))
+        if block is None:
+            block = self.blocks[(start, loop)] = self.compile(start, loop)
+        return block
+
+    def find_block(self, start):
+        """
+        Find the instructions that make up the block starting at start
+        :param start: The index of the first instruction in the block
+        :return: The list of instructions
+        """
+        program = self.cpu.program
+        leaders = set(self.cpu.labels.values())
+        end = start
+        while end < len(program):
+            instruction = program[end]
+            end += 1
+            if instruction.op in self.BRANCHES or instruction.uses_pc or end in leaders:
+                break
+        return program[start:end]
+
+    def compile(self, start, loop=False):
+        """
+        Compile the block starting at start
+        :param start: The index of the first instruction in the block
+        :param loop: Can the block loop back to its start without returning
+        :return: The block function, with the number of instructions in it as `size`,
+        and how many extra times a looping block ran as `iterations`
+        """
+        instructions = self.find_block(start)
+        block = self.generate(start, instructions, loop)
+        if block.fallbacks and loop:
+            # Only blocks made entirely of templates can loop
+            block = self.generate(start, instructions, False)
+
+        namespace = {}
+        exec(compile(block.source(), '<block {}>'.format(start), 'exec'), namespace)
+        function = namespace['make_block'](self.cpu.register.data, self.cpu.register, self.cpu.labels,
+                                           *block.fallbacks)
+        function.size = len(instructions)
+        function.start = start
+        function.iterations = 0
+        return function
+
+    def generate(self, start, instructions, loop):
+        """
+        Generate the source for a block
+        :param start: The index of the first instruction in the block
+        :param instructions: The instructions in the block
+        :param loop: Can the block loop back to its start without returning
+        :return: The _BlockSource
+        """
+        block = _BlockSource(self, start, loop)
+        if loop:
+            # Everything is loaded up front so the locals carry over between iterations
+            registers = set()
+            for instruction in instructions:
+                for kind, operand in zip(instruction.form, instruction.operands):
+                    if kind == 'r':
+                        registers.add(operand)
+            block.preload(registers)
+        for address, instruction in enumerate(instructions, start):
+            block.add(address, instruction)
+        block.finish(start + len(instructions))
+        return block
+
+
+class _BlockSource(object):
+    """
+    The python source of a single block as it is being generated
+
+    Tracks which registers and flags have been loaded into locals,
+    and which have been changed and need to be written back.
+    """
+    def __init__(self, compiler, start, loop=False):
+        self.compiler = compiler
+        self.start = start
+        self.loop = loop
+        self.prologue = []  # Lines run once before a loop
+        self.mask = compiler.cpu.register.mask
+        self.sign = compiler.cpu.register.sign
+        self.bit_width = compiler.cpu._bit_width
+        self.pc = compiler.cpu.register.index('PC')
+        self.lines = []
+        self.fallbacks = []
+        self.loaded = set()
+        self.dirty = set()
+        self.loaded_flags = set()
+        self.dirty_flags = set()
+        self.finished = False
+        self.op = None  # The op and form of the instruction being added
+        self.form = None
+        self.dead_flags = ''  # The flags the instruction being added doesn't set, see iarm.dead_flags
+
+    def emit(self, line):
+        self.lines.append(line)
+
+    def read(self, register):
+        """
+        Get the local holding register, loading it if needed
+        :param register: The register index
+        :return: The name of the local
+        """
+        name = 'r{}'.format(register)
+        if register not in self.loaded:
+            self.emit('{} = regs[{}]'.format(name, register))
+            self.loaded.add(register)
+        return name
+
+    def write(self, register):
+        """
+        Get the local to assign register to, and mark it to be written back
+        :param register: The register index
+        :return: The name of the local
+        """
+        self.loaded.add(register)
+        self.dirty.add(register)
+        return 'r{}'.format(register)
+
+    def read_flag(self, flag):
+        if flag not in self.loaded_flags:
+            self.emit('{0} = register.{0}'.format(flag))
+            self.loaded_flags.add(flag)
+        return flag
+
+    def write_flags(self, *flags):
+        self.loaded_flags.update(flags)
+        self.dirty_flags.update(flags)
+
+    def set_flag(self, flag, expression):
+        """
+        Emit flag = expression, unless the instruction doesn't set flag
+        :return:
+        """
+        if flag not in self.dead_flags:
+            self.emit('{} = {}'.format(flag, expression))
+            self.write_flags(flag)
+
+    def flush(self):
+        """
+        Write all changed locals back to the register file
+        :return:
+        """
+        for register in sorted(self.dirty):
+            self.emit('regs[{0}] = r{0}'.format(register))
+        for flag in self.compiler.FLAGS:
+            if flag in self.dirty_flags:
+                self.emit('register.{0} = {0}'.format(flag))
+        self.dirty.clear()
+        self.dirty_flags.clear()
+
+    def preload(self, registers):
+        """
+        Load registers and all the flags before the block starts
+        :param registers: The register indices to load
+        :return:
+        """
+        for register in sorted(registers):
+            self.prologue.append('r{0} = regs[{0}]'.format(register))
+            self.loaded.add(register)
+        for flag in self.compiler.FLAGS:
+            self.prologue.append('{0} = register.{0}'.format(flag))
+            self.loaded_flags.add(flag)
+
+    def forget(self):
+        """
+        Drop the loaded locals, as something other than the block may have changed them
+        :return:
+        """
+        self.loaded.clear()
+        self.loaded_flags.clear()
+
+    def set_NZ(self, result):
+        self.set_flag('n', '{} >= {}'.format(result, self.sign))
+        self.set_flag('z', '{} == 0'.format(result))
+
+    def add_with_flags(self, result, oper_1, oper_2, carry=''):
+        """
+        Emit result = oper_1 + oper_2 (+ carry) and set the NZCV flags
+        oper_1 and oper_2 must be names or constants that are not result
+        """
+        self.emit('t = {} + {}{}'.format(oper_1, oper_2, carry))
+        self.emit('{} = t & {}'.format(result, self.mask))
+        self.set_NZ(result)
+        self.set_flag('c', 't > {}'.format(self.mask))
+        self.set_flag('v', '(({0} ^ {2}) & ({1} ^ {2}) & {3}) != 0'.format(oper_1, oper_2, result, self.sign))
+
+    def sub_with_flags(self, result, oper_1, oper_2):
+        """
+        Emit result = oper_1 - oper_2 and set the NZCV flags
+        oper_1 and oper_2 must be names or constants that are not result
+        """
+        self.emit('t = {} - {}'.format(oper_1, oper_2))
+        self.emit('{} = t & {}'.format(result, self.mask))
+        self.set_NZ(result)
+        self.set_flag('c', 't >= 0')
+        self.set_flag('v', '(({0} ^ {1}) & ({0} ^ {2}) & {3}) != 0'.format(oper_1, oper_2, result, self.sign))
+
+    def add(self, address, instruction):
+        """
+        Add the source for one instruction
+        :param address: Where the instruction is in the program
+        :param instruction: The decoded instruction
+        :return:
+        """
+        self.op = instruction.op
+        self.form = instruction.form
+        self.dead_flags = getattr(instruction, 'dead_flags', '')
+        template = getattr(self, 'template_' + instruction.op, None)
+        if instruction.uses_pc or template is None or not template(address, *instruction.operands):
+            self.fallback(address, instruction)
+
+    def fallback(self, address, instruction):
+        """
+        Call the instruction's function, with the registers written back before it
+        :param address: Where the instruction is in the program
+        :param instruction: The decoded instruction
+        :return:
+        """
+        name = 'f{}'.format(len(self.fallbacks))
+        self.fallbacks.append(instruction)
+        self.flush()
+        self.emit('at = {}'.format(address))
+        if instruction.op in self.compiler.BRANCHES or instruction.uses_pc:
+            self.emit('target = {}()'.format(name))
+            self.emit('if target is not None:')
+            self.emit('    return target')
+        else:
+            self.emit('{}()'.format(name))
+        self.forget()
+
+    def branch(self, address, label, condition=None):
+        """
+        End the block by branching to label, if condition is true
+        :return:
+        """
+        # The cache is cleared when the labels change, so a label that exists now can be used as a constant
+        target = self.compiler.cpu.labels.get(label)
+        if isinstance(target, int):
+            if self.loop and condition is not None and target == self.start:
+                self.emit('if {}:'.format(condition))
+                self.emit('    iterations += 1')
+                self.emit('    continue')
+                return
+            target = repr(target)
+        else:
+            target = 'labels[{!r}]'.format(label)
+
+        self.flush()
+        self.emit('at = {}'.format(address))
+        if condition is None:
+            self.emit('return {}'.format(target))
+            self.finished = True
+        else:
+            self.emit('if {}:'.format(condition))
+            self.emit('    return {}'.format(target))
+
+    def finish(self, end):
+        """
+        End the block, falling through to end
+        :param end: The index of the instruction after the block
+        :return:
+        """
+        if not self.finished:
+            self.flush()
+            self.emit('return {}'.format(end))
+
+    def source(self):
+        """
+        Get the python source that defines `make_block`
+        :return:
+        """
+        fallbacks = ''.join(', f{}'.format(i) for i in range(len(self.fallbacks)))
+        body = ['def make_block(regs, register, labels{}):'.format(fallbacks),
+                '    def block():',
+                '        at = {}'.format(self.start),
+                '        try:']
+        body += ['            ' + line for line in self.prologue]
+        if self.loop:
+            body += ['            iterations = 0',
+                     '            while True:']
+            body += ['                ' + line for line in self.lines]
+        else:
+            body += ['            ' + line for line in self.lines]
+        body += ['        except BaseException:',
+                 '            regs[{}] = at + 1  # PC points after the instruction that raised'.format(self.pc),
+                 '            raise']
+        if self.loop:
+            body += ['        finally:',
+                     '            block.iterations = iterations  # Times the loop went back to the start']
+        body += ['    return block']
+        return '\n'.join(body) + '\n'
+
+    # Templates for instructions
+    # Each emits the source for the instruction, and returns True if it could
+
+    def template_NOP(self, address):
+        return True
+
+    def template_MOV(self, address, a, b):
+        rb = self.read(b)
+        self.emit('{} = {}'.format(self.write(a), rb))
+        return True
+
+    def template_MOVS(self, address, a, b):
+        if self.form == 'ri':
+            ra = self.write(a)
+            self.emit('{} = {}'.format(ra, b))
+        else:
+            rb = self.read(b)
+            ra = self.write(a)
+            self.emit('{} = {}'.format(ra, rb))
+        self.set_NZ(ra)
+        return True
+
+    def template_MVNS(self, address, a, b):
+        rb = self.read(b)
+        ra = self.write(a)
+        self.emit('{} = {} ^ {}'.format(ra, rb, self.mask))
+        self.set_NZ(ra)
+        return True
+
+    def template_ADD(self, address, x, y, z):
+        ry = self.read(y)
+        if self.form == 'rrr':
+            z = self.read(z)
+        self.emit('{} = ({} + {}) & {}'.format(self.write(x), ry, z, self.mask))
+        return True
+
+    def template_SUB(self, address, a, b, c):
+        rb = self.read(b)
+        self.emit('{} = ({} - {}) & {}'.format(self.write(a), rb, c, self.mask))
+        return True
+
+    def template_ADDS(self, address, a, b, c):
+        self.emit('x = {}'.format(self.read(b)))
+        if self.form == 'rrr':
+            self.emit('y = {}'.format(self.read(c)))
+            self.add_with_flags(self.write(a), 'x', 'y')
+        else:
+            self.add_with_flags(self.write(a), 'x', c)
+        return True
+
+    def template_SUBS(self, address, a, b, c):
+        self.emit('x = {}'.format(self.read(b)))
+        if self.form == 'rrr':
+            self.emit('y = {}'.format(self.read(c)))
+            self.sub_with_flags(self.write(a), 'x', 'y')
+        else:
+            self.sub_with_flags(self.write(a), 'x', c)
+        return True
+
+    def template_ADCS(self, address, a, c):
+        self.emit('x = {}'.format(self.read(a)))
+        self.emit('y = {}'.format(self.read(c)))
+        carry = ' + {}'.format(self.read_flag('c'))
+        self.add_with_flags(self.write(a), 'x', 'y', carry)
+        return True
+
+    def template_SBCS(self, address, a, c):
+        # Same as the instruction, the carry is added to the second operand
+        self.emit('x = {}'.format(self.read(a)))
+        self.emit('y = {} + {}'.format(self.read(c), self.read_flag('c')))
+        self.sub_with_flags(self.write(a), 'x', 'y')
+        return True
+
+    def template_RSBS(self, address, a, b):
+        self.emit('y = {}'.format(self.read(b)))
+        self.sub_with_flags(self.write(a), 0, 'y')
+        return True
+
+    def template_CMP(self, address, m, n):
+        self.emit('x = {}'.format(self.read(m)))
+        if self.form == 'rr':
+            self.emit('y = {}'.format(self.read(n)))
+            self.sub_with_flags('result', 'x', 'y')
+        else:
+            self.sub_with_flags('result', 'x', n)
+        return True
+
+    def template_CMN(self, address, a, b):
+        self.emit('x = {}'.format(self.read(a)))
+        self.emit('y = {}'.format(self.read(b)))
+        self.add_with_flags('result', 'x', 'y')
+        return True
+
+    def template_MULS(self, address, a, b):
+        ra = self.read(a)
+        rb = self.read(b)
+        ra = self.write(a)
+        self.emit('{0} = ({1} * {0}) & {2}'.format(ra, rb, self.mask))
+        self.set_NZ(ra)
+        return True
+
+    def _logic(self, a, c, expression):
+        ra = self.read(a)
+        rc = self.read(c)
+        ra = self.write(a)
+        self.emit('{} = {}'.format(ra, expression.format(a=ra, c=rc, mask=self.mask)))
+        self.set_NZ(ra)
+        return True
+
+    def template_ANDS(self, address, a, c):
+        return self._logic(a, c, '{a} & {c}')
+
+    def template_BICS(self, address, a, c):
+        return self._logic(a, c, '{a} & ({c} ^ {mask})')
+
+    def template_EORS(self, address, a, c):
+        return self._logic(a, c, '{a} ^ {c}')
+
+    def template_ORRS(self, address, a, c):
+        return self._logic(a, c, '{a} | {c}')
+
+    def template_TST(self, address, a, b):
+        self.emit('result = {} & {}'.format(self.read(a), self.read(b)))
+        self.set_NZ('result')
+        return True
+
+    def template_LSLS(self, address, a, b, shift_amount=None):
+        if shift_amount is None:
+            return False  # Register shifts are left to the instruction
+        self.emit('x = {}'.format(self.read(b)))
+        if shift_amount >= self.bit_width:
+            self.set_flag('c', 'False')
+        elif shift_amount:  # Shifting by 0 is MOVS, which leaves the C flag alone
+            self.set_flag('c', '(x & {}) != 0'.format(1 << (self.bit_width - shift_amount)))
+        ra = self.write(a)
+        self.emit('{} = (x << {}) & {}'.format(ra, shift_amount, self.mask))
+        self.set_NZ(ra)
+        return True
+
+    def template_LSRS(self, address, a, b, shift_amount=None):
+        if shift_amount is None:
+            return False
+        self.emit('x = {}'.format(self.read(b)))
+        self.set_flag('c', '(x & {}) != 0'.format(1 << (shift_amount - 1)))
+        ra = self.write(a)
+        self.emit('{} = x >> {}'.format(ra, shift_amount))
+        self.set_NZ(ra)
+        return True
+
+    def template_ASRS(self, address, a, b, shift_amount=None):
+        if shift_amount is None:
+            return False
+        sign_extension = self.mask ^ (self.mask >> shift_amount)
+        self.emit('x = {}'.format(self.read(b)))
+        self.set_flag('c', '(x & {}) != 0'.format(1 << (shift_amount - 1)))
+        ra = self.write(a)
+        self.emit('{} = (x >> {}) | ({} if x & {} else 0)'.format(ra, shift_amount, sign_extension, self.sign))
+        self.set_NZ(ra)
+        return True
+
+    def template_B(self, address, label):
+        if label == '.':
+            return False  # Let the instruction raise the end of program
+        self.branch(address, label)
+        return True
+
+    def template_BX(self, address, j):
+        target = self.read(j)
+        self.flush()
+        self.emit('return {}'.format(target))
+        self.finished = True
+        return True
+
+    def _conditional_branch(self, address, label):
+        condition = self.compiler.CONDITIONS[self.op]
+        for flag in sorted(set(re.findall(r'\b[nzcv]\b', condition))):
+            self.read_flag(flag)
+        self.branch(address, label, condition)
+        return True
+
+    template_BCC = template_BCS = template_BEQ = template_BGE = template_BGT = template_BHI = \
+        template_BHS = template_BLE = template_BLO = template_BLS = template_BLT = template_BMI = \
+        template_BNE = template_BPL = template_BVC = template_BVS = _conditional_branch
@@ -1,12 +1,59 @@
-import inspect
+import array
+import collections
+import collections.abc
+import mmap
 import random
+import struct
+import sys
+import types
+import iarm.exceptions
 
 
 class RegisterCpu(object):
     """
     A register based CPU
     """
-    def __init__(self, bit_width, max_registers, memory_width=8, memory_size=1024, generate_random=False, postpone_execution=True):
+    SPECIAL_REGISTERS = ()  # Named registers stored after the numbered ones
+    PRESERVED_REGISTERS = ()  # Registers left alone when random values are generated
+    REGISTER_FILE = None  # Class used to hold the registers, RegisterFile if None
+    _OPS = {}  # Instruction name to function, built for each class by `_build_tables`
+    _RULES = {}  # Rule name to function, built for each class by `_build_tables`
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._build_tables()
+
+    @classmethod
+    def _build_tables(cls):
+        """
+        Find the instructions and rules of the class
+
+        This is done once when the class is created, instead of for every instance,
+        instances bind the methods as they are looked up.
+        Subclasses can extend this to build their own tables.
+        :return:
+        """
+        cls._OPS = cls._find_methods(str.isupper)
+        cls._RULES = cls._find_methods(lambda name: name.startswith('rule_'), 'rule_')
+
+    @classmethod
+    def _find_methods(cls, test, prefix=''):
+        """
+        Get the functions on the class whose name passes test
+        :param test: A function given the method name, returning True if the method should be included
+        :param prefix: What to remove from the start of the name
+        :return: A dict of the name without the prefix to the function
+        """
+        methods = {}
+        for name in dir(cls):
+            if test(name):
+                function = getattr(cls, name)
+                if isinstance(function, types.FunctionType):
+                    methods[name[len(prefix):]] = function
+        return methods
+
+    def __init__(self, bit_width, max_registers, memory_width=8, memory_size=1024, generate_random=False, postpone_execution=True,
+                 memory_file=None, memory_access='copy', memory_regions=None):
         """
         Initialize the CPU and get all instructions and "rules"
 
@@ -19,6 +66,10 @@ class RegisterCpu(object):
         :param memory_size: What is the size of memory
         :param generate_random: If a register or memory address is undefined, should a random value be generated for it?
         :param postpone_execution: Should instructions be executed immediately or just store the program until a value is asked for (lazy execution)
+        :param memory_file: A file to map as memory instead of memory_size bytes, see MappedMemory
+        :param memory_access: How the file is mapped, 'copy' or 'read'
+        :param memory_regions: The (start, size) of each region of a 32 bit address space to map,
+        instead of memory_size bytes from zero, see PagedMemory
         :return:
         """
         super().__init__()
@@ -29,25 +80,21 @@ class RegisterCpu(object):
         self._generate_random = generate_random
         self._postpone_execution = postpone_execution
 
-        self.register = RandomValueDict(self._bit_width, self._generate_random)  # Holder for the register values
-        self.memory = RandomValueDict(self._memory_width, self._generate_random)  # Holder for memory
+        register_file = self.REGISTER_FILE or RegisterFile
+        self.register = register_file(self._bit_width, max_registers, self.SPECIAL_REGISTERS,
+                                      self._generate_random)  # Holder for the register values
+        if memory_file is not None:
+            self.memory = MappedMemory(memory_file, memory_access)
+            self._memory_size = len(self.memory)
+        elif memory_regions is not None:
+            self.memory = PagedMemory(memory_regions, self._generate_random)
+            self._memory_size = len(self.memory)  # The end of the highest region, where the stack starts
+        else:
+            self.memory = ByteMemory(self._memory_size, self._generate_random)  # Holder for memory
         self.program = []  # Hold the current program, used for jumps
         self.labels = {}  # A label to program location lookup
-        self.ops = {}  # What operations are defined
-        self._rules = {}  # Holder for parameter rules
-
-        # Get all instructions and rules
-        for obj in inspect.getmembers(self, predicate=inspect.ismethod):
-            # Is returned in the form of (method name, method)
-            name = obj[0]
-            method = obj[1]
-
-            # Instructions are defined by being all uppercase
-            if str.isupper(name):
-                self.ops[name] = method
-            # Rules are defined with starting with 'rule_'
-            elif str.startswith(name, 'rule_'):
-                self._rules[name[len('rule_'):]] = method
+        self.ops = BoundMethods(self, self._OPS)  # What operations are defined
+        self._rules = BoundMethods(self, self._RULES)  # Holder for parameter rules
 
     def check_arguments(self, **kwargs):
         """
@@ -57,10 +104,12 @@ class RegisterCpu(object):
         :param kwargs:
         :return:
         """
+        rules = self._RULES
         for key in kwargs:
-            if key in self._rules:
+            if key in rules:
+                rule = rules[key]
                 for val in kwargs[key]:
-                    self._rules[key](val)
+                    rule(self, val)
             else:
                 raise LookupError("Rule for {} does not exist. Make sure the rule starts with 'rule_'".format(key))
 
@@ -74,9 +123,11 @@ class RegisterCpu(object):
 
     @generate_random.setter
     def generate_random(self, value):
+        if value and not self._generate_random:
+            # Registers hold a value at all times, so "unset" registers get theirs now
+            self.register.randomize(*self.PRESERVED_REGISTERS)
+            self.memory.randomize()
         self._generate_random = value
-        self.memory._generate_random = value
-        self.register._generate_random = value
 
     @property
     def postpone_execution(self):
@@ -88,6 +139,670 @@ class RegisterCpu(object):
 
 
 
+class BoundMethods(collections.abc.Mapping):
+    """
+    A read only dict of names to methods, bound to an instance when they are looked up
+
+    Lets every instance share the tables built when its class was created.
+    """
+    def __init__(self, instance, functions):
+        """
+        :param instance: What to bind the methods to
+        :param functions: The dict of names to (unbound) functions
+        """
+        self._instance = instance
+        self._functions = functions
+
+    def __getitem__(self, name):
+        return self._functions[name].__get__(self._instance)
+
+    def __contains__(self, name):
+        return name in self._functions
+
+    def __iter__(self):
+        return iter(self._functions)
+
+    def __len__(self):
+        return len(self._functions)
+
+
+class RegisterFile(object):
+    """
+    Class for registers
+
+    Registers are held in a fixed size list indexed by register number,
+    R0 is at index 0, R1 at index 1, and so on.
+    Special registers (like APSR) are stored after the numbered registers.
+    Names are only resolved to an index through `index`,
+    so instructions can look up the index once when they are decoded
+    and use `data` directly when they are run.
+    """
+    def __init__(self, bit_width, registers, special_registers=(), generate_random=False):
+        """
+        :param bit_width: What is the width of the registers. Used to determine the max value
+        :param registers: How many numbered registers there are (R0 to R<registers - 1>)
+        :param special_registers: Names of any extra registers
+        :param generate_random: Should the registers start with random values instead of zero
+        """
+        self._bit_width = bit_width
+        self.mask = 2**bit_width - 1
+        self._names = ['R{}'.format(i) for i in range(registers)] + list(special_registers)
+        self._index = {name: i for i, name in enumerate(self._names)}
+        self.data = [0] * len(self._names)
+        if generate_random:
+            self.randomize()
+
+    def alias(self, name, register):
+        """
+        Make name refer to the same slot as register
+
+        Unlike `RandomValueDict.link`, nothing is mirrored,
+        both names resolve to the same index.
+        :param name: The new name, like 'PC'
+        :param register: The existing register, like 'R15'
+        :return:
+        """
+        self._index[name] = self._index[register]
+
+    def index(self, name):
+        """
+        Get the index in `data` of the register called name
+        :param name: The register name, like 'R3' or 'SP'
+        :return: The index of the register
+        """
+        return self._index[name]
+
+    def randomize(self, *keep):
+        """
+        Fill the registers with random values, as on power up
+
+        :param keep: Register names whose values should be left alone
+        :return:
+        """
+        kept = {self._index[name] for name in keep}
+        for i in range(len(self.data)):
+            if i not in kept:
+                self.data[i] = random.randint(0, self.mask)
+
+    def __getitem__(self, item):
+        """
+        Get the value of the register called item
+        :param item: The register to get the value
+        :return: The integer value of the register
+        """
+        return self.data[self._index[item]]
+
+    def __setitem__(self, key, value):
+        """
+        Set the register called key, truncating the value to the register width
+        :param key:
+        :param value:
+        :return:
+        """
+        self.data[self._index[key]] = value & self.mask
+
+    def __contains__(self, item):
+        return item in self._index
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def keys(self):
+        return list(self._names)
+
+    def items(self):
+        return list(zip(self._names, self.data))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class ByteMemory(object):
+    """
+    Class for memory
+
+    Memory is a contiguous, byte addressed bytearray of a fixed size.
+    Single bytes are accessed by indexing, words and half words
+    (little endian) through the read_* and write_* methods.
+    Accessing an address outside of memory raises a HardFault.
+    """
+    WORD = struct.Struct('<I')
+    HALFWORD = struct.Struct('<H')
+
+    def __init__(self, size, generate_random=False):
+        """
+        :param size: The number of bytes of memory
+        :param generate_random: Should memory start with random values instead of zero
+        """
+        self.data = bytearray(size)
+        self.view = memoryview(self.data)
+        if generate_random:
+            self.randomize()
+
+    def randomize(self):
+        """
+        Fill memory with random values, as on power up
+        :return:
+        """
+        self.data[:] = bytes(random.getrandbits(8) for _ in range(len(self.data)))
+
+    def _out_of_range(self, address, size):
+        return iarm.exceptions.HardFault(
+            "Memory access out of range; Address: {}  Size: {}  Memory size: {}".format(address, size, len(self.data)))
+
+    def read_word(self, address):
+        try:
+            return self.WORD.unpack_from(self.data, address)[0]
+        except struct.error:
+            raise self._out_of_range(address, 4)
+
+    def write_word(self, address, value):
+        try:
+            self.WORD.pack_into(self.data, address, value & 0xFFFFFFFF)
+        except struct.error:
+            raise self._out_of_range(address, 4)
+
+    def read_halfword(self, address):
+        try:
+            return self.HALFWORD.unpack_from(self.data, address)[0]
+        except struct.error:
+            raise self._out_of_range(address, 2)
+
+    def write_halfword(self, address, value):
+        try:
+            self.HALFWORD.pack_into(self.data, address, value & 0xFFFF)
+        except struct.error:
+            raise self._out_of_range(address, 2)
+
+    def read_byte(self, address):
+        return self[address]
+
+    def write_byte(self, address, value):
+        """
+        Set the byte at address, truncating the value to a byte
+
+        Loads and stores from the program go through the read_* and write_* methods,
+        so they can be watched by shadowing the methods on an instance.
+        :param address: The byte address
+        :param value:
+        :return:
+        """
+        self[address] = value
+
+    def __getitem__(self, address):
+        """
+        Get the byte at address
+        :param address: The byte address
+        :return: The integer value of the byte
+        """
+        try:
+            return self.data[address]
+        except IndexError:
+            raise self._out_of_range(address, 1)
+
+    def __setitem__(self, address, value):
+        """
+        Set the byte at address, truncating the value to a byte
+        :param address: The byte address
+        :param value:
+        :return:
+        """
+        try:
+            self.data[address] = value & 0xFF
+        except IndexError:
+            raise self._out_of_range(address, 1)
+
+    def write_bytes(self, address, data):
+        """
+        Copy bytes into memory
+        :param address: The byte address of the first byte
+        :param data: The bytes
+        :return:
+        """
+        if not 0 <= address <= address + len(data) <= len(self.data):
+            raise self._out_of_range(address, len(data))
+        self.data[address:address + len(data)] = data
+
+    def save(self):
+        """
+        :return: A copy of memory that `restore` puts back
+        """
+        return bytes(self.data)
+
+    def restore(self, saved):
+        """
+        Put back memory saved with `save`
+        :param saved: The saved memory
+        :return:
+        """
+        self.data[:] = saved
+
+    def changes(self, saved, page=4096):
+        """
+        Find the bytes that are different from memory saved with `save`
+        :param saved: The saved memory
+        :param page: How many bytes to compare at once, only pages that differ are compared a byte at a time
+        :return: A dict of address to its value now, for each byte that is different, in address order
+        """
+        data = self.data
+        changed = {}
+        for start in range(0, len(data), page):
+            end = start + page
+            if data[start:end] != saved[start:end]:
+                changed.update((address, data[address]) for address in range(start, min(end, len(data)))
+                               if data[address] != saved[address])
+        return changed
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return '{}({} bytes)'.format(type(self).__name__, len(self.data))
+
+
+class MappedMemory(ByteMemory):
+    """
+    Memory backed by a memory mapped file
+
+    The file is memory, so a large image is ready without reading it in,
+    and interpreters mapping the same file share its pages until they write to them.
+    With 'copy' access writes go to a private copy of the page and never reach the file,
+    and with 'read' access writing raises a HardFault.
+    """
+    ACCESS = {'copy': mmap.ACCESS_COPY, 'read': mmap.ACCESS_READ}
+
+    def __init__(self, path, access='copy'):
+        """
+        :param path: The file to map, its size is the size of memory
+        :param access: 'copy' or 'read'
+        """
+        if access not in self.ACCESS:
+            raise iarm.exceptions.ValidationError("Memory access must be one of {}, not '{}'".format(
+                ', '.join(self.ACCESS), access))
+        self.path = path
+        self.access = access
+        self.writable = access != 'read'
+        self.data = None
+        self.remap()
+
+    def remap(self):
+        """
+        Map the file again, dropping everything written to memory since it was last mapped
+        :return:
+        """
+        self.close()
+        with open(self.path, 'rb') as f:
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access=self.ACCESS[self.access])
+            except ValueError:
+                raise iarm.exceptions.ValidationError("Can't map the empty file {}".format(self.path))
+        self.view = memoryview(self.data)
+
+    def close(self):
+        """
+        Unmap the file
+        :return:
+        """
+        if self.data is not None:
+            self.view.release()
+            self.data.close()
+            self.data = None
+
+    def _read_only(self, address, size):
+        return iarm.exceptions.HardFault(
+            "Memory is read only; Address: {}  Size: {}  File: {}".format(address, size, self.path))
+
+    def write_word(self, address, value):
+        if not self.writable:
+            raise self._read_only(address, 4)
+        super().write_word(address, value)
+
+    def write_halfword(self, address, value):
+        if not self.writable:
+            raise self._read_only(address, 2)
+        super().write_halfword(address, value)
+
+    def __setitem__(self, address, value):
+        if not self.writable:
+            raise self._read_only(address, 1)
+        super().__setitem__(address, value)
+
+    def write_bytes(self, address, data):
+        if not self.writable:
+            raise self._read_only(address, len(data))
+        super().write_bytes(address, data)
+
+    def restore(self, saved):
+        if self.writable:  # Read only memory can't have changed
+            super().restore(saved)
+
+    def __repr__(self):
+        return '{}({!r}, {} bytes)'.format(type(self).__name__, self.path, len(self.data))
+
+
+class PagedMemory(ByteMemory):
+    """
+    A sparse 32 bit address space, made of 4 KB pages allocated when they are first accessed
+
+    Only the regions given are mapped, like the flash and SRAM of a microcontroller,
+    and accessing an address outside of them raises a HardFault.
+    Memory used grows with the pages accessed, not the size of the regions.
+    The page last accessed is kept to one side, so runs of loads and stores to the same page
+    (like a loop over an array, or pushing and popping) don't look up the page table.
+    """
+    PAGE_BITS = 12
+    PAGE_SIZE = 1 << PAGE_BITS
+    OFFSET_MASK = PAGE_SIZE - 1
+    ADDRESS_SPACE = 1 << 32
+
+    def __init__(self, regions=((0, ADDRESS_SPACE),), generate_random=False):
+        """
+        :param regions: The (start, size) in bytes of each mapped region, on page boundaries,
+        defaults to the whole address space
+        :param generate_random: Should pages start with random values instead of zero
+        """
+        self.regions = []  # The first page of each region and the page after its last
+        for start, size in regions:
+            if start % self.PAGE_SIZE or size % self.PAGE_SIZE or not 0 <= start < start + size <= self.ADDRESS_SPACE:
+                raise iarm.exceptions.ValidationError(
+                    "Memory region at {:#x} of {:#x} bytes is not whole pages in the address space".format(start, size))
+            self.regions.append((start >> self.PAGE_BITS, (start + size) >> self.PAGE_BITS))
+        self.size = max(end for _, end in self.regions) << self.PAGE_BITS if self.regions else 0
+        self.generate_random = generate_random
+        self.pages = {}  # Page number to its bytearray, for the pages that have been accessed
+        self._last = None  # The number of the page last accessed, and the page
+        self._last_page = None
+
+    def randomize(self):
+        """
+        Fill the pages accessed so far with random values, and any accessed later
+        :return:
+        """
+        self.generate_random = True
+        for page in self.pages.values():
+            page[:] = random.getrandbits(8 * self.PAGE_SIZE).to_bytes(self.PAGE_SIZE, 'little')
+
+    def _out_of_range(self, address, size):
+        return iarm.exceptions.HardFault(
+            "Memory access to unmapped memory; Address: {:#x}  Size: {}".format(address, size))
+
+    def page(self, address, size=1):
+        """
+        Get the page an address is in, allocating it if it hasn't been accessed yet
+        :param address: The byte address
+        :param size: The size of the access, for the error if the address isn't mapped
+        :return: The page, a bytearray
+        """
+        number = address >> self.PAGE_BITS
+        page = self.pages.get(number)
+        if page is None:
+            if address < 0 or not any(first <= number < end for first, end in self.regions):
+                raise self._out_of_range(address, size)
+            if self.generate_random:
+                page = bytearray(random.getrandbits(8 * self.PAGE_SIZE).to_bytes(self.PAGE_SIZE, 'little'))
+            else:
+                page = bytearray(self.PAGE_SIZE)
+            self.pages[number] = page
+        self._last = number
+        self._last_page = page
+        return page
+
+    def _read(self, address, size):
+        # An access that isn't in the last page, or runs into the next page
+        page = self.page(address, size)
+        offset = address & self.OFFSET_MASK
+        if offset + size <= self.PAGE_SIZE:
+            return int.from_bytes(page[offset:offset + size], 'little')
+        self.page(address + size - 1, size)  # Fault before reading any of it
+        return int.from_bytes(bytes(self[i] for i in range(address, address + size)), 'little')
+
+    def _write(self, address, size, value):
+        page = self.page(address, size)
+        offset = address & self.OFFSET_MASK
+        if offset + size <= self.PAGE_SIZE:
+            page[offset:offset + size] = value.to_bytes(size, 'little')
+            return
+        self.page(address + size - 1, size)  # Fault before writing any of it
+        for i, byte in enumerate(value.to_bytes(size, 'little')):
+            self[address + i] = byte
+
+    def read_word(self, address):
+        offset = address & self.OFFSET_MASK
+        if address >> self.PAGE_BITS == self._last and offset <= self.PAGE_SIZE - 4:
+            return self.WORD.unpack_from(self._last_page, offset)[0]
+        return self._read(address, 4)
+
+    def write_word(self, address, value):
+        offset = address & self.OFFSET_MASK
+        if address >> self.PAGE_BITS == self._last and offset <= self.PAGE_SIZE - 4:
+            self.WORD.pack_into(self._last_page, offset, value & 0xFFFFFFFF)
+        else:
+            self._write(address, 4, value & 0xFFFFFFFF)
+
+    def read_halfword(self, address):
+        offset = address & self.OFFSET_MASK
+        if address >> self.PAGE_BITS == self._last and offset <= self.PAGE_SIZE - 2:
+            return self.HALFWORD.unpack_from(self._last_page, offset)[0]
+        return self._read(address, 2)
+
+    def write_halfword(self, address, value):
+        offset = address & self.OFFSET_MASK
+        if address >> self.PAGE_BITS == self._last and offset <= self.PAGE_SIZE - 2:
+            self.HALFWORD.pack_into(self._last_page, offset, value & 0xFFFF)
+        else:
+            self._write(address, 2, value & 0xFFFF)
+
+    def __getitem__(self, address):
+        if address >> self.PAGE_BITS == self._last:
+            return self._last_page[address & self.OFFSET_MASK]
+        return self.page(address)[address & self.OFFSET_MASK]
+
+    def __setitem__(self, address, value):
+        if address >> self.PAGE_BITS == self._last:
+            self._last_page[address & self.OFFSET_MASK] = value & 0xFF
+        else:
+            self.page(address)[address & self.OFFSET_MASK] = value & 0xFF
+
+    def write_bytes(self, address, data):
+        # Check every page first, so nothing is written if any of it isn't mapped
+        end = address + len(data)
+        for start in range(address - (address & self.OFFSET_MASK), end, self.PAGE_SIZE):
+            self.page(max(start, address), len(data))
+        while address < end:
+            offset = address & self.OFFSET_MASK
+            length = min(self.PAGE_SIZE - offset, end - address)
+            self.page(address)[offset:offset + length] = data[len(data) - (end - address):][:length]
+            address += length
+
+    def save(self):
+        """
+        :return: A copy of the pages accessed so far, that `restore` puts back
+        """
+        return {number: bytes(page) for number, page in self.pages.items()}
+
+    def restore(self, saved):
+        """
+        Put back pages saved with `save`, dropping any accessed since
+        :param saved: The saved pages
+        :return:
+        """
+        self.pages = {number: bytearray(page) for number, page in saved.items()}
+        self._last = None
+        self._last_page = None
+
+    def changes(self, saved, page=None):
+        """
+        Find the bytes that are different from pages saved with `save`,
+        counting pages first accessed since as having been zero
+        :param saved: The saved pages
+        :param page: Not used, memory is always compared a page at a time
+        :return: A dict of address to its value now, for each byte that is different, in address order
+        """
+        changed = {}
+        blank = bytes(self.PAGE_SIZE)
+        for number in sorted(self.pages):
+            data = self.pages[number]
+            before = saved.get(number, blank)
+            if data != before:
+                start = number << self.PAGE_BITS
+                changed.update((start + i, data[i]) for i in range(self.PAGE_SIZE) if data[i] != before[i])
+        return changed
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return '{}({} of {} pages)'.format(type(self).__name__, len(self.pages),
+                                           sum(end - first for first, end in self.regions))
+
+
+class DecodeCache(object):
+    """
+    A bounded least recently used cache of decoded instructions
+
+    Keeps count of its hits and misses so the effectiveness of the cache can be checked.
+    """
+    def __init__(self, size=4096):
+        """
+        :param size: The most instructions to hold, the least recently used is dropped after that
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        """
+        Get the instruction decoded for key, counting a hit or miss
+        :param key: The key the instruction was stored under
+        :return: The instruction, or None if it is not in the cache
+        """
+        try:
+            instruction = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return instruction
+
+    def put(self, key, instruction):
+        """
+        Store a decoded instruction, dropping the least recently used if the cache is full
+        :param key: The key to store the instruction under
+        :param instruction: The decoded instruction
+        :return:
+        """
+        self._entries[key] = instruction
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop all instructions and reset the counters
+        :return:
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+SourceLine = collections.namedtuple('SourceLine', 'origin line text')
+
+
+class SourceMap(object):
+    """
+    Where each instruction in a program came from
+
+    Kept as parallel arrays indexed by program index, the line number,
+    and the ids of the origin (like a file name or notebook cell) and source text
+    in a table of interned strings.
+    Repeated text and origins are only stored once, and nothing is kept on the instructions.
+    """
+    def __init__(self):
+        self.lines = array.array('I')
+        self.origins = array.array('I')
+        self.texts = array.array('I')
+        self.strings = []  # Id to string
+        self._ids = {}  # String to id
+
+    def intern(self, string):
+        """
+        Get the id of string in the string table, adding it if needed
+        :param string: The string
+        :return: The id
+        """
+        try:
+            return self._ids[string]
+        except KeyError:
+            i = self._ids[string] = len(self.strings)
+            self.strings.append(sys.intern(string))
+            return i
+
+    def append(self, origin, line, text):
+        """
+        Add the source of the next instruction
+        :param origin: Where the source came from, like a file name
+        :param line: The line number in origin, one indexed
+        :param text: The line of source
+        :return:
+        """
+        self.origins.append(self.intern(origin))
+        self.lines.append(line)
+        self.texts.append(self.intern(text))
+
+    def extend(self, other):
+        """
+        Add all the entries of another SourceMap
+        :param other: The SourceMap
+        :return:
+        """
+        intern = self.intern
+        strings = other.strings
+        self.origins.extend(intern(strings[i]) for i in other.origins)
+        self.lines.extend(other.lines)
+        self.texts.extend(intern(strings[i]) for i in other.texts)
+
+    def copy(self):
+        """
+        :return: A copy of the source map, sharing the string table until either adds to it
+        """
+        other = SourceMap()
+        other.lines = array.array('I', self.lines)
+        other.origins = array.array('I', self.origins)
+        other.texts = array.array('I', self.texts)
+        other.strings = list(self.strings)
+        other._ids = dict(self._ids)
+        return other
+
+    def __getitem__(self, index):
+        """
+        :param index: The program index
+        :return: The SourceLine of the instruction
+        """
+        strings = self.strings
+        return SourceLine(strings[self.origins[index]], self.lines[index], strings[self.texts[index]])
+
+    def text(self, index):
+        return self.strings[self.texts[index]]
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __eq__(self, other):
+        if not isinstance(other, SourceMap):
+            return NotImplemented
+        return (self.lines == other.lines and self.origins == other.origins and self.texts == other.texts
+                and self.strings == other.strings)
+
+
 class RandomValueDict(dict):
     """
     Class for registers and memory
@@ -0,0 +1,170 @@
+"""
+Stop instructions from setting flags that nothing reads
+
+Most flag setting instructions have their flags set again by a later instruction
+before a conditional branch (or anything else) reads them.
+A liveness analysis over the program finds the flags that can be read after each instruction,
+and instructions whose flags are all dead are swapped for a variant that sets none of them
+(or only N and Z, for an addition or subtraction whose C and V are dead).
+
+The variant is the instruction's own function with its `set_flags` closure variable
+bound to a cheaper setter, so every instruction gets one without having to write it twice.
+Variants keep the op, form, and operands of the instruction, with the original as `original`
+and the flags it leaves alone as `dead_flags`, which the block compiler also leaves out.
+
+Flags are treated as read wherever the analysis can't see what runs next:
+at the end of the program, at a breakpoint, and at calls, returns, and instructions that write the PC.
+`Arm.run` uses the original instructions for runs that can stop after any step
+(with a step count, or while recording history, watching, or tracing).
+An exception can still stop a run where it shows flags that were not set,
+which is why the pass is off unless asked for.
+"""
+
+import re
+import types
+import iarm.compiler
+import iarm.tracer
+
+BITS = {flag: 1 << bit for flag, bit in iarm.tracer.FLAG_BITS}
+ALL = BITS['n'] | BITS['z'] | BITS['c'] | BITS['v']
+NZ = BITS['n'] | BITS['z']
+CV = BITS['c'] | BITS['v']
+
+# The flags each instruction reads
+CONDITIONS = iarm.compiler.BlockCompiler.CONDITIONS
+READS = {op: sum(BITS[flag] for flag in set(re.findall(r'\b[nzcv]\b', condition)))
+         for op, condition in CONDITIONS.items()}
+READS.update({'ADCS': BITS['c'], 'SBCS': BITS['c'], 'MRS': ALL})
+
+# The flags each instruction sets
+WRITES = dict.fromkeys(('ADCS', 'ADDS', 'CMN', 'CMP', 'RSBS', 'SBCS', 'SUBS'), ALL)
+WRITES.update(dict.fromkeys(('ANDS', 'BICS', 'EORS', 'MOVS', 'MULS', 'MVNS', 'ORRS', 'TST'), NZ))
+WRITES.update(dict.fromkeys(('ASRS', 'LSLS', 'LSRS'), NZ | BITS['c']))
+
+# Instructions that go somewhere the analysis can't follow
+UNKNOWN_TARGETS = ('BL', 'BLX', 'BX', 'BKPT')
+
+
+def flag_writes(instruction):
+    """
+    Find the flags an instruction sets, as a mask of BITS
+    """
+    if instruction.op == 'LSLS' and instruction.form == 'rri' and instruction.operands[2] == 0:
+        return NZ  # Shifting by 0 is MOVS, which leaves the C flag alone
+    return WRITES.get(instruction.op, 0)
+
+
+def discard_flags(*args):
+    """
+    Set no flags, swapped in for the flag setter of an instruction whose flags are all dead
+    """
+    return
+
+
+def successors(program, labels):
+    """
+    Find where each instruction in the program can go next
+    :param program: The decoded instructions
+    :param labels: The labels of the program
+    :return: A list of the indices each instruction can go to, or None where it can't be known
+    """
+    end = len(program)
+    found = []
+    for i, instruction in enumerate(program):
+        op = instruction.op
+        if op in UNKNOWN_TARGETS or instruction.uses_pc:
+            found.append(None)
+            continue
+        if op == 'B':
+            following = [labels.get(instruction.operands[0])]
+        elif op in CONDITIONS:
+            following = [i + 1, labels.get(instruction.operands[0])]
+        else:
+            following = [i + 1]
+        if all(isinstance(s, int) and 0 <= s < end for s in following):
+            found.append(following)
+        else:
+            found.append(None)  # Past the end of the program, more code may be added
+    return found
+
+
+def live_flags(program, labels):
+    """
+    Find the flags that can be read after each instruction, before they are set again
+    :param program: The decoded instructions
+    :param labels: The labels of the program
+    :return: A list of the live flags after each instruction, as a mask of BITS
+    """
+    following = successors(program, labels)
+    reads = [READS.get(instruction.op, 0) for instruction in program]
+    kills = [ALL ^ flag_writes(instruction) for instruction in program]
+    live_in = [0] * len(program)
+    live_out = [ALL] * len(program)
+    changed = True
+    while changed:
+        # Flags only ever become live, so this stops once nothing more is found
+        changed = False
+        for i in range(len(program) - 1, -1, -1):
+            if following[i] is None:
+                out = ALL
+            else:
+                out = 0
+                for s in following[i]:
+                    out |= live_in[s]
+            live_out[i] = out
+            live = reads[i] | (out & kills[i])
+            if live != live_in[i]:
+                live_in[i] = live
+                changed = True
+    return live_out
+
+
+def without_flags(instruction, setter, dead):
+    """
+    Make a variant of an instruction that calls setter instead of its flag setter
+    :param instruction: The decoded instruction
+    :param setter: The function to bind to its `set_flags`
+    :param dead: The flags the variant doesn't set, as a string like 'cv'
+    :return: The variant
+    """
+    code = instruction.__code__
+    closure = list(instruction.__closure__)
+    closure[code.co_freevars.index('set_flags')] = types.CellType(setter)
+    variant = types.FunctionType(code, instruction.__globals__, code.co_name, instruction.__defaults__,
+                                 tuple(closure))
+    vars(variant).update(vars(instruction))
+    variant.original = instruction
+    variant.dead_flags = dead
+    return variant
+
+
+def eliminate(program, labels, register, variants):
+    """
+    Swap the instructions of a program for variants that don't set dead flags
+    :param program: The decoded instructions, none of which are variants
+    :param labels: The labels of the program
+    :param register: The register file the program runs on
+    :param variants: A dict of (instruction, setter) to variant, so the same variants are used each time
+    :return: The new program
+    """
+    live = live_flags(program, labels)
+    optimized = []
+    for instruction, live_out in zip(program, live):
+        writes = flag_writes(instruction)
+        if not writes & ~live_out or 'set_flags' not in instruction.__code__.co_freevars:
+            optimized.append(instruction)  # Nothing to leave out
+            continue
+        if not writes & live_out:
+            setter = discard_flags
+            dead = ''.join(flag for flag in BITS if BITS[flag] & writes)
+        elif writes == ALL and not CV & live_out:
+            setter = register.set_NZ_of_total
+            dead = 'cv'
+        else:
+            optimized.append(instruction)  # Only some of the flags can be left out
+            continue
+        key = (instruction, setter)
+        if key not in variants:
+            variants[key] = without_flags(instruction, setter, dead)
+        optimized.append(variants[key])
+    return optimized
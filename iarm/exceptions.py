@@ -55,3 +55,15 @@ class HardFault(IarmError):
     """
     Used for cases where the program has validated, is running, and an error or exception occurs
     """
+
+
+class BreakpointHit(IarmError):
+    """
+    Used to stop a running program at a breakpoint or BKPT instruction, before it runs
+    """
+
+
+class WatchpointHit(IarmError):
+    """
+    Used to stop a running program after a step that accessed something being watched
+    """
@@ -0,0 +1,218 @@
+"""
+Step a program backwards as well as forwards
+
+Stepping back is turned on by giving an interpreter a History
+
+    interp.history = iarm.history.History(interp)
+    interp.run(5000)
+    interp.history.back(10)   # The state after 4990 steps
+    interp.history.goto(100)  # The state after 100 steps
+
+While recording, each step saves what it is about to overwrite:
+the PC, the register it writes, the flags, and the memory it stores to.
+Every `interval` steps the registers and memory are saved whole as a checkpoint.
+Going back restores the nearest checkpoint at or after the step being gone to,
+and undoes the steps between them, so it costs at most `interval` undos
+no matter how far back the step is.
+Going forward runs the program again, since it runs the same way.
+
+Registers and memory changed between runs (not by the program) are not recorded,
+so going back past the change only undoes it if a checkpoint from before it is restored.
+"""
+
+import array
+import types
+import iarm.tracer
+
+NO_REGISTER = -1  # The instruction doesn't change a register
+MANY_REGISTERS = -2  # The instruction can change any number of registers, they are found by comparing
+
+# Instructions that don't write the register in their first operand
+NO_WRITE = ('CMP', 'CMN', 'TST', 'STR', 'STRB', 'STRH', 'BX', 'MSR', 'NOP')
+# Instructions that write registers that aren't their first operand
+MANY_WRITES = ('POP', 'LDM')
+LINK_WRITES = ('BL', 'BLX')  # Only write LR
+
+
+def decode_writes(register, program):
+    """
+    Find the register each instruction in a program writes, from its decoded operands
+    :param register: The register file the program runs on
+    :param program: The decoded instructions
+    :return: An array of register indices, NO_REGISTER, or MANY_REGISTERS
+    """
+    pc = register.index('PC')
+    lr = register.index('LR')
+    sp = register.index('SP')
+    writes = array.array('b')
+    for instruction in program:
+        op = instruction.op
+        if op in MANY_WRITES:
+            write = MANY_REGISTERS
+        elif op in LINK_WRITES:
+            write = lr
+        elif op == 'PUSH':
+            write = sp
+        elif op in NO_WRITE or not instruction.form.startswith('r'):
+            write = NO_REGISTER
+        else:
+            write = instruction.operands[0]
+        if write == pc:
+            write = NO_REGISTER  # The PC is saved for every step anyway
+        writes.append(write)
+    return writes
+
+
+class History(object):
+    """
+    An undo log of the steps an interpreter has run, with periodic checkpoints
+
+    Steps are numbered by how many steps have been recorded,
+    so the state at step n is the state after running n steps.
+    """
+    def __init__(self, cpu, interval=1000, limit=1000000):
+        """
+        :param cpu: The interpreter being recorded
+        :param interval: How many steps between checkpoints
+        :param limit: About how many steps to keep, older steps are forgotten
+        """
+        self.cpu = cpu
+        self.interval = interval
+        self.limit = limit
+        self.clear()
+
+    def clear(self):
+        """
+        Forget all recorded steps, making the current state step 0
+        :return:
+        """
+        self.step = 0  # The current step
+        self.first = 0  # The oldest step that can be gone back to
+        # What each step overwrote, indexed by step - first
+        self.pcs = array.array('I')
+        self.registers = array.array('b')
+        self.values = array.array('I')
+        self.flags = array.array('B')
+        self.extra = {}  # Step to all the registers before it, for steps that write many registers
+        self.stores = {}  # Step to a list of (write method, address, old value), for steps that store to memory
+        self.checkpoints = {}  # Step to the registers, flags, and memory at that step
+
+    def __len__(self):
+        return self.step - self.first
+
+    def checkpoint(self, step, pc):
+        """
+        Save the whole state at step, forgetting the oldest steps if over the limit
+        :param step: The current step
+        :param pc: The current PC, which is kept in a local variable while running
+        :return: The step of the next checkpoint
+        """
+        register = self.cpu.register
+        registers = list(register.data)
+        registers[register.index('PC')] = pc
+        self.checkpoints[step] = (registers, iarm.tracer.pack_flags(register), self.cpu.memory.save())
+        if step - self.first > self.limit:
+            self.forget(step - self.limit)
+        return step - step % self.interval + self.interval
+
+    def forget(self, step):
+        """
+        Forget the steps before step
+        :param step: The oldest step to keep
+        :return:
+        """
+        count = step - self.first
+        for column in (self.pcs, self.registers, self.values, self.flags):
+            del column[:count]
+        for s in range(self.first, step):
+            self.extra.pop(s, None)
+            self.stores.pop(s, None)
+        for old in [s for s in self.checkpoints if s < step]:
+            del self.checkpoints[old]
+        self.first = step
+
+    def journal(self, memory, stores):
+        """
+        Shadow the write methods of memory with ones that save the old value first
+
+        The old value is read, and put back by `undo`, with the methods of the memory's class,
+        so they are not caught by anything else shadowing them, like watchpoints.
+        :param memory: The memory of the interpreter
+        :param stores: The list the old values are appended to
+        :return: A function to remove the shadowing methods
+        """
+        names = (('write_word', 'read_word'), ('write_halfword', 'read_halfword'), ('write_byte', 'read_byte'))
+
+        def journaled(write, read, undo):
+            def journal_func(address, value):
+                stores.append((undo, address, read(address)))
+                write(address, value)
+            return journal_func
+
+        cls = type(memory)
+        return iarm.tracer.shadow(memory, {
+            write: journaled(getattr(memory, write), types.MethodType(getattr(cls, read), memory),
+                             types.MethodType(getattr(cls, write), memory))
+            for write, read in names})
+
+    def undo(self, step):
+        """
+        Put back what step overwrote, going from the state at step + 1 to step
+        :param step: The step to undo
+        :return:
+        """
+        register = self.cpu.register
+        regs = register.data
+        k = step - self.first
+        write = self.registers[k]
+        if write >= 0:
+            regs[write] = self.values[k]
+        elif write == MANY_REGISTERS:
+            regs[:] = self.extra[step]
+        regs[register.index('PC')] = self.pcs[k]
+        iarm.tracer.unpack_flags(register, self.flags[k])
+        for write_func, address, value in reversed(self.stores.get(step, ())):
+            write_func(address, value)
+
+    def back(self, steps=1):
+        """
+        Go back a number of steps
+        :param steps: How many steps to go back
+        :return: The step gone to
+        """
+        return self.goto(self.step - steps)
+
+    def goto(self, step):
+        """
+        Go to the state at step, going back through the log or running forward
+        :param step: The step to go to
+        :return: The step gone to, which is earlier than step if the program ends first
+        """
+        if step > self.step:
+            self.cpu.run(step - self.step)
+            return self.step
+        if step < self.first:
+            raise IndexError("Can't go back to step {}, the oldest step kept is {}".format(step, self.first))
+
+        current = self.step
+        after = [s for s in self.checkpoints if step <= s < current]
+        if after:
+            current = min(after)
+            registers, flags, memory = self.checkpoints[current]
+            self.cpu.register.data[:] = registers
+            iarm.tracer.unpack_flags(self.cpu.register, flags)
+            self.cpu.memory.restore(memory)
+        for s in range(current - 1, step - 1, -1):
+            self.undo(s)
+
+        # Forget the steps gone back over, they are recorded again if run
+        count = step - self.first
+        for column in (self.pcs, self.registers, self.values, self.flags):
+            del column[count:]
+        for s in range(step, self.step):
+            self.extra.pop(s, None)
+            self.stores.pop(s, None)
+        for later in [s for s in self.checkpoints if s > step]:
+            del self.checkpoints[later]
+        self.step = step
+        return step
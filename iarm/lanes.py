@@ -0,0 +1,890 @@
+"""
+Run one program over many sets of inputs at once, one lane per set
+
+    lanes = iarm.lanes.Lanes(source, 1000)
+    lanes.set_register('R0', numpy.arange(1000))
+    lanes.run()
+    lanes.register('R1')  # R1 of every lane, as an array
+
+Each register is a numpy uint32 array with an element per lane, the flags are bool arrays,
+and memory is a lanes by bytes uint8 array.
+The program is decoded once by an `Arm`, and each decoded instruction (its op, form, and operands)
+is turned into a function that runs it on every lane at once.
+
+Every lane has its own PC.
+The lanes at the lowest PC run together, so lanes that branch apart
+run one side of the branch at a time and join up again where the sides meet.
+While all the lanes are at the same PC no masking is needed,
+so programs that rarely branch apart run fastest.
+A lane that faults stops with its error in `errors`, and the other lanes carry on.
+
+Only the instructions that work on registers, flags, and memory can be run in lanes
+(not BKPT, MRS, MSR, or the instructions that aren't implemented).
+This needs numpy, which is not needed by the rest of iarm.
+"""
+
+import iarm.arm
+import iarm.batch
+import iarm.exceptions
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MASK = 0xFFFFFFFF
+SIGN = 0x80000000
+
+# Whether each conditional branch is taken, from the flag arrays
+CONDITIONS = {
+    'BCC': lambda n, z, c, v: ~c,
+    'BCS': lambda n, z, c, v: c,
+    'BEQ': lambda n, z, c, v: z,
+    'BGE': lambda n, z, c, v: n == v,
+    'BGT': lambda n, z, c, v: (n == v) & ~z,
+    'BHI': lambda n, z, c, v: c & ~z,
+    'BHS': lambda n, z, c, v: c,
+    'BLE': lambda n, z, c, v: z | (n != v),
+    'BLO': lambda n, z, c, v: ~c,
+    'BLS': lambda n, z, c, v: ~c | z,
+    'BLT': lambda n, z, c, v: n != v,
+    'BMI': lambda n, z, c, v: n,
+    'BNE': lambda n, z, c, v: ~z,
+    'BPL': lambda n, z, c, v: ~n,
+    'BVC': lambda n, z, c, v: ~v,
+    'BVS': lambda n, z, c, v: v,
+}
+
+
+def write(row, value, mask):
+    """
+    Set the lanes of row in mask to value
+    :param row: A register or flag array
+    :param value: An array, or a value for every lane
+    :param mask: A bool array of the lanes to set, None for all of them
+    :return:
+    """
+    if mask is None:
+        row[:] = value
+    else:
+        numpy.copyto(row, value, where=mask, casting='unsafe')
+
+
+def uniform(targets, mask):
+    """
+    Get where lanes go next, as one index if they all go to the same place
+    :param targets: An array of the index each lane goes to
+    :param mask: The lanes that ran, None for all of them
+    :return: An int, or an int64 array of indices
+    """
+    chosen = targets if mask is None else targets[mask]
+    if len(chosen) and (chosen == chosen[0]).all():
+        return int(chosen[0])
+    return targets.astype(numpy.int64)
+
+
+class Lanes(object):
+    """
+    A program with registers, flags, and memory for each of a number of lanes
+    """
+    def __init__(self, source, lanes, memory_size=1024, origin=None):
+        """
+        :param source: The program
+        :param lanes: How many lanes to run it in
+        :param memory_size: The bytes of memory in each lane
+        :param origin: Where the program came from, for error messages
+        """
+        if numpy is None:
+            raise ImportError("Running in lanes needs numpy")
+        self.cpu = iarm.arm.Arm(memory_size, False)
+        self.cpu.evaluate(source, origin)  # Execution is postponed, this only decodes the program
+        register = self.cpu.register
+        self.size = lanes
+        self.memory_size = memory_size
+
+        # Every lane starts in the state the program was decoded into, like after DCD and SPACE
+        self.regs = numpy.repeat(numpy.array(register.data, dtype=numpy.uint32)[:, None], lanes, axis=1)
+        self.n = numpy.full(lanes, register.n, dtype=bool)
+        self.z = numpy.full(lanes, register.z, dtype=bool)
+        self.c = numpy.full(lanes, register.c, dtype=bool)
+        self.v = numpy.full(lanes, register.v, dtype=bool)
+        self.memory = numpy.repeat(numpy.frombuffer(bytes(self.cpu.memory.data), dtype=numpy.uint8)[None, :],
+                                   lanes, axis=0)
+        self.pcs = numpy.full(lanes, register['PC'] - 1, dtype=numpy.int64)  # The index of each lane's next instruction
+        self.steps = numpy.zeros(lanes, dtype=numpy.int64)  # How many instructions each lane has run
+        self.live = numpy.ones(lanes, dtype=bool)  # Lanes that haven't faulted
+        self.errors = [None] * lanes  # The exception that stopped each lane
+        self.stopped = False  # Set when a lane faults, so the group running can be picked again
+        self.all_lanes = numpy.arange(lanes)
+        self.program = [self.translate(address, instruction) for address, instruction in enumerate(self.cpu.program)]
+
+    def register(self, name):
+        """
+        :param name: A register name, like 'R0' or 'SP'
+        :return: The register's array, one element per lane
+        """
+        return self.regs[self.cpu.register.index(name)]
+
+    def set_register(self, name, values):
+        """
+        Set a register in every lane
+        :param name: A register name, like 'R0' or 'SP'
+        :param values: One value for every lane, or a value per lane
+        :return:
+        """
+        self.register(name)[:] = numpy.asarray(values, dtype=numpy.int64) & MASK
+
+    def read_word(self, address):
+        """
+        :param address: A byte address
+        :return: The word at address in every lane
+        """
+        return self.memory[:, address:address + 4].copy().view('<u4')[:, 0]
+
+    def write_word(self, address, values):
+        """
+        Write a word to memory in every lane
+        :param address: A byte address
+        :param values: One value for every lane, or a value per lane
+        :return:
+        """
+        words = numpy.broadcast_to(numpy.asarray(values, dtype=numpy.int64) & MASK, (self.size,))
+        self.memory[:, address:address + 4] = words.astype('<u4')[:, None].view(numpy.uint8)
+
+    def state(self, lane):
+        """
+        Get the registers of a lane, like `dict(Arm.register.items())`
+        :param lane: The lane number
+        :return: A dict of register name to value, with the flags packed into the APSR
+        """
+        register = self.cpu.register
+        state = {name: int(self.regs[register.index(name), lane]) for name in register.keys()}
+        state['R15'] = (int(self.pcs[lane]) + 1) & MASK
+        apsr = state['APSR'] & ~register.FLAG_MASK
+        for flag, bit in register.FLAG_BITS:
+            if getattr(self, flag)[lane]:
+                apsr |= 1 << bit
+        state['APSR'] = apsr
+        return state
+
+    def run(self, steps=None):
+        """
+        Run every lane to the end of the program, or for a number of steps
+
+        Each step runs one instruction in the lanes at the lowest PC,
+        so no lane runs more than steps instructions.
+        How many each lane ran is added to `steps`.
+        :param steps: How many steps to run, None runs until every lane has finished or faulted
+        :return: The number of steps run
+        """
+        limit = -1 if steps is None else max(int(steps), 0)
+        start = limit
+        program = self.program
+        end = len(program)
+        pcs = self.pcs
+        live = self.live
+        while limit:
+            running = live & (pcs < end)
+            if not running.any():
+                break
+            pc = int(pcs[running].min())
+            group = running & (pcs == pc)
+            if group.all():
+                group = None
+                waiting = end
+            else:
+                others = running & ~group
+                waiting = int(pcs[others].min()) if others.any() else end
+
+            # Run the group together until it branches apart, a lane faults,
+            # or it gets to where other lanes are waiting
+            self.stopped = False
+            together = 0
+            targets = None
+            try:
+                while limit and pc < waiting:
+                    limit -= 1
+                    together += 1
+                    target = program[pc](group)
+                    if target is None:
+                        pc += 1
+                    elif type(target) is int:
+                        pc = target
+                    else:
+                        targets = target
+                        break
+                    if self.stopped:
+                        break
+            finally:
+                ran = live if group is None else group & live  # Lanes that faulted keep the PC of the fault
+                if targets is None:
+                    pcs[ran] = pc
+                else:
+                    pcs[ran] = targets[ran]
+                if group is None:
+                    self.steps += together
+                else:
+                    self.steps[group] += together
+        return start - limit
+
+    def fault(self, lanes, address, error):
+        """
+        Stop lanes with an error, the way `Arm.run` stops with it
+        :param lanes: An array of the lane numbers
+        :param address: The index of the instruction that faulted
+        :param error: A function of a lane number that gives its exception
+        :return:
+        """
+        location = self.cpu.locate(address)
+        for lane in lanes:
+            exception = error(lane)
+            if isinstance(exception, iarm.exceptions.HardFault):
+                exception.args = (location,) + exception.args  # As Arm.run does
+            self.errors[lane] = exception
+        self.live[lanes] = False
+        self.pcs[lanes] = address
+        self.stopped = True
+
+    def lanes(self, mask):
+        """
+        :param mask: A bool array of lanes, None for all of them
+        :return: An array of the lane numbers
+        """
+        return self.all_lanes if mask is None else numpy.flatnonzero(mask)
+
+    def check_range(self, address, lanes, addresses, size):
+        """
+        Fault the lanes accessing memory out of range
+        :param address: The index of the instruction
+        :param lanes: An array of the lane numbers accessing memory
+        :param addresses: The address each of those lanes accesses
+        :param size: The bytes accessed
+        :return: The lanes and addresses that are in range
+        """
+        bad = addresses + size > self.memory_size
+        if bad.any():
+            memory_size = self.memory_size
+            where = dict(zip(lanes[bad].tolist(), addresses[bad].tolist()))
+            self.fault(lanes[bad], address, lambda lane: iarm.exceptions.HardFault(
+                "Memory access out of range; Address: {}  Size: {}  Memory size: {}".format(
+                    where[lane], size, memory_size)))
+            return lanes[~bad], addresses[~bad]
+        return lanes, addresses
+
+    def check_aligned(self, address, lanes, checked, size, message):
+        """
+        Fault the lanes whose value isn't a multiple of size
+        :param address: The index of the instruction
+        :param lanes: An array of the lane numbers
+        :param checked: The value of each lane that has to be aligned
+        :param size: What it has to be a multiple of
+        :param message: A function of a lane number that gives the error message
+        :return: A bool array of the lanes that are aligned
+        """
+        aligned = checked % size == 0
+        if not aligned.all():
+            self.fault(lanes[~aligned], address, lambda lane: iarm.exceptions.HardFault(message(lane)))
+        return aligned
+
+    def load(self, lanes, addresses, size):
+        """
+        Read little endian values from memory
+        :param lanes: An array of the lane numbers
+        :param addresses: The address to read in each lane
+        :param size: The bytes to read
+        :return: The values, as uint32
+        """
+        memory = self.memory
+        value = memory[lanes, addresses].astype(numpy.uint32)
+        for i in range(1, size):
+            value |= memory[lanes, addresses + i].astype(numpy.uint32) << (8 * i)
+        return value
+
+    def store(self, lanes, addresses, values, size):
+        """
+        Write little endian values to memory
+        :param lanes: An array of the lane numbers
+        :param addresses: The address to write in each lane
+        :param values: The values to write, as uint32
+        :param size: The bytes to write
+        :return:
+        """
+        memory = self.memory
+        for i in range(size):
+            memory[lanes, addresses + i] = (values >> (8 * i)) & 0xFF
+
+    def translate(self, address, instruction):
+        """
+        Turn a decoded instruction into a function that runs it in lanes
+
+        The function is called with a bool array of the lanes to run it in (or None for all of them),
+        and returns None to go on to the next instruction,
+        or the index to go to next as an int, or as an array with one for each lane.
+        :param address: Where the instruction is in the program
+        :param instruction: The decoded instruction
+        :return: The function
+        """
+        op = instruction.op
+        if op in CONDITIONS:
+            make = self.conditional_branch
+        else:
+            make = getattr(self, 'lane_' + op, None)
+        if make is None:
+            raise iarm.exceptions.NotImplementedError("{}{} can't be run in lanes".format(
+                self.cpu.locate(address), op))
+        func = make(address, instruction.form, *instruction.operands)
+        if instruction.uses_pc and op not in ('BL', 'BLX'):
+            func = self.with_pc(address, func)
+        return func
+
+    def with_pc(self, address, func):
+        """
+        Give an instruction the PC, and branch if it writes to it, like `Arm.bind_pc`
+        """
+        pc = self.regs[self.cpu.register.index('PC')]
+        next_pc = address + 1
+
+        def uses_pc(mask):
+            write(pc, next_pc, mask)
+            target = func(mask)
+            if target is None:
+                return uniform(pc, mask)  # Lanes that didn't write it go on to next_pc
+            return target
+        return uses_pc
+
+    # Flags
+
+    def set_NZ(self, result, mask):
+        where = True if mask is None else mask
+        numpy.greater_equal(result, SIGN, out=self.n, where=where)
+        numpy.equal(result, 0, out=self.z, where=where)
+
+    def set_add(self, oper_1, oper_2, total, mask):
+        """
+        Set the NZCV flags for an addition, from int64 operands and their total
+        :return: The result, truncated to the register width
+        """
+        result = total & MASK
+        self.set_NZ(result, mask)
+        where = True if mask is None else mask
+        numpy.greater(total, MASK, out=self.c, where=where)
+        numpy.greater_equal((oper_1 ^ result) & (oper_2 ^ result) & SIGN, SIGN, out=self.v, where=where)
+        return result
+
+    def set_sub(self, oper_1, oper_2, total, mask):
+        """
+        Set the NZCV flags for a subtraction, from int64 operands and their difference
+        :return: The result, truncated to the register width
+        """
+        result = total & MASK
+        self.set_NZ(result, mask)
+        where = True if mask is None else mask
+        numpy.greater_equal(total, 0, out=self.c, where=where)
+        numpy.greater_equal((oper_1 ^ oper_2) & (oper_1 ^ result) & SIGN, SIGN, out=self.v, where=where)
+        return result
+
+    # Instructions, each takes the operands of the decoded instruction
+
+    def lane_NOP(self, address, form):
+        def NOP(mask):
+            return
+        return NOP
+
+    def lane_MOV(self, address, form, x, y):
+        rx, ry = self.regs[x], self.regs[y]
+
+        def MOV(mask):
+            write(rx, ry, mask)
+        return MOV
+
+    def lane_MOVS(self, address, form, a, b):
+        ra = self.regs[a]
+        if form == 'ri':
+            def MOVS(mask):
+                write(ra, b, mask)
+                self.set_NZ(b, mask)
+        else:
+            rb = self.regs[b]
+
+            def MOVS(mask):
+                value = rb.copy()
+                write(ra, value, mask)
+                self.set_NZ(value, mask)
+        return MOVS
+
+    def lane_MVNS(self, address, form, a, b):
+        ra, rb = self.regs[a], self.regs[b]
+
+        def MVNS(mask):
+            value = ~rb
+            write(ra, value, mask)
+            self.set_NZ(value, mask)
+        return MVNS
+
+    def _unary(self, a, b, function):
+        ra, rb = self.regs[a], self.regs[b]
+
+        def unary(mask):
+            write(ra, function(rb.astype(numpy.int64)) & MASK, mask)
+        return unary
+
+    def lane_REV(self, address, form, a, b):
+        return self._unary(a, b, lambda x: ((x & 0xFF000000) >> 24) | ((x & 0x00FF0000) >> 8) |
+                           ((x & 0x0000FF00) << 8) | ((x & 0x000000FF) << 24))
+
+    def lane_REV16(self, address, form, a, b):
+        return self._unary(a, b, lambda x: ((x & 0xFF00FF00) >> 8) | ((x & 0x00FF00FF) << 8))
+
+    def lane_REVSH(self, address, form, a, b):
+        def revsh(x):
+            value = ((x & 0x0000FF00) >> 8) | ((x & 0x000000FF) << 8)
+            return numpy.where(value & (1 << 15), value | 0xFFFF0000, value)
+        return self._unary(a, b, revsh)
+
+    def lane_SXTB(self, address, form, a, b):
+        return self._unary(a, b, lambda x: numpy.where(x & (1 << 7), 0xFFFFFF00 + (x & 0xFF), x & 0xFF))
+
+    def lane_SXTH(self, address, form, a, b):
+        return self._unary(a, b, lambda x: numpy.where(x & (1 << 15), 0xFFFF0000 + (x & 0xFFFF), x & 0xFFFF))
+
+    def lane_UXTB(self, address, form, a, b):
+        return self._unary(a, b, lambda x: x & 0xFF)
+
+    def lane_UXTH(self, address, form, a, b):
+        return self._unary(a, b, lambda x: x & 0xFFFF)
+
+    def _logic(self, a, c, function, store=True):
+        ra, rc = self.regs[a], self.regs[c]
+
+        def logic(mask):
+            value = function(ra, rc)
+            if store:
+                write(ra, value, mask)
+            self.set_NZ(value, mask)
+        return logic
+
+    def lane_ANDS(self, address, form, a, c):
+        return self._logic(a, c, lambda x, y: x & y)
+
+    def lane_BICS(self, address, form, a, c):
+        return self._logic(a, c, lambda x, y: x & ~y)
+
+    def lane_EORS(self, address, form, a, c):
+        return self._logic(a, c, lambda x, y: x ^ y)
+
+    def lane_ORRS(self, address, form, a, c):
+        return self._logic(a, c, lambda x, y: x | y)
+
+    def lane_TST(self, address, form, a, b):
+        return self._logic(a, b, lambda x, y: x & y, store=False)
+
+    def lane_MULS(self, address, form, a, b):
+        ra, rb = self.regs[a], self.regs[b]
+
+        def MULS(mask):
+            value = rb * ra  # uint32 multiplication wraps around like the register does
+            write(ra, value, mask)
+            self.set_NZ(value, mask)
+        return MULS
+
+    def lane_ADD(self, address, form, x, y, z):
+        rx, ry = self.regs[x], self.regs[y]
+        if form == 'rrr':
+            rz = self.regs[z]
+
+            def ADD(mask):
+                write(rx, ry + rz, mask)
+        else:
+            def ADD(mask):
+                write(rx, (ry.astype(numpy.int64) + z) & MASK, mask)
+        return ADD
+
+    def lane_SUB(self, address, form, a, b, c):
+        ra, rb = self.regs[a], self.regs[b]
+
+        def SUB(mask):
+            write(ra, (rb.astype(numpy.int64) - c) & MASK, mask)
+        return SUB
+
+    def _arithmetic(self, a, b, c, form, subtract):
+        """
+        Add or subtract Rc (or an immediate) and Rb, setting the flags and Ra (if a is not None)
+
+        This works on the uint32 registers as they are, the carry is found from the result wrapping around.
+        """
+        ra = None if a is None else self.regs[a]
+        rb = self.regs[b]
+        rc = self.regs[c] if form.endswith('rr') else None
+        n, z, flag_c, v = self.n, self.z, self.c, self.v
+
+        def arithmetic(mask):
+            oper_2 = c if rc is None else rc
+            if subtract:
+                result = rb - oper_2
+                carry = rb >= oper_2
+                overflow = (rb ^ oper_2) & (rb ^ result)
+            else:
+                result = rb + oper_2
+                carry = result < rb
+                overflow = (rb ^ result) & (oper_2 ^ result)
+            where = True if mask is None else mask
+            numpy.greater_equal(result, SIGN, out=n, where=where)
+            numpy.equal(result, 0, out=z, where=where)
+            numpy.copyto(flag_c, carry, where=where)
+            numpy.greater_equal(overflow, SIGN, out=v, where=where)
+            if ra is not None:
+                write(ra, result, mask)
+        return arithmetic
+
+    def _with_carry(self, a, c, subtract):
+        """
+        Add or subtract Rc and the carry from Ra, setting the flags and Ra
+        The carry is added to the second operand, as the instructions do
+        """
+        ra, rc = self.regs[a], self.regs[c]
+        flags = self.set_sub if subtract else self.set_add
+        flag_c = self.c
+
+        def with_carry(mask):
+            oper_1 = ra.astype(numpy.int64)
+            oper_2 = rc.astype(numpy.int64)
+            if subtract:
+                oper_2 = oper_2 + flag_c
+                total = oper_1 - oper_2
+            else:
+                total = oper_1 + oper_2 + flag_c
+            write(ra, flags(oper_1, oper_2, total, mask), mask)
+        return with_carry
+
+    def lane_ADDS(self, address, form, a, b, c):
+        return self._arithmetic(a, b, c, form, False)
+
+    def lane_SUBS(self, address, form, a, b, c):
+        return self._arithmetic(a, b, c, form, True)
+
+    def lane_ADCS(self, address, form, a, c):
+        return self._with_carry(a, c, False)
+
+    def lane_SBCS(self, address, form, a, c):
+        return self._with_carry(a, c, True)
+
+    def lane_CMP(self, address, form, m, n):
+        return self._arithmetic(None, m, n, form, True)
+
+    def lane_CMN(self, address, form, a, b):
+        return self._arithmetic(None, a, b, 'rrr', False)
+
+    def lane_RSBS(self, address, form, a, b):
+        ra, rb = self.regs[a], self.regs[b]
+
+        def RSBS(mask):
+            oper_2 = rb.astype(numpy.int64)
+            write(ra, self.set_sub(0, oper_2, -oper_2, mask), mask)
+        return RSBS
+
+    def _shift(self, a, b, form, amount, shift):
+        """
+        Shift Rb by an immediate or the register amount, and set Ra and the NZC flags
+        :param shift: A function of the uint64 value and int64 shift amounts giving the result and carry
+        """
+        ra, rb = self.regs[a], self.regs[b]
+        amounts = self.regs[amount] if form == 'rr' else None
+
+        def shifted(mask):
+            shift_amount = amount if amounts is None else amounts.astype(numpy.int64)
+            result, carry = shift(rb.astype(numpy.uint64), shift_amount)
+            result &= MASK
+            write(ra, result, mask)
+            self.set_NZ(result, mask)
+            if amounts is not None or amount != 0:  # Shifting by an immediate 0 is MOVS, which leaves C alone
+                write(self.c, carry, mask)
+        return shifted
+
+    @staticmethod
+    def bit(value, index):
+        """Bit index of each value, for an int64 array of indices that can be out of range"""
+        in_range = (index >= 0) & (index < 64)
+        return in_range & (((value >> numpy.clip(index, 0, 63).astype(numpy.uint64)) & 1) != 0)
+
+    def lane_LSLS(self, address, form, a, b, amount=None):
+        if form == 'rr':
+            a, b, amount = a, a, b
+
+        def shift(x, n):
+            n = numpy.asarray(n, dtype=numpy.int64)
+            result = numpy.where(n < 32, x << numpy.minimum(n, 32).astype(numpy.uint64), 0)
+            return result, (n < 32) & self.bit(x, 32 - n)
+        return self._shift(a, b, form, amount, shift)
+
+    def lane_LSRS(self, address, form, a, b, amount=None):
+        if form == 'rr':
+            a, b, amount = a, a, b
+
+        def shift(x, n):
+            n = numpy.asarray(n, dtype=numpy.int64)
+            return x >> numpy.minimum(n, 32).astype(numpy.uint64), (n > 0) & self.bit(x, n - 1)
+        return self._shift(a, b, form, amount, shift)
+
+    def lane_ASRS(self, address, form, a, b, amount=None):
+        if form == 'rr':
+            a, b, amount = a, a, b
+
+        def shift(x, n):
+            n = numpy.asarray(n, dtype=numpy.int64)
+            clamped = numpy.minimum(n, 32).astype(numpy.uint64)
+            extension = MASK ^ (numpy.uint64(MASK) >> clamped)
+            result = numpy.where(x & SIGN, (x >> clamped) | extension, x >> clamped)
+            return result, (n > 0) & self.bit(x, n - 1)
+        return self._shift(a, b, form, amount, shift)
+
+    # Branches
+
+    def lane_B(self, address, form, label):
+        labels = self.cpu.labels
+
+        if label == '.':
+            def B(mask):
+                self.fault(self.lanes(mask), address,
+                           lambda lane: iarm.exceptions.EndOfProgram("You have reached an infinite loop"))
+            return B
+
+        def B(mask):
+            return labels[label]
+        return B
+
+    def conditional_branch(self, address, form, label):
+        labels = self.cpu.labels
+        condition = CONDITIONS[self.cpu.program[address].op]
+        n, z, c, v = self.n, self.z, self.c, self.v
+        next_pc = address + 1
+
+        def branch(mask):
+            taken = condition(n, z, c, v)
+            chosen = taken if mask is None else taken[mask]
+            if chosen.all():
+                return labels[label]
+            if not chosen.any():
+                return None
+            return numpy.where(taken, labels[label], next_pc)
+        return branch
+
+    def lane_BL(self, address, form, label):
+        labels = self.cpu.labels
+        lr = self.regs[self.cpu.register.index('LR')]
+        next_pc = address + 1
+
+        def BL(mask):
+            write(lr, next_pc, mask)
+            return labels[label]
+        return BL
+
+    def lane_BLX(self, address, form, j):
+        rj = self.regs[j]
+        lr = self.regs[self.cpu.register.index('LR')]
+        next_pc = address + 1
+
+        def BLX(mask):
+            target = rj.copy()
+            write(lr, next_pc, mask)
+            return uniform(target, mask)
+        return BLX
+
+    def lane_BX(self, address, form, j):
+        rj = self.regs[j]
+
+        def BX(mask):
+            return uniform(rj, mask)
+        return BX
+
+    # Memory
+
+    def lane_ADR(self, address, form, a, *operands):
+        ra = self.regs[a]
+        if form == 'rl':
+            labels = self.cpu.labels
+            label, = operands
+
+            def ADR(mask):
+                write(ra, labels[label], mask)
+        else:
+            b, c = operands
+            rb = self.regs[b]
+
+            def ADR(mask):
+                write(ra, (rb.astype(numpy.int64) + c) & MASK, mask)
+        return ADR
+
+    def _load(self, address, a, b, c, form, size, signed=False, aligned=None, message=None):
+        """
+        Load Ra from Rb + Rc (or an immediate)
+        :param aligned: A function of the lane's address and Rb giving what must be a multiple of size,
+        None when the instruction doesn't check
+        :param message: A function of Rb and Rc (or the immediate) for the alignment error
+        """
+        ra, rb = self.regs[a], self.regs[b]
+        rc = self.regs[c] if form == 'rrr' else None
+        sign_bit = 1 << (8 * size - 1)
+        extension = MASK ^ ((1 << (8 * size)) - 1)
+
+        def load(mask):
+            lanes = self.lanes(mask)
+            base = rb[lanes].astype(numpy.int64)
+            offset = c if rc is None else rc[lanes].astype(numpy.int64)
+            addresses = base + offset
+            if aligned is not None:
+                ok = self.check_aligned(address, lanes, aligned(addresses, base), size, lambda lane: message(
+                    int(rb[lane]), c if rc is None else int(rc[lane])))
+                lanes, addresses = lanes[ok], addresses[ok]
+            lanes, addresses = self.check_range(address, lanes, addresses, size)
+            value = self.load(lanes, addresses, size)
+            if signed:
+                value = numpy.where(value & sign_bit, value | extension, value)
+            ra[lanes] = value
+        return load
+
+    def lane_LDR(self, address, form, a, *operands):
+        ra = self.regs[a]
+        if form == 'ri':
+            value, = operands
+
+            def LDR(mask):
+                write(ra, value, mask)
+            return LDR
+        if form == 'rl':
+            labels = self.cpu.labels
+            label, = operands
+
+            def LDR(mask):
+                write(ra, labels[label], mask)
+            return LDR
+        b, c = operands
+        if form == 'rri':
+            message = "Memory access not word aligned; Register: {}  Immediate: {}".format
+        else:
+            message = "Memory access not word aligned; Register: {}  Register: {}".format
+        return self._load(address, a, b, c, form, 4, aligned=lambda addresses, base: addresses, message=message)
+
+    def lane_LDRB(self, address, form, a, b, c):
+        return self._load(address, a, b, c, form, 1)
+
+    def lane_LDRSB(self, address, form, a, b, c):
+        return self._load(address, a, b, c, form, 1, signed=True)
+
+    def lane_LDRH(self, address, form, a, b, c):
+        message = "Memory access not half word aligned; Register: {}  Immediate: {}".format
+        if form == 'rri':
+            aligned = lambda addresses, base: base  # The instruction only checks the register
+        else:
+            aligned = lambda addresses, base: addresses
+        return self._load(address, a, b, c, form, 2, aligned=aligned, message=message)
+
+    def lane_LDRSH(self, address, form, a, b, c):
+        return self._load(address, a, b, c, form, 2, signed=True, aligned=lambda addresses, base: addresses,
+                          message=lambda b_value, c_value:
+                          "Memory access not half word aligned\nR{}: {}\nR{}: {}".format(b, b_value, c, c_value))
+
+    def _store(self, address, a, b, c, form, size):
+        ra, rb = self.regs[a], self.regs[b]
+        rc = self.regs[c] if form == 'rrr' else None
+
+        def store(mask):
+            lanes = self.lanes(mask)
+            offset = c if rc is None else rc[lanes].astype(numpy.int64)
+            lanes, addresses = self.check_range(address, lanes, rb[lanes].astype(numpy.int64) + offset, size)
+            self.store(lanes, addresses, ra[lanes], size)
+        return store
+
+    def lane_STR(self, address, form, a, b, c):
+        return self._store(address, a, b, c, form, 4)
+
+    def lane_STRB(self, address, form, a, b, c):
+        return self._store(address, a, b, c, form, 1)
+
+    def lane_STRH(self, address, form, a, b, c):
+        return self._store(address, a, b, c, form, 2)
+
+    def lane_PUSH(self, address, form, registers):
+        sp = self.regs[self.cpu.register.index('SP')]
+        rows = [self.regs[register] for register in registers]
+
+        def PUSH(mask):
+            lanes = self.lanes(mask)
+            for row in rows:
+                addresses = (sp[lanes].astype(numpy.int64) - 4) & MASK
+                sp[lanes] = addresses
+                lanes, addresses = self.check_range(address, lanes, addresses, 4)
+                self.store(lanes, addresses, row[lanes], 4)
+        return PUSH
+
+    def lane_POP(self, address, form, registers):
+        sp = self.regs[self.cpu.register.index('SP')]
+        rows = [self.regs[register] for register in registers]
+
+        def POP(mask):
+            lanes = self.lanes(mask)
+            for row in rows:
+                addresses = sp[lanes].astype(numpy.int64)
+                sp[lanes] = (addresses + 4) & MASK
+                lanes, addresses = self.check_range(address, lanes, addresses, 4)
+                row[lanes] = self.load(lanes, addresses, 4)
+        return POP
+
+    def lane_LDM(self, address, form, a, registers):
+        ra = self.regs[a]
+        rows = [self.regs[register] for register in registers]
+
+        def LDM(mask):
+            lanes = self.lanes(mask)
+            addresses = ra[lanes].astype(numpy.int64)
+            for row in rows:
+                lanes, addresses = self.check_range(address, lanes, addresses, 4)
+                row[lanes] = self.load(lanes, addresses, 4)
+                addresses = addresses + 4
+            ra[lanes] = addresses & MASK
+        return LDM
+
+    def lane_STM(self, address, form, a, registers):
+        ra = self.regs[a]
+        rows = [self.regs[register] for register in registers]
+
+        def STM(mask):
+            lanes = self.lanes(mask)
+            addresses = ra[lanes].astype(numpy.int64)
+            for row in rows:
+                lanes, addresses = self.check_range(address, lanes, addresses, 4)
+                self.store(lanes, addresses, row[lanes], 4)
+                addresses = addresses + 4
+            ra[lanes] = addresses & MASK
+        return STM
+
+
+def run_vectors(source, vectors, steps=None, memory_size=iarm.batch.MEMORY_SIZE, name='lanes'):
+    """
+    Run a program once for each set of inputs, all in lanes, like running a Job for each in iarm.batch
+    :param source: The program
+    :param vectors: A list of inputs, each a dict with optional 'registers' and 'memory' like a Job's
+    :param steps: The most steps to run
+    :param memory_size: The bytes of memory for each input
+    :param name: The results are named name[0], name[1], ...
+    :return: A list of iarm.batch.Result, one for each input
+    """
+    lanes = Lanes(source, len(vectors), memory_size, name)
+    for lane, vector in enumerate(vectors):
+        for register, value in (vector.get('registers') or {}).items():
+            lanes.regs[lanes.cpu.register.index(register), lane] = value & MASK
+        for address, value in (vector.get('memory') or {}).items():
+            address = int(address)
+            lanes.memory[lane, address:address + 4] = list((value & MASK).to_bytes(4, 'little'))
+    before = lanes.memory.copy()
+    lanes.run(steps)
+
+    results = []
+    for lane in range(len(vectors)):
+        changed = numpy.flatnonzero(lanes.memory[lane] != before[lane])
+        memory = {int(address): int(lanes.memory[lane, address]) for address in changed}
+        error = lanes.errors[lane]
+        if error is not None:
+            error = '{}: {}'.format(type(error).__name__, ' '.join(str(arg) for arg in error.args))
+        results.append(iarm.batch.Result('{}[{}]'.format(name, lane), lanes.state(lane), memory,
+                                         int(lanes.steps[lane]), error))
+    return results
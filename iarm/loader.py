@@ -0,0 +1,419 @@
+"""
+Load a Thumb binary into the interpreter
+
+    cpu = iarm.arm.Arm(4096)
+    iarm.loader.load_file(cpu, 'program.bin')  # Also reads program.map if it is there
+    cpu.run()
+
+Each halfword is decoded with `TABLE`, which has an entry for every one of the 65,536 values,
+built when the module is imported.
+An entry has the op and its operands, already written as the parameters the interpreter decodes
+(like 'R1, R0, R2'), so loading is a single pass of table lookups without parsing any source.
+Each different instruction is then decoded by the interpreter once,
+so the program runs the same functions as when it is evaluated from source.
+
+The interpreter runs a list of instructions, not memory.
+The code is swept from the start, each instruction taking the next place in the program,
+and branches are given labels for the instructions they go to,
+named from the symbol map where there is one.
+The mapping symbols in the symbol map (`$t` and `$d`) say which parts of the image are code,
+and only those are decoded; without them the whole image is taken to be code.
+The image is also copied into memory, so data in it can be read and written.
+As in the interpreter, the PC and the return addresses in LR are program indices,
+so code that works out code addresses itself (other than calling with BL and returning with BX)
+won't run like it would on hardware.
+Loads from the literal pool (`LDR Rd, [PC, #imm]`) and `ADR` are given their value when loaded.
+Halfwords that aren't an instruction the interpreter has,
+like data in an image without mapping symbols, raise an error only if they are run.
+"""
+
+import collections
+import os
+import struct
+import iarm.assembler
+import iarm.exceptions
+
+# What a halfword decodes to
+# kind is one of
+# 'instruction': fields are the parameters
+# 'branch': fields are the byte offset from the PC
+# 'literal' and 'address': fields are the destination register and the byte offset from the word aligned PC
+# 'wide': the first halfword of a 32 bit instruction, see `decode_wide`
+# 'undefined': fields are the message to raise
+Entry = collections.namedtuple('Entry', 'kind op fields')
+
+CONDITIONS = {code: op for op, code in reversed(list(iarm.assembler.CONDITIONS.items()))}
+SPECIAL_REGISTERS = {sysm: name for name, sysm in reversed(list(iarm.assembler.SPECIAL_REGISTERS.items()))}
+
+# Instructions with an opcode in bits 6-15 and two low registers, and their parameters
+TWO_LOW_REGISTERS = {opcode: op for op, opcode in iarm.assembler.TWO_LOW_REGISTERS.items() if op != 'MOVS'}
+TWO_LOW_REGISTERS.update({by_register: op for op, (by_register, _) in iarm.assembler.SHIFTS.items()})
+TWO_LOW_REGISTERS[0x4280] = 'CMP'
+TWO_LOW_REGISTERS[0x41C0] = 'RORS'
+TWO_LOW_PARAMETERS = dict.fromkeys(('ANDS', 'EORS', 'ADCS', 'SBCS', 'ORRS', 'BICS', 'LSLS', 'LSRS', 'ASRS', 'RORS'),
+                                   'R{d}, R{d}, R{m}')
+TWO_LOW_PARAMETERS.update(dict.fromkeys(('TST', 'CMP', 'CMN', 'MVNS'), 'R{d}, R{m}'))
+TWO_LOW_PARAMETERS.update({'RSBS': 'R{d}, R{m}, #0', 'MULS': 'R{d}, R{m}, R{d}'})
+
+LOADS_STORES = {by_register: op for op, (by_register, _, _) in iarm.assembler.LOADS_STORES.items()}
+IMMEDIATE_LOADS_STORES = {by_immediate: (op, size)
+                          for op, (_, by_immediate, size) in iarm.assembler.LOADS_STORES.items() if by_immediate}
+
+HINTS = {0x0: 'NOP', 0x1: 'YIELD', 0x2: 'WFE', 0x3: 'WFI', 0x4: 'SEV'}
+
+
+def undefined(halfword):
+    return Entry('undefined', None, "Undefined instruction 0x{:04X}".format(halfword))
+
+
+def not_implemented(op):
+    return Entry('undefined', op, "{} is not implemented".format(op))
+
+
+def register_list(bits):
+    return ', '.join('R{}'.format(i) for i in range(8) if bits >> i & 1)
+
+
+def sign_extend(value, bits):
+    return value - (1 << bits) if value >> (bits - 1) & 1 else value
+
+
+def decode_halfword(h):
+    """
+    Decode a halfword into an Entry
+    :param h: The halfword
+    :return: The Entry
+    """
+    d = h & 7
+    m = (h >> 3) & 7
+    top = h >> 11
+    if top < 3:
+        op = ('LSLS', 'LSRS', 'ASRS')[top]
+        amount = (h >> 6) & 31
+        if op == 'LSLS' and amount == 0:
+            return Entry('instruction', 'MOVS', 'R{}, R{}'.format(d, m))
+        return Entry('instruction', op, 'R{}, R{}, #{}'.format(d, m, amount or 32))
+    if top == 3:
+        op = 'SUBS' if h & 0x200 else 'ADDS'
+        third = 'R{}' if h & 0x400 == 0 else '#{}'
+        return Entry('instruction', op, 'R{}, R{}, '.format(d, m) + third.format((h >> 6) & 7))
+    if top < 8:
+        op = ('MOVS', 'CMP', 'ADDS', 'SUBS')[top - 4]
+        n = (h >> 8) & 7
+        if op in ('MOVS', 'CMP'):
+            return Entry('instruction', op, 'R{}, #{}'.format(n, h & 0xFF))
+        return Entry('instruction', op, 'R{0}, R{0}, #{1}'.format(n, h & 0xFF))
+    if h & 0xFC00 == 0x4000:
+        op = TWO_LOW_REGISTERS[h & 0xFFC0]
+        if op == 'RORS':
+            return not_implemented(op)
+        return Entry('instruction', op, TWO_LOW_PARAMETERS[op].format(d=d, m=m))
+    if h & 0xFC00 == 0x4400:
+        d = (h >> 4) & 8 | d
+        m = (h >> 3) & 15
+        kind = (h >> 8) & 3
+        if kind == 0:
+            return Entry('instruction', 'ADD', 'R{0}, R{0}, R{1}'.format(d, m))
+        if kind == 1:
+            return Entry('instruction', 'CMP', 'R{}, R{}'.format(d, m))
+        if kind == 2:
+            return Entry('instruction', 'MOV', 'R{}, R{}'.format(d, m))
+        if h & 7:
+            return undefined(h)
+        return Entry('instruction', 'BLX' if h & 0x80 else 'BX', 'R{}'.format(m))
+    if top == 9:
+        return Entry('literal', 'LDR', ((h >> 8) & 7, (h & 0xFF) * 4))
+    if h & 0xF000 == 0x5000:
+        return Entry('instruction', LOADS_STORES[h & 0xFE00], 'R{}, [R{}, R{}]'.format(d, m, (h >> 6) & 7))
+    if 0x6000 <= h < 0x9000:
+        op, size = IMMEDIATE_LOADS_STORES[h & 0xF800]
+        return Entry('instruction', op, 'R{}, [R{}, #{}]'.format(d, m, ((h >> 6) & 31) * size))
+    if h & 0xF000 == 0x9000:
+        op = 'LDR' if h & 0x800 else 'STR'
+        return Entry('instruction', op, 'R{}, [SP, #{}]'.format((h >> 8) & 7, (h & 0xFF) * 4))
+    if top == 20:
+        return Entry('address', 'ADR', ((h >> 8) & 7, (h & 0xFF) * 4))
+    if top == 21:
+        return Entry('instruction', 'ADD', 'R{}, SP, #{}'.format((h >> 8) & 7, (h & 0xFF) * 4))
+    if h & 0xF000 == 0xB000:
+        return decode_miscellaneous(h)
+    if h & 0xF000 == 0xC000:
+        n = (h >> 8) & 7
+        if not h & 0xFF:
+            return undefined(h)
+        return Entry('instruction', 'LDM' if h & 0x800 else 'STM', 'R{}!, {{{}}}'.format(n, register_list(h)))
+    if h & 0xF000 == 0xD000:
+        condition = (h >> 8) & 15
+        if condition == 15:
+            return not_implemented('SVC')
+        if condition == 14:
+            return undefined(h)
+        return Entry('branch', CONDITIONS[condition], sign_extend(h & 0xFF, 8) * 2)
+    if top == 28:
+        return Entry('branch', 'B', sign_extend(h & 0x7FF, 11) * 2)
+    if top in (30, 31) or h & 0xF800 == 0xE800:
+        return Entry('wide', None, None)
+    return undefined(h)
+
+
+def decode_miscellaneous(h):
+    """
+    Decode a halfword from 0xB000 to 0xBFFF
+    :param h: The halfword
+    :return: The Entry
+    """
+    d = h & 7
+    m = (h >> 3) & 7
+    if h & 0xFF00 == 0xB000:
+        op = 'SUB' if h & 0x80 else 'ADD'
+        return Entry('instruction', op, 'SP, SP, #{}'.format((h & 0x7F) * 4))
+    if h & 0xFF00 == 0xB200:
+        return Entry('instruction', TWO_LOW_REGISTERS[h & 0xFFC0], 'R{}, R{}'.format(d, m))
+    if h & 0xFE00 in (0xB400, 0xBC00):
+        pushing = h & 0xFE00 == 0xB400
+        registers = register_list(h)
+        if h & 0x100:
+            registers += (', ' if registers else '') + ('R14' if pushing else 'R15')
+        if not registers:
+            return undefined(h)
+        return Entry('instruction', 'PUSH' if pushing else 'POP', '{{{}}}'.format(registers))
+    if h in (0xB662, 0xB672):
+        return not_implemented('CPSID' if h & 0x10 else 'CPSIE')
+    if h & 0xFF00 == 0xBA00 and h & 0xC0 != 0x80:
+        return Entry('instruction', TWO_LOW_REGISTERS[h & 0xFFC0], 'R{}, R{}'.format(d, m))
+    if h & 0xFF00 == 0xBE00:
+        return Entry('instruction', 'BKPT', '#{}'.format(h & 0xFF))
+    if h & 0xFF0F == 0xBF00 and (h >> 4) & 15 in HINTS:
+        op = HINTS[(h >> 4) & 15]
+        if op != 'NOP':
+            return not_implemented(op)
+        return Entry('instruction', op, '')
+    return undefined(h)
+
+
+def decode_wide(first, second):
+    """
+    Decode a 32 bit instruction
+    :param first: Its first halfword
+    :param second: Its second halfword
+    :return: The Entry
+    """
+    if first & 0xF800 == 0xF000 and second & 0xD000 == 0xD000:
+        s = (first >> 10) & 1
+        i1 = ~((second >> 13) ^ s) & 1
+        i2 = ~((second >> 11) ^ s) & 1
+        offset = (s << 24 | i1 << 23 | i2 << 22 | (first & 0x3FF) << 12 | (second & 0x7FF) << 1)
+        return Entry('branch', 'BL', sign_extend(offset, 25))
+    if first == 0xF3EF and second & 0xF000 == 0x8000 and (second & 0xFF) in SPECIAL_REGISTERS:
+        return Entry('instruction', 'MRS', 'R{}, {}'.format((second >> 8) & 15, SPECIAL_REGISTERS[second & 0xFF]))
+    if first & 0xFFF0 == 0xF380 and second & 0xFF00 == 0x8800 and (second & 0xFF) in SPECIAL_REGISTERS:
+        return Entry('instruction', 'MSR', '{}, R{}'.format(SPECIAL_REGISTERS[second & 0xFF], first & 15))
+    if first == 0xF3BF and second & 0xFFF0 in (0x8F40, 0x8F50, 0x8F60):
+        return not_implemented({0x8F40: 'DSB', 0x8F50: 'DMB', 0x8F60: 'ISB'}[second & 0xFFF0])
+    return Entry('undefined', None, "Undefined instruction 0x{:04X} 0x{:04X}".format(first, second))
+
+
+TABLE = [decode_halfword(h) for h in range(1 << 16)]
+
+
+def read_map(text):
+    """
+    Read a symbol map, as written by `iarm.assembler.Image.save`
+    :param text: The text of the map, a line of an address and a label for each label
+    :return: A dict of label to byte address, without the mapping symbols (see `read_code`)
+    """
+    symbols = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and not parts[1].startswith('$'):
+            symbols[parts[1]] = int(parts[0], 0)
+    return symbols
+
+
+def read_code(text, end):
+    """
+    Find the code of an image from the mapping symbols in its symbol map
+    :param text: The text of the map, where `$t` starts code and `$d` starts data
+    :param end: The byte address of the end of the image
+    :return: A list of the (start, end) byte addresses of the code, or None if the map has no mapping symbols
+    """
+    marks = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1] in (iarm.assembler.CODE_SYMBOL, iarm.assembler.DATA_SYMBOL):
+            marks.append((int(parts[0], 0), parts[1]))
+    if not marks:
+        return None
+    marks.sort()
+    code = []
+    for (address, symbol), (following, _) in zip(marks, marks[1:] + [(end, None)]):
+        if symbol == iarm.assembler.CODE_SYMBOL and address < following:
+            code.append((address, following))
+    return code
+
+
+def load(cpu, data, base=0, symbols=None, origin=None, code=None):
+    """
+    Decode a binary and add it to the end of the program, running it unless execution is postponed
+
+    The image is also copied into memory at base.
+    :param cpu: The Arm to load into
+    :param data: The bytes of the image
+    :param base: The byte address the image starts at
+    :param symbols: A dict of label to byte address, used to name the labels of the program
+    :param origin: Where the image came from, for error messages
+    :param code: A list of the (start, end) byte addresses of the code, like `iarm.assembler.Image.code`,
+    only these are decoded and the rest is data. Defaults to the whole image
+    :return: The byte address of each instruction loaded, by its place in the part of the program loaded
+    """
+    if base % 2 or len(data) % 2:
+        raise iarm.exceptions.ValidationError("The image must start and end on a halfword")
+    try:
+        cpu.memory.write_bytes(base, data)
+    except iarm.exceptions.HardFault:
+        raise iarm.exceptions.ValidationError("The image of {} bytes at {} does not fit in memory".format(
+            len(data), base))
+    if origin is None:
+        cpu.evaluations += 1
+        origin = '<load {}>'.format(cpu.evaluations)
+    halfwords = struct.unpack('<{}H'.format(len(data) // 2), data)
+
+    # Sweep the code into instructions
+    end = base + len(data)
+    if code is None:
+        code = [(base, end)]
+    addresses = []
+    entries = []
+    for first, last in code:
+        if first % 2 or last % 2 or not base <= first <= last <= end:
+            raise iarm.exceptions.ValidationError("The code from 0x{:08X} to 0x{:08X} is not in the image".format(
+                first, last))
+        i = (first - base) // 2
+        stop = (last - base) // 2
+        while i < stop:
+            entry = TABLE[halfwords[i]]
+            addresses.append(base + 2 * i)
+            if entry.kind == 'wide':
+                if i + 1 < stop:
+                    entry = decode_wide(halfwords[i], halfwords[i + 1])
+                    i += 1
+                else:
+                    entry = Entry('undefined', None, "Part of a 32 bit instruction 0x{:04X}".format(halfwords[i]))
+            entries.append(entry)
+            i += 1
+
+    # Name the instructions branches go to
+    start = len(cpu.program)
+    indices = {address: start + index for index, address in enumerate(addresses)}
+    if code:
+        indices.setdefault(code[-1][1], start + len(addresses))  # Branching to the end stops the program
+    names = {}
+    for label, address in (symbols or {}).items():
+        if address in indices:
+            names.setdefault(address, label)
+            cpu.labels[label] = indices[address]
+    for address, entry in zip(addresses, entries):
+        if entry.kind == 'branch':
+            target = address + 4 + entry.fields
+            if target in indices and target not in names and target != address:
+                names[target] = 'L_{:08X}'.format(target)
+                cpu.labels[names[target]] = indices[target]
+
+    # Decode the instructions, each different one only once
+    program = []
+    decoded = {}
+    for index, (address, entry) in enumerate(zip(addresses, entries), start):
+        kind, op, fields = entry
+        if kind == 'branch':
+            target = address + 4 + fields
+            if target == address and op == 'B':
+                params = '.'
+            elif target in names:
+                params = names[target]
+            else:
+                kind, fields = 'undefined', "Branch to 0x{:08X}, which is not an instruction in the image".format(
+                    target)
+        elif kind in ('literal', 'address'):
+            d, offset = fields
+            value = ((address + 4) & ~3) + offset
+            if kind == 'literal':
+                if value + 4 > end:
+                    kind, fields = 'undefined', "Literal at 0x{:08X} is not in the image".format(value)
+                else:
+                    value = int.from_bytes(data[value - base:value - base + 4], 'little')
+                    text = 'LDR R{}, [PC, #{}] ; 0x{:08X}'.format(d, offset, value)
+            else:
+                text = 'ADR R{}, 0x{:08X}'.format(d, value)
+            if kind != 'undefined':
+                instruction = constant(cpu, d, value)
+        else:
+            params = fields
+
+        if kind in ('instruction', 'branch'):
+            text = '{} {}'.format(op, params).strip()
+            instruction = decoded.get(text)
+            if instruction is None:
+                try:
+                    instruction = decoded[text] = cpu.ops[op](params)
+                except iarm.exceptions.IarmError as e:
+                    instruction = fault(cpu, type(e), *e.args)
+            instruction = cpu.bind_pc(instruction, index)
+        elif kind == 'undefined':
+            error = iarm.exceptions.NotImplementedError if op else iarm.exceptions.HardFault
+            text = op or 'UDF'
+            instruction = fault(cpu, error, fields)
+        program.append(instruction)
+        cpu.source.append(origin, index - start + 1, '0x{:08X}  {}'.format(address, text))
+
+    cpu.program += program
+    cpu.compiler.clear()
+    cpu.find_dead_flags()
+    if not cpu._postpone_execution:
+        cpu.run()
+    return addresses
+
+
+def load_file(cpu, path, map_path=None, base=0):
+    """
+    Load a binary file, and its symbol map if there is one
+    :param cpu: The Arm to load into
+    :param path: The binary
+    :param map_path: The symbol map, defaults to path with a .map extension if it exists
+    :param base: The byte address the image starts at
+    :return: The byte address of each instruction loaded
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if map_path is None:
+        map_path = os.path.splitext(path)[0] + '.map'
+        if not os.path.exists(map_path):
+            map_path = None
+    symbols = code = None
+    if map_path is not None:
+        with open(map_path) as f:
+            text = f.read()
+        symbols = read_map(text)
+        code = read_code(text, base + len(data))
+    return load(cpu, data, base, symbols, path, code)
+
+
+def constant(cpu, d, value):
+    """
+    An instruction that puts a value into Rd, decoded like `LDR Rd, =value`
+    """
+    regs = cpu.register.data
+
+    def LDR_func():
+        regs[d] = value
+
+    return cpu.decoded(LDR_func, 'ri', d, value)
+
+
+def fault(cpu, error, *args):
+    """
+    An instruction that raises error when it is run
+    """
+    def UDF_func():
+        raise error(*args)
+
+    return cpu.decoded(UDF_func, '')
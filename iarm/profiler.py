@@ -0,0 +1,101 @@
+"""
+Count how many times, and for how long, each instruction of a program runs
+
+Profiling is turned on by giving an interpreter a Profiler
+
+    interp.profiler = iarm.profiler.Profiler(interp)
+    interp.run()
+    print(interp.profiler.format_report())
+
+`run` picks the profiling loop when it starts, so the normal loop
+has no checks for the profiler in it.
+"""
+
+import collections
+import time
+
+LineStats = collections.namedtuple('LineStats', 'index op text count seconds')
+OpStats = collections.namedtuple('OpStats', 'op count seconds')
+
+
+class Profiler(object):
+    """
+    Execution counts and cumulative time for each instruction in a program
+    """
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, cpu):
+        """
+        :param cpu: The interpreter being profiled
+        """
+        self.cpu = cpu
+        self.counts = []  # Indexed by program index
+        self.times = []
+
+    def clear(self):
+        """
+        Forget everything that has been counted
+        :return:
+        """
+        self.counts = []
+        self.times = []
+
+    def grow(self, size):
+        """
+        Make room for counting a program of size instructions
+        :param size: The length of the program
+        :return:
+        """
+        missing = size - len(self.counts)
+        if missing > 0:
+            self.counts.extend([0] * missing)
+            self.times.extend([0.0] * missing)
+
+    def lines(self):
+        """
+        Get the stats for every instruction that has run
+        :return: A list of LineStats, hottest (most time) first
+        """
+        program = self.cpu.program
+        stats = []
+        for index, count in enumerate(self.counts):
+            if count and index < len(program):
+                stats.append(LineStats(index, program[index].op, self.cpu.source_text(index),
+                                       count, self.times[index]))
+        stats.sort(key=lambda line: line.seconds, reverse=True)
+        return stats
+
+    def ops(self):
+        """
+        Get the stats for each instruction type, like ADDS or LDR
+        :return: A list of OpStats, hottest (most time) first
+        """
+        counts = collections.Counter()
+        times = collections.Counter()
+        for line in self.lines():
+            counts[line.op] += line.count
+            times[line.op] += line.seconds
+        stats = [OpStats(op, counts[op], times[op]) for op in counts]
+        stats.sort(key=lambda op: op.seconds, reverse=True)
+        return stats
+
+    def format_report(self, limit=10):
+        """
+        Get a printable report of the hottest lines and instruction types
+        :param limit: How many lines to list
+        :return: The report
+        """
+        lines = self.lines()
+        if not lines:
+            return "Nothing has been profiled"
+        total = sum(line.seconds for line in lines) or 1
+        report = ["{:>6} {:>10} {:>10} {:>6}  {}".format('Index', 'Count', 'Time (us)', '%', 'Source')]
+        for line in lines[:limit]:
+            report.append("{:>6} {:>10} {:>10.1f} {:>6.1%}  {}".format(
+                line.index, line.count, line.seconds * 1e6, line.seconds / total, line.text))
+        report.append('')
+        report.append("{:>6} {:>10} {:>10} {:>6}".format('Op', 'Count', 'Time (us)', '%'))
+        for op in self.ops():
+            report.append("{:>6} {:>10} {:>10.1f} {:>6.1%}".format(
+                op.op, op.count, op.seconds * 1e6, op.seconds / total))
+        return '\n'.join(report)
@@ -0,0 +1,376 @@
+"""
+Record the last steps of a program into a fixed size ring buffer
+
+Tracing is turned on by giving an interpreter a Tracer
+
+    interp.tracer = iarm.tracer.Tracer(interp, size=1000000)
+    interp.run()
+    interp.tracer.save('run.trace')
+    state = iarm.tracer.TraceReader.load('run.trace', interp).state(1234)
+
+Each step is recorded as just the program index of the instruction,
+written into a preallocated buffer, and the values read from memory by loads (LDR*, POP, and LDM)
+are kept in the order they were read.
+The registers and flags are saved at the start of each segment of the buffer,
+and the state after any step still in the buffer is rebuilt by running the instructions
+from the start of its segment again, with their loads given the values they read the first time.
+So rebuilding needs the interpreter that ran the program (or one with the same program),
+and the program must not have changed, other than by adding to it, since it was traced.
+The op of each record is filled in from the program when the records are read.
+
+Registers changed between runs (not by the program) are saved by starting a new segment.
+Memory writes are not traced.
+"""
+
+import array
+import collections
+import json
+import struct
+
+Record = collections.namedtuple('Record', 'step index op')
+
+FLAG_BITS = (('n', 3), ('z', 2), ('c', 1), ('v', 0))
+
+READS = ('read_word', 'read_halfword', 'read_byte')
+WRITES = ('write_word', 'write_halfword', 'write_byte')
+
+
+def pack_flags(register):
+    return (register.n << 3) | (register.z << 2) | (register.c << 1) | register.v
+
+
+def unpack_flags(register, flags):
+    """
+    Set the flags of a register file from `pack_flags`
+    :param register: The register file
+    :param flags: The packed flags
+    :return:
+    """
+    for flag, bit in FLAG_BITS:
+        setattr(register, flag, bool(flags & (1 << bit)))
+
+
+def shadow(memory, methods):
+    """
+    Shadow methods of memory, putting back whatever was there before when done
+    :param memory: The memory
+    :param methods: A dict of method name to the function to use instead
+    :return: A function to remove the shadowing methods
+    """
+    shadowed = vars(memory)
+    previous = {name: shadowed.get(name) for name in methods}
+    for name, method in methods.items():
+        setattr(memory, name, method)
+
+    def remove():
+        for name in methods:
+            if previous[name] is None:
+                delattr(memory, name)
+            else:
+                setattr(memory, name, previous[name])
+    return remove
+
+
+class Tracer(object):
+    """
+    A ring buffer of the steps an interpreter has run
+
+    The buffer is split into segments, and the full register state is saved
+    each time a segment is started, along with how many loads had been read.
+    A segment is also started when a run starts with registers that were changed since the last one.
+    Once the buffer wraps around, the records after the segment being written
+    are the oldest, from the first segment start after it.
+    So between `size - size / SEGMENTS` and `size` records are kept.
+    """
+    SEGMENTS = 16
+    MAGIC = b'IARMTRC2'
+
+    def __init__(self, cpu, size=65536):
+        """
+        :param cpu: The interpreter being traced
+        :param size: How many records to keep
+        """
+        self.cpu = cpu
+        self.size = size
+        self.segment_size = max(-(-size // self.SEGMENTS), 1)
+        self.op_names = sorted(cpu.ops)
+        self._op_ids = {name: i for i, name in enumerate(self.op_names)}
+        self.indices = [0] * size  # A list, as storing into it is quicker than into an array
+        self.clear()
+
+    def clear(self):
+        """
+        Forget all records
+        :return:
+        """
+        self.position = 0  # Where the next record goes
+        self.boundary = 0  # Where the next segment starts
+        self.wrapped = False  # Has the buffer been written all the way around
+        self.steps = 0  # How many steps have ever been traced
+        self.loads = []  # The values read by loads, oldest first
+        self.dropped = 0  # How many loads have been forgotten from the start of loads
+        self.checkpoints = {}  # Segment start to the registers, flags, steps, and loads before it
+        self.final = None  # The registers and flags when the last run stopped, None if it raised
+
+    def start(self):
+        """
+        Get ready to trace a run, starting a segment if the registers aren't how the last run left them
+        :return:
+        """
+        register = self.cpu.register
+        if self.final != (register.data, pack_flags(register)):
+            self.checkpoint()
+
+    def stop(self, raised):
+        """
+        Save how a run left the registers, to see if they are changed before the next
+        :param raised: Did the run stop with an exception, which may have left a step part done
+        :return:
+        """
+        register = self.cpu.register
+        self.final = None if raised else (list(register.data), pack_flags(register))
+
+    def checkpoint(self):
+        """
+        Start a segment at the current position, saving the state before it
+        :return:
+        """
+        position = self.position
+        register = self.cpu.register
+        self.boundary = min(position + self.segment_size, self.size)
+        for start in [start for start in self.checkpoints if position < start < self.boundary]:
+            del self.checkpoints[start]  # These segments will be written over
+        self.checkpoints[position] = (list(register.data), pack_flags(register), self.steps,
+                                      self.dropped + len(self.loads))
+        loads = self.checkpoints[self.first()][3] - self.dropped
+        if loads > 0:
+            del self.loads[:loads]  # Only the oldest segment can need them
+            self.dropped += loads
+
+    def advance(self, records):
+        """
+        Count records written from the current position, starting the next segment if they reach it
+        :param records: How many records were written
+        :return:
+        """
+        self.steps += records
+        self.position += records
+        if self.position == self.boundary:
+            if self.position == self.size:
+                self.position = 0
+                self.wrapped = True
+            self.checkpoint()
+
+    def first(self):
+        """
+        Find where the oldest records that can be replayed start
+        :return: The position of the start of the oldest segment
+        """
+        if self.wrapped:
+            older = [start for start in self.checkpoints if start >= self.boundary]
+            if older:
+                return min(older)
+        return min(self.checkpoints)
+
+    def watch_loads(self, memory):
+        """
+        Shadow the read methods of memory with ones that keep the values read
+        :param memory: The memory of the interpreter
+        :return: A function to remove the shadowing methods
+        """
+        append = self.loads.append
+
+        def keep(read):
+            def keep_func(address):
+                value = read(address)
+                append(value)
+                return value
+            return keep_func
+        return shadow(memory, {name: keep(getattr(memory, name)) for name in READS})
+
+    def reader(self):
+        """
+        Get a TraceReader of what is in the buffer now
+        :return: The TraceReader
+        """
+        first = self.first()
+        if first <= self.position:
+            indices = self.indices[first:self.position]
+            ends = [(first, self.position)]
+        else:
+            indices = self.indices[first:] + self.indices[:self.position]
+            ends = [(first, self.size), (0, self.position)]
+
+        # Where each checkpoint is in the records in order, and the loads after it
+        checkpoints = []
+        offset = 0
+        for start, end in ends:
+            for position in sorted(self.checkpoints):
+                if start <= position < end:
+                    registers, flags, steps, loads = self.checkpoints[position]
+                    checkpoints.append((offset + position - start, registers, flags, steps, loads - self.dropped))
+            offset += end - start
+
+        program = self.cpu.program
+        op_ids = self._op_ids
+        ops = array.array('H', (op_ids[program[index].op] for index in indices))
+        return TraceReader(self.op_names, self.cpu.register.keys(), checkpoints, self.cpu.register['PC'],
+                           array.array('I', indices), ops, array.array('I', self.loads), self.cpu)
+
+    def save(self, path):
+        """
+        Write the buffer to a binary file, to be read with `TraceReader.load`
+        :param path: The file path
+        :return:
+        """
+        self.reader().save(path)
+
+
+class TraceReader(object):
+    """
+    The records of a trace in the order they were run, the state at the start of each segment,
+    and the values the loads read
+    """
+    HEADER = struct.Struct('<8sI')
+
+    def __init__(self, op_names, register_names, checkpoints, final_pc, indices, ops, loads, cpu=None):
+        """
+        :param checkpoints: A list of (record, registers, flags, step, load), the state before the record,
+        the number of the step it is, and where its loads start, in order
+        :param cpu: The interpreter to run the instructions again with, to rebuild states
+        """
+        self.op_names = op_names
+        self.register_names = list(register_names)
+        self.checkpoints = checkpoints
+        self.final_pc = final_pc
+        self.indices = indices
+        self.ops = ops
+        self.loads = loads
+        self.cpu = cpu
+
+    def __len__(self):
+        return len(self.indices)
+
+    def records(self):
+        """
+        :return: An iterator of Record, numbering the steps from the start of tracing
+        """
+        step = self.first_step
+        for n in range(len(self.indices)):
+            yield Record(step + n, self.indices[n], self.op_names[self.ops[n]])
+
+    @property
+    def first_step(self):
+        """The number of the oldest step whose state can be rebuilt"""
+        return self.checkpoints[0][3]
+
+    @property
+    def last_step(self):
+        """The number of the newest step"""
+        return self.first_step + len(self.indices) - 1
+
+    def state(self, step):
+        """
+        Rebuild the registers after a step
+        :param step: The step number, counting from the start of tracing
+        :return: A dict of register name to value, with the flags packed into the APSR and as 'N', 'Z', 'C', and 'V'
+        """
+        if not self.first_step <= step <= self.last_step:
+            raise IndexError("Step {} is not in the trace, which has steps {} to {}".format(
+                step, self.first_step, self.last_step))
+        if self.cpu is None:
+            raise ValueError("The trace was loaded without an interpreter to run it again")
+
+        end = step - self.first_step + 1
+        start, registers, flags, _, load = [c for c in self.checkpoints if c[0] < end][-1]
+        registers, flags = self.replay(registers, flags, self.indices[start:end], iter(self.loads[load:]))
+
+        state = dict(zip(self.register_names, registers))
+        state['R15'] = self.indices[end] + 1 if end < len(self.indices) else self.final_pc
+        for flag, bit in FLAG_BITS:
+            state[flag.upper()] = bool(flags & (1 << bit))
+        # The flags are kept out of the APSR slot of the register file, so pack them back in
+        state['APSR'] = (state['APSR'] & 0x0FFFFFFF) | (flags << 28)
+        return state
+
+    def replay(self, registers, flags, indices, loads):
+        """
+        Run instructions again on the interpreter, putting its registers back after
+        :param registers: The registers to start from
+        :param flags: The packed flags to start from
+        :param indices: The program indices of the instructions to run
+        :param loads: An iterator of the values for the loads to read
+        :return: The registers and packed flags after the instructions
+        """
+        cpu = self.cpu
+        register = cpu.register
+        saved = list(register.data)
+        saved_apsr = register.apsr
+
+        def load(address):
+            return next(loads)
+
+        def store(address, value):
+            return
+
+        methods = dict.fromkeys(READS, load)
+        methods.update(dict.fromkeys(WRITES, store))
+        remove = shadow(cpu.memory, methods)
+        try:
+            register.data[:] = registers
+            unpack_flags(register, flags)
+            program = cpu.program
+            breakpoints = cpu.breakpoints
+            for index in indices:
+                instruction = breakpoints.get(index, program[index])
+                # Run all of an instruction, even if some of the flags it sets were left out for speed
+                instruction = getattr(instruction, 'original', instruction)
+                if instruction.op != 'BKPT':  # Stepped over like a NOP
+                    instruction()
+            return list(register.data), pack_flags(register)
+        finally:
+            remove()
+            register.data[:] = saved
+            register.apsr = saved_apsr
+
+    def save(self, path):
+        """
+        Write the trace to a binary file
+        :param path: The file path
+        :return:
+        """
+        header = json.dumps({
+            'op_names': self.op_names,
+            'register_names': self.register_names,
+            'checkpoints': self.checkpoints,
+            'final_pc': self.final_pc,
+            'records': len(self.indices),
+            'loads': len(self.loads),
+        }).encode()
+        with open(path, 'wb') as f:
+            f.write(self.HEADER.pack(Tracer.MAGIC, len(header)))
+            f.write(header)
+            for column in (self.indices, self.ops, self.loads):
+                column.tofile(f)
+
+    @classmethod
+    def load(cls, path, cpu=None):
+        """
+        Read a trace written by `save`
+        :param path: The file path
+        :param cpu: An interpreter with the traced program, needed to rebuild states
+        :return: The TraceReader
+        """
+        with open(path, 'rb') as f:
+            magic, size = cls.HEADER.unpack(f.read(cls.HEADER.size))
+            if magic != Tracer.MAGIC:
+                raise ValueError("{} is not a trace file".format(path))
+            header = json.loads(f.read(size).decode())
+            columns = []
+            for typecode, length in (('I', 'records'), ('H', 'records'), ('I', 'loads')):
+                column = array.array(typecode)
+                column.fromfile(f, header[length])
+                columns.append(column)
+        checkpoints = [tuple(checkpoint) for checkpoint in header['checkpoints']]
+        return cls(header['op_names'], header['register_names'], checkpoints, header['final_pc'],
+                   *columns, cpu=cpu)
@@ -0,0 +1,142 @@
+"""
+Stop a running program when memory or a register it is watching is accessed
+
+Memory is watched by shadowing the read_* and write_* methods of the interpreter's memory
+with ones that check the address, only while a memory watchpoint is set.
+Registers are written straight into the register file by instructions,
+so they are watched by the recording loop (`Arm.run_recorded`),
+which knows the register each step writes.
+`Arm.run` uses that loop while any watchpoint is set, so the normal loop never checks for them.
+"""
+
+import collections
+import types
+
+# A watched register (register is its index, start and end are None)
+# or range of memory (from start up to but not including end, register is None).
+# mode is 'r' to stop on reads, 'w' on writes, or 'rw' on both
+Watchpoint = collections.namedtuple('Watchpoint', 'name start end register mode')
+
+
+class Watcher(object):
+    """
+    The watchpoints of an interpreter, and what they have caught during the current step
+    """
+    MODES = ('r', 'w', 'rw')
+    READS = ('read_word', 'read_halfword', 'read_byte')
+    WRITES = ('write_word', 'write_halfword', 'write_byte')
+    SIZES = {'word': 4, 'halfword': 2, 'byte': 1}
+
+    def __init__(self, cpu):
+        """
+        :param cpu: The interpreter being watched
+        """
+        self.cpu = cpu
+        self.watchpoints = collections.OrderedDict()  # Name to Watchpoint
+        self.registers = frozenset()  # Indices of the registers watched for writes
+        self.hits = []  # What was caught, as messages
+        self.shadowed = []  # Names of the memory methods that are shadowed
+
+    def __len__(self):
+        return len(self.watchpoints)
+
+    def add(self, watchpoint):
+        """
+        Start watching
+        :param watchpoint: The Watchpoint
+        :return:
+        """
+        self.watchpoints[watchpoint.name] = watchpoint
+        self.update()
+
+    def remove(self, name):
+        """
+        Stop watching
+        :param name: The name of the Watchpoint
+        :return:
+        """
+        del self.watchpoints[name]
+        self.update()
+
+    def clear(self):
+        """
+        Remove all watchpoints
+        :return:
+        """
+        self.watchpoints.clear()
+        self.update()
+
+    def update(self):
+        """
+        Shadow the memory methods needed by the watchpoints, and find the watched registers
+        :return:
+        """
+        memory = self.cpu.memory
+        for name in self.shadowed:
+            delattr(memory, name)
+        self.shadowed = []
+        self.registers = frozenset(w.register for w in self.watchpoints.values() if w.register is not None)
+
+        for names, access in ((self.READS, 'r'), (self.WRITES, 'w')):
+            ranges = [w for w in self.watchpoints.values() if w.register is None and access in w.mode]
+            if not ranges:
+                continue
+            for name in names:
+                method = types.MethodType(getattr(type(memory), name), memory)
+                size = self.SIZES[name.split('_')[1]]
+                if access == 'r':
+                    setattr(memory, name, self.watch_read(method, size, ranges))
+                else:
+                    setattr(memory, name, self.watch_write(method, size, ranges))
+                self.shadowed.append(name)
+
+    def watch_read(self, read, size, ranges):
+        hits = self.hits
+
+        def watched_read(address):
+            value = read(address)
+            for w in ranges:
+                if address < w.end and w.start < address + size:
+                    hits.append("{} read at {}: {}".format(w.name, address, value))
+            return value
+        return watched_read
+
+    def watch_write(self, write, size, ranges):
+        hits = self.hits
+
+        def watched_write(address, value):
+            write(address, value)
+            for w in ranges:
+                if address < w.end and w.start < address + size:
+                    hits.append("{} written at {}: {}".format(w.name, address, value & ((1 << size * 8) - 1)))
+        return watched_write
+
+    def written(self, register):
+        """
+        Catch a write to a watched register
+        :param register: The register index
+        :return:
+        """
+        for w in self.watchpoints.values():
+            if w.register == register:
+                self.hits.append("{} written: {}".format(w.name, self.cpu.register.data[register]))
+
+    def compare(self, before):
+        """
+        Catch writes to watched registers by an instruction that can write any register
+        :param before: The registers before the instruction
+        :return:
+        """
+        after = self.cpu.register.data
+        for register in self.registers:
+            if before[register] != after[register]:
+                self.written(register)
+
+    def report(self):
+        """
+        Describe and forget what was caught
+        :return: The message
+        """
+        message = "Watchpoint; " + '; '.join(self.hits)
+        del self.hits[:]
+        return message
@@ -3,6 +3,8 @@ from iarm.arm import Arm
 import re
 import warnings
 import iarm.exceptions
+import iarm.history
+import iarm.profiler
 
 
 class ArmKernel(Kernel):
@@ -30,6 +32,12 @@ class ArmKernel(Kernel):
             'unsigned': self.magic_unsigned_rep,
             'hex': self.magic_hex_rep,
             'help': self.magic_help,
+            'profile': self.magic_profile,
+            'break': self.magic_break,
+            'watch': self.magic_watch,
+            'history': self.magic_history,
+            'back': self.magic_back,
+            'goto': self.magic_goto,
             'generate_random': self.magic_generate_random,
             'postpone_execution': self.magic_postpone_execution
                        }
@@ -58,6 +66,7 @@ class ArmKernel(Kernel):
         Usage:
         Call the magic by itself or with `true` to have registers and memory return a random value
         if they are unset and read from, much like how real hardware would work.
+        Registers always hold a value, so turning this on fills them (except PC) with random values.
         Defaults to False, or to not generate random values
 
         `%generate_random`
@@ -72,13 +81,7 @@ class ArmKernel(Kernel):
         elif line == 'false':
             self.interpreter.generate_random = False
         else:
-            stream_content = {'name': 'stderr', 'text': "unknwon value '{}'".format(line)}
-            self.send_response(self.iopub_socket, 'stream', stream_content)
-            return {'status': 'error',
-                    'execution_count': self.execution_count,
-                    'ename': ValueError.__name__,
-                    'evalue': "unknwon value '{}'".format(line),
-                    'traceback': '???'}
+            return self.magic_error(ValueError("unknwon value '{}'".format(line)))
 
     def magic_postpone_execution(self, line):
         """
@@ -104,13 +107,7 @@ class ArmKernel(Kernel):
         elif line == 'false':
             self.interpreter.postpone_execution = False
         else:
-            stream_content = {'name': 'stderr', 'text': "unknwon value '{}'".format(line)}
-            self.send_response(self.iopub_socket, 'stream', stream_content)
-            return {'status': 'error',
-                    'execution_count': self.execution_count,
-                    'ename': ValueError.__name__,
-                    'evalue': "unknwon value '{}'".format(line),
-                    'traceback': '???'}
+            return self.magic_error(ValueError("unknwon value '{}'".format(line)))
 
     def magic_signed_rep(self, line):
         """
@@ -173,10 +170,12 @@ class ArmKernel(Kernel):
                     val = self.interpreter.register[r1[0] + str(i)]
                     val = self.convert_representation(val)
                     message += "{}: {}\n".format(r1[0] + str(i), val)
-            else:
+            elif reg in self.interpreter.register:
                 val = self.interpreter.register[reg]
                 val = self.convert_representation(val)
                 message += "{}: {}\n".format(reg, val)
+            else:
+                message += "{}: not a register\n".format(reg)
         stream_content = {'name': 'stdout', 'text': message}
         self.send_response(self.iopub_socket, 'stream', stream_content)
 
@@ -203,17 +202,23 @@ class ArmKernel(Kernel):
                 n1 = self.interpreter.convert_to_integer(n1)
                 n2 = self.interpreter.convert_to_integer(n2)
                 for i in range(n1, n2 + 1):
-                    val = self.interpreter.memory[i]
-                    val = self.convert_representation(val)
-                    message += "{}: {}\n".format(str(i), val)
+                    message += "{}: {}\n".format(str(i), self.read_memory(i))
             else:
                 # TODO fix what is the key for memory (currently it's an int, but registers are strings, should it be the same?)
-                val = self.interpreter.memory[self.interpreter.convert_to_integer(address)]
-                val = self.convert_representation(val)
-                message += "{}: {}\n".format(address, val)
+                message += "{}: {}\n".format(address, self.read_memory(self.interpreter.convert_to_integer(address)))
         stream_content = {'name': 'stdout', 'text': message}
         self.send_response(self.iopub_socket, 'stream', stream_content)
 
+    def read_memory(self, address):
+        """
+        Get the byte at address in the current representation, or say that it is out of range
+        """
+        try:
+            val = self.interpreter.memory[address]
+        except iarm.exceptions.IarmError:
+            return "address out of range"
+        return self.convert_representation(val)
+
     def magic_run(self, line):
         """
         Run the current program
@@ -226,9 +231,10 @@ class ArmKernel(Kernel):
         or
         `%run 1`
         """
-        i = float('inf')
+        i = None
         if line.strip():
             i = int(line)
+            self.start_history()  # Stepping, so it may want to step back
 
         try:
             with warnings.catch_warnings(record=True) as w:
@@ -237,6 +243,9 @@ class ArmKernel(Kernel):
                     # TODO should this be stdout or stderr
                     stream_content = {'name': 'stdout', 'text': 'Warning: ' + str(warning_message.message) + '\n'}
                     self.send_response(self.iopub_socket, 'stream', stream_content)
+        except (iarm.exceptions.BreakpointHit, iarm.exceptions.WatchpointHit) as e:
+            stream_content = {'name': 'stdout', 'text': str(e) + '\n'}
+            self.send_response(self.iopub_socket, 'stream', stream_content)
         except iarm.exceptions.EndOfProgram as e:
             f_name = self.interpreter.program[self.interpreter.register['PC'] - 1].__name__
             f_name = f_name[:f_name.find('_')]
@@ -253,6 +262,254 @@ class ArmKernel(Kernel):
                     'evalue': str(e),
                     'traceback': '???'}
 
+    def magic_break(self, line):
+        """
+        Stop running before an instruction
+
+        Usage:
+        Call with a label, or the index of an instruction in the program, to add a breakpoint.
+        `%run` stops before the instruction, and running again carries on from it.
+        Call with `del` and a label or index to remove a breakpoint,
+        `clear` to remove them all, or no arguments to list them.
+
+        `%break loop`
+        or
+        `%break 12`
+        or
+        `%break del loop`
+        or
+        `%break`
+        """
+        params = line.split()
+        try:
+            if not params:
+                message = ''
+                for index in sorted(self.interpreter.breakpoints):
+                    origin, number, text = self.interpreter.source[index]
+                    message += "{}: {}, line {}: '{}'\n".format(index, origin, number, text)
+                stream_content = {'name': 'stdout', 'text': message or "No breakpoints\n"}
+                self.send_response(self.iopub_socket, 'stream', stream_content)
+            elif params == ['clear']:
+                for index in list(self.interpreter.breakpoints):
+                    self.interpreter.remove_breakpoint(index)
+            elif params[0] == 'del' and len(params) == 2:
+                self.interpreter.remove_breakpoint(self.location(params[1]))
+            elif len(params) == 1:
+                self.interpreter.add_breakpoint(self.location(params[0]))
+            else:
+                raise ValueError("unknwon value '{}'".format(line))
+        except (ValueError, iarm.exceptions.IarmError) as e:
+            return self.magic_error(e)
+
+    def location(self, param):
+        """
+        Convert a magic parameter to a label or program index
+        """
+        return self.interpreter.convert_to_integer(param) if param[0].isdigit() else param
+
+    def magic_watch(self, line):
+        """
+        Stop running after an instruction accesses a register or memory
+
+        Usage:
+        Call with a register to stop after it is written,
+        or with a memory address or range of addresses, and optionally `r`, `w`, or `rw`,
+        to stop after memory is read, written (the default), or either.
+        Call with `del` and the register or address to remove a watchpoint,
+        `clear` to remove them all, or no arguments to list them.
+        Running is slower while anything is watched, and nothing can be watched while profiling.
+
+        `%watch R0`
+        or
+        `%watch 100-103 rw`
+        or
+        `%watch del R0`
+        or
+        `%watch`
+        """
+        params = line.split()
+        try:
+            if not params:
+                watchpoints = self.interpreter.watcher.watchpoints.values()
+                message = ''.join("{} ({})\n".format(w.name, w.mode) for w in watchpoints)
+                stream_content = {'name': 'stdout', 'text': message or "No watchpoints\n"}
+                self.send_response(self.iopub_socket, 'stream', stream_content)
+            elif params == ['clear']:
+                self.interpreter.watcher.clear()
+            elif params[0] == 'del' and len(params) == 2:
+                self.interpreter.remove_watchpoint(self.watch_location(params[1]))
+            elif len(params) <= 2:
+                if self.interpreter.profiler is not None:
+                    raise iarm.exceptions.ValidationError(
+                        "Can't watch while profiling, turn profiling off with `%profile off`")
+                self.interpreter.add_watchpoint(self.watch_location(params[0]), *params[1:])
+            else:
+                raise ValueError("unknwon value '{}'".format(line))
+        except (ValueError, iarm.exceptions.IarmError) as e:
+            return self.magic_error(e)
+
+    def watch_location(self, param):
+        """
+        Convert a magic parameter to a register name, address, or range of addresses
+        """
+        if not param[0].isdigit():
+            return param
+        if '-' in param:
+            m1, m2 = param.split('-')
+            return range(self.interpreter.convert_to_integer(m1), self.interpreter.convert_to_integer(m2) + 1)
+        return self.interpreter.convert_to_integer(param)
+
+    def magic_history(self, line):
+        """
+        Record the steps run, so they can be gone back over with `%back` and `%goto`
+
+        Usage:
+        Call with `on` to start recording, and `off` to stop and forget what was recorded.
+        Recording starts by itself the first time `%run` is given a number of steps.
+        Running is slower while recording.
+
+        `%history on`
+        or
+        `%history off`
+        """
+        line = line.strip().lower()
+        if line == 'on':
+            self.start_history()
+        elif line == 'off':
+            self.interpreter.history = None
+        else:
+            return self.magic_error(ValueError("unknwon value '{}'".format(line)))
+
+    def start_history(self):
+        """
+        Start recording the steps run, if not already
+        """
+        if self.interpreter.history is None:
+            self.interpreter.history = iarm.history.History(self.interpreter)
+
+    def magic_back(self, line):
+        """
+        Step the program backwards
+
+        Usage:
+        Call with a number of steps to go back, or with no arguments to go back one step.
+        Only steps run while recording can be gone back over, see `%history`.
+        Steps run while profiling are not recorded either.
+
+        `%back`
+        or
+        `%back 10`
+        """
+        line = line.strip()
+        if line and not line.isdigit():
+            return self.magic_error(ValueError("unknwon value '{}'".format(line)))
+        history = self.interpreter.history
+        if history is None:
+            return self.magic_error(ValueError("Recording is off, turn it on with `%history on`"))
+        try:
+            history.back(int(line) if line else 1)
+        except IndexError as e:
+            return self.magic_error(e)
+        self.history_position()
+
+    def magic_goto(self, line):
+        """
+        Go to a step of the program, counting from the first step recorded
+
+        Usage:
+        Call with the step to go to.
+        Earlier steps are gone back to, and later steps are run to.
+        Recording starts now if it is off, see `%history`.
+        `%back` and `%goto` print the current step.
+
+        `%goto 0`
+        or
+        `%goto 1500`
+        """
+        line = line.strip()
+        if not line.isdigit():
+            return self.magic_error(ValueError("unknwon value '{}'".format(line)))
+        self.start_history()
+        history = self.interpreter.history
+        step = int(line)
+        if step > history.step:
+            ret = self.magic_run(str(step - history.step))
+            if ret:
+                return ret
+        else:
+            try:
+                history.goto(step)
+            except IndexError as e:
+                return self.magic_error(e)
+        self.history_position()
+
+    def history_position(self):
+        """
+        Print the current step, and the instruction that runs next
+        """
+        index = self.interpreter.register['PC'] - 1
+        message = "Step {}".format(self.interpreter.history.step)
+        if index < len(self.interpreter.program):
+            origin, line, text = self.interpreter.source[index]
+            message += ", next is {}, line {}: '{}'".format(origin, line, text)
+        else:
+            message += ", at the end of the program"
+        stream_content = {'name': 'stdout', 'text': message + '\n'}
+        self.send_response(self.iopub_socket, 'stream', stream_content)
+
+    def magic_error(self, e):
+        stream_content = {'name': 'stderr', 'text': str(e)}
+        self.send_response(self.iopub_socket, 'stream', stream_content)
+        return {'status': 'error',
+                'execution_count': self.execution_count,
+                'ename': type(e).__name__,
+                'evalue': str(e),
+                'traceback': '???'}
+
+    def magic_profile(self, line):
+        """
+        Profile which instructions are run the most, and take the most time
+
+        Usage:
+        Call with `on` to start profiling every run, and `off` to stop.
+        Call with `clear` to forget what has been profiled so far.
+        Call with no arguments, or a number of lines, to print the hottest lines
+        and the time spent in each instruction.
+        Blocks are not compiled while profiling, and profiling can't be turned on while anything is watched.
+
+        `%profile on`
+        or
+        `%profile`
+        or
+        `%profile 20`
+        or
+        `%profile off`
+        """
+        line = line.strip().lower()
+        message = None
+        if line == 'on':
+            if self.interpreter.watcher:
+                return self.magic_error(iarm.exceptions.ValidationError(
+                    "Can't profile while watching, remove the watchpoints with `%watch clear`"))
+            if self.interpreter.profiler is None:
+                self.interpreter.profiler = iarm.profiler.Profiler(self.interpreter)
+        elif line == 'off':
+            self.interpreter.profiler = None
+        elif line == 'clear':
+            if self.interpreter.profiler is not None:
+                self.interpreter.profiler.clear()
+        elif not line or line.isdigit():
+            if self.interpreter.profiler is None:
+                message = "Profiling is off, turn it on with `%profile on`\n"
+            else:
+                message = self.interpreter.profiler.format_report(int(line) if line else 10) + '\n'
+        else:
+            return self.magic_error(ValueError("unknwon value '{}'".format(line)))
+
+        if message:
+            stream_content = {'name': 'stdout', 'text': message}
+            self.send_response(self.iopub_socket, 'stream', stream_content)
+
     def magic_help(self, line):
         """
         Print out the help for magics
@@ -303,7 +560,7 @@ class ArmKernel(Kernel):
             return
         try:
             with warnings.catch_warnings(record=True) as w:
-                self.interpreter.evaluate(code)
+                self.interpreter.evaluate(code, 'In [{}]'.format(self.execution_count))
                 for warning_message in w:
                     # TODO should this be stdout or stderr
                     stream_content = {'name': 'stdout', 'text': 'Warning: ' + str(warning_message.message) + '\n'}
@@ -4,13 +4,38 @@ import unittest
 
 
 class TestArmUnconditionalBranch(TestArm):
-    @unittest.skip('No Test Defined')
     def test_B(self):
-        pass
+        self.interp.evaluate(" MOVS R0, #1\n"
+                             " B skip\n"
+                             " MOVS R0, #2\n"
+                             "skip MOVS R1, #3")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R0'], 1)
+        self.assertEqual(self.interp.register['R1'], 3)
+        self.assertEqual(self.interp.register['PC'], 5)
+
+    def test_B_infinite_loop(self):
+        self.interp.evaluate(" MOVS R0, #1")
+        self.interp.evaluate(" B .")
+        with self.assertRaises(iarm.exceptions.EndOfProgram):
+            self.interp.run()
+
+        # PC is left pointing after the instruction that raised
+        self.assertEqual(self.interp.register['PC'], 2)
 
-    @unittest.skip('No Test Defined')
     def test_BL(self):
-        pass
+        self.interp.evaluate(" BL function\n"
+                             " MOVS R1, #2\n"
+                             " B .\n"
+                             "function MOVS R0, #1\n"
+                             " BX LR")
+        with self.assertRaises(iarm.exceptions.EndOfProgram):
+            self.interp.run()
+
+        self.assertEqual(self.interp.register['LR'], 1)
+        self.assertEqual(self.interp.register['R0'], 1)
+        self.assertEqual(self.interp.register['R1'], 2)
 
     @unittest.skip('No Test Defined')
     def test_BLX(self):
@@ -70,9 +95,16 @@ class TestArmConditionalBranch(TestArm):
     def test_BMI(self):
         pass
 
-    @unittest.skip('No Test Defined')
     def test_BNE(self):
-        pass
+        self.interp.evaluate(" MOVS R0, #5")
+        self.interp.evaluate(" MOVS R1, #0")
+        self.interp.evaluate("loop ADDS R1, R1, #2")
+        self.interp.evaluate(" SUBS R0, R0, #1")
+        self.interp.evaluate(" BNE loop")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R0'], 0)
+        self.assertEqual(self.interp.register['R1'], 10)
 
     @unittest.skip('No Test Defined')
     def test_BPL(self):
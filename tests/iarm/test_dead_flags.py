@@ -0,0 +1,36 @@
+"""
+Run the instruction tests again with dead flag elimination turned on
+"""
+import unittest
+from test_iarm import TestArm
+import test_arithmetic
+import test_branch
+import test_data_movement
+import test_iarm
+import test_logic
+import test_memory
+import test_parsing
+import test_shift
+
+
+def with_dead_flags(*modules):
+    """
+    Make a copy of each test case in modules that eliminates dead flags
+    :param modules: The test modules
+    :return: A dict of name to test case
+    """
+    cases = {}
+    for module in modules:
+        for name, case in vars(module).items():
+            if isinstance(case, type) and issubclass(case, TestArm) and case.__module__ == module.__name__:
+                cases[name + 'DeadFlags'] = type(name + 'DeadFlags', (case,),
+                                                 {'OPTIONS': {'eliminate_dead_flags': True}})
+    return cases
+
+
+globals().update(with_dead_flags(test_arithmetic, test_branch, test_data_movement, test_iarm, test_logic,
+                                 test_memory, test_parsing, test_shift))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,8 +6,10 @@ import random
 
 class TestArm(unittest.TestCase):
     """The base class for all arm tests"""
+    OPTIONS = {}  # Given to Arm, so the same tests can be run with other options
+
     def setUp(self):
-        self.interp = iarm.arm.Arm(1024, False)
+        self.interp = iarm.arm.Arm(1024, False, **self.OPTIONS)
 
 
 class TestArmChecks(TestArm):
@@ -424,5 +426,149 @@ class TestArmRegisters(TestArm):
             self.interp.set_NZCV_flags(row[0], row[1], row[2], 'sub')
             self.assertEqual(self.interp.register['APSR'], row[3])
 
+        for row in add_test_table:
+            self.interp.set_add_flags(row[0], row[1], row[0] + row[1])
+            self.assertEqual(self.interp.register['APSR'], row[3])
+
+        for row in sub_test_table:
+            self.interp.set_sub_flags(row[0], row[1], row[0] - row[1])
+            self.assertEqual(self.interp.register['APSR'], row[3])
+
+    def test_APSR_flags(self):
+        self.interp.register['APSR'] = (0b1010 << 28) | 0x20
+        self.assertTrue(self.interp.is_N_set())
+        self.assertFalse(self.interp.is_Z_set())
+        self.assertTrue(self.interp.is_C_set())
+        self.assertFalse(self.interp.is_V_set())
+        self.interp.register.z = True
+        self.interp.register.n = False
+        self.assertEqual(self.interp.register['APSR'], (0b0110 << 28) | 0x20)
+        self.assertEqual(self.interp.register.apsr, (0b0110 << 28) | 0x20)
+
+
+class TestArmRun(TestArm):
+    def test_run_steps(self):
+        self.interp.evaluate(" MOVS R0, #1")
+        self.interp.evaluate(" MOVS R1, #2")
+        self.interp.evaluate(" MOVS R2, #3")
+
+        self.assertEqual(self.interp.run(2), 2)
+        self.assertEqual(self.interp.register['R1'], 2)
+        self.assertEqual(self.interp.register['R2'], 0)
+        self.assertEqual(self.interp.register['PC'], 3)
+
+        self.assertEqual(self.interp.run(0), 0)
+        self.assertEqual(self.interp.register['PC'], 3)
+
+        self.assertEqual(self.interp.run(), 1)
+        self.assertEqual(self.interp.register['R2'], 3)
+        self.assertEqual(self.interp.register['PC'], 4)
+
+    def test_run_exception_source(self):
+        self.interp.evaluate(" MOVS R1, #3", origin='program.s')
+        self.interp.evaluate("\n\n LDR R0, [R1, #0] ; Unaligned", origin='program.s')
+        self.assertEqual(self.interp.source[1], ('program.s', 3, 'LDR R0, [R1, #0] ; Unaligned'))
+        with self.assertRaises(iarm.exceptions.HardFault) as context:
+            self.interp.run()
+        self.assertEqual(context.exception.args[0],
+                         "program.s, line 3; Error on 'LDR R0, [R1, #0] ; Unaligned': ")
+
+    def test_run_steps_exception(self):
+        for compile_blocks in (False, True):
+            interp = iarm.arm.Arm(1024, False, compile_blocks=compile_blocks, **self.OPTIONS)
+            interp.evaluate(" MOVS R0, #1\n MOVS R1, #3\n LDR R0, [R1, #0]\n MOVS R2, #1\n MOVS R3, #1")
+            with self.assertRaises(iarm.exceptions.HardFault):
+                interp.run()
+            self.assertEqual(interp.steps_run, 3, msg="compile_blocks={}".format(compile_blocks))
+
+    def test_run_PC_written(self):
+        self.interp.evaluate(" MOVS R0, #1")
+        self.interp.evaluate(" ADD R15, R15, R0")
+        self.interp.evaluate(" MOVS R1, #1")
+        self.interp.evaluate(" MOVS R2, #2")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R1'], 0)
+        self.assertEqual(self.interp.register['R2'], 2)
+
+
+class TestArmDecodeCache(TestArm):
+    def test_reevaluate(self):
+        code = " MOVS R0, #1\n ADDS R0, R0, #2\nloop SUBS R0, R0, #1\n BNE loop"
+        self.interp.evaluate(code)
+        self.assertEqual(self.interp.decode_cache.misses, 4)
+        self.interp.evaluate(code)
+        self.assertEqual(self.interp.decode_cache.hits, 4)
+        self.assertEqual(self.interp.decode_cache.misses, 4)
+        self.assertIs(self.interp.program[0], self.interp.program[4])
+
+    def test_equates(self):
+        self.interp.evaluate("VALUE EQU #1\n MOVS R0, VALUE")
+        self.interp.evaluate("VALUE EQU #2\n MOVS R0, VALUE")
+        self.assertEqual(self.interp.decode_cache.hits, 0)
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 2)
+
+    def test_label_values(self):
+        self.interp.evaluate("first MOVS R0, #1")
+        self.interp.evaluate(" ADR R1, first")
+        self.interp.evaluate("first MOVS R0, #1")
+        self.interp.evaluate(" ADR R1, first")
+        self.assertEqual(self.interp.decode_cache.hits, 1)  # Only the MOVS
+
+    def test_warnings_repeated(self):
+        for _ in range(2):
+            with self.assertWarns(iarm.exceptions.LabelDoesNotExist):
+                self.interp.evaluate(" B somewhere")
+        self.assertEqual(self.interp.decode_cache.hits, 1)
+
+
+class TestArmSnapshot(TestArm):
+    def test_restore(self):
+        self.interp.evaluate("""
+VALUE EQU #3
+data DCD 0x1234
+ MOVS R0, VALUE
+ LDR R1, =data
+ STR R0, [R1, #0]
+ SUBS R2, R0, #4
+""")
+        snap = self.interp.snapshot()
+        self.interp.run()
+        self.assertEqual(self.interp.memory.read_word(0), 3)
+        self.assertTrue(self.interp.register.n)
+
+        self.interp.evaluate("VALUE EQU #5\nother SPACE 4\n MOVS R3, #1")
+        self.interp.restore(snap)
+        self.assertEqual(self.interp.register['PC'], 1)
+        self.assertEqual(self.interp.register['R0'], 0)
+        self.assertFalse(self.interp.register.n)
+        self.assertEqual(self.interp.memory.read_word(0), 0x1234)
+        self.assertEqual(len(self.interp.program), 4)
+        self.assertEqual(len(self.interp.source), 4)
+        self.assertEqual(self.interp.source_text(3), 'SUBS R2, R0, #4')
+        self.assertNotIn('other', self.interp.labels)
+        self.assertEqual(self.interp.equates['VALUE'], '#3')
+        self.assertEqual(self.interp.space_pointer, 4)
+
+    def test_restore_many(self):
+        self.interp.evaluate(" ADDS R0, R0, R1\n ADDS R0, R0, R0")
+        snap = self.interp.snapshot()
+        for value in range(5):
+            self.interp.restore(snap)
+            self.interp.register['R1'] = value
+            self.interp.run()
+            self.assertEqual(self.interp.register['R0'], value * 2)
+            self.assertEqual(self.interp.register['PC'], 3)
+
+    def test_restore_flags(self):
+        self.interp.evaluate(" MOVS R0, #0")
+        self.interp.run()
+        snap = self.interp.snapshot()
+        self.interp.register['APSR'] = 0
+        self.interp.restore(snap)
+        self.assertTrue(self.interp.register.z)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -34,9 +34,17 @@ class TestArmMemory(TestArm):
             # data value is word aligned
             self.interp.evaluate(" ADR R0, [PC, #3]")
 
-    @unittest.skip('No Test Defined')
     def test_LDM(self):
-        pass
+        self.interp.memory.write_word(8, 0x12345678)
+        self.interp.memory.write_word(12, 0x9ABCDEF0)
+        self.interp.register['R0'] = 8
+
+        self.interp.evaluate(" LDM R0!, {R1, R2}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R1'], 0x12345678)
+        self.assertEqual(self.interp.register['R2'], 0x9ABCDEF0)
+        self.assertEqual(self.interp.register['R0'], 16)
 
     def test_LDR(self):
         self.interp.memory[8] = 0x12
@@ -235,17 +243,46 @@ class TestArmMemory(TestArm):
             # Can use SP
             self.interp.evaluate(" LDRSB R0, [SP, R1]")
 
-    @unittest.skip('No Test Defined')
     def test_POP(self):
-        pass
+        self.interp.register['R0'] = 5
+        self.interp.register['R1'] = 6
+
+        self.interp.evaluate(" PUSH {R0, R1}")
+        self.interp.evaluate(" POP {R2, R3}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R2'], 5)
+        self.assertEqual(self.interp.register['R3'], 6)
+        self.assertEqual(self.interp.register['SP'], len(self.interp.memory))
 
-    @unittest.skip('No Test Defined')
     def test_PUSH(self):
-        pass
+        self.interp.register['R0'] = 0x12345678
+        self.interp.register['SP'] = 16
+
+        self.interp.evaluate(" PUSH {R0}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['SP'], 12)
+        self.assertEqual(self.interp.memory[12], 0x78)
+        self.assertEqual(self.interp.memory[15], 0x12)
+
+        with self.assertRaises(iarm.exceptions.HardFault):
+            # Stack overflows below the bottom of memory
+            self.interp.register['SP'] = 0
+            self.interp.evaluate(" PUSH {R0}")
+            self.interp.run()
 
-    @unittest.skip('No Test Defined')
     def test_STM(self):
-        pass
+        self.interp.register['R0'] = 8
+        self.interp.register['R1'] = 0x12345678
+        self.interp.register['R2'] = 0x9ABCDEF0
+
+        self.interp.evaluate(" STM R0!, {R1, R2}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.memory.read_word(8), 0x12345678)
+        self.assertEqual(self.interp.memory.read_word(12), 0x9ABCDEF0)
+        self.assertEqual(self.interp.register['R0'], 16)
 
     def test_STR(self):
         self.interp.register['R0'] = 0x12345678
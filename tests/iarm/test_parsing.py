@@ -41,6 +41,17 @@ class TestArmParsing(TestArm):
             self.interp.evaluate(' MOVS abc, 123')
         self.assertIn('Unknown', str(cm.exception))
 
+    def test_split_parameters(self):
+        # The fast path must give the same groups as the patterns, or leave it to them
+        parameters = ['R0, R1, #3', ' R0,R1,#0x10', 'R0, R1, R2 ; comment', 'R0, R1, ', ', R1, R2',
+                      'R0 , R1, R2', 'R0, R1 R2, R3', 'R0, R1, R2, R3', 'R0\t,R1', 'R0, R1', 'R0,', ',', '']
+        patterns = {2: self.interp.TWO_PARAMETER_COMMA_SEPARATED, 3: self.interp.THREE_PARAMETER_COMMA_SEPARATED}
+        for count, pattern in patterns.items():
+            for parameter in parameters:
+                groups = self.interp.split_parameters(parameter, count)
+                if groups is not None:
+                    self.assertEqual(groups, pattern.match(parameter).groups(), msg=repr(parameter))
+
 
 class TestArmValidation(TestArm):
     """
@@ -0,0 +1,107 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import warnings
+import iarm.__main__
+import iarm.arm
+import iarm.assembler
+import iarm.exceptions
+
+
+class TestAssembler(unittest.TestCase):
+    """Encodings are checked against what the GNU assembler gives"""
+    PROGRAM = """
+table DCD 7
+ DCB 1
+half DCH 0x1234
+ MOVS R0, #5
+loop ADDS R1, R0, R2
+ BNE loop
+ BL sub
+ MRS R0, APSR
+ MULS R0, R1, R0
+ LDR R2, =0x12345678
+ LDR R3, =table
+ PUSH {R4, LR}
+ POP {R4, PC}
+ B .
+sub BX LR
+"""
+
+    def encoding(self, line):
+        image = iarm.assembler.assemble(line)
+        return ' '.join('{:04X}'.format(image.halfword(address)) for address in range(0, len(image), 2))
+
+    def test_encodings(self):
+        for line, expected in [(" MOVS R0, #5", '2005'), (" ADDS R1, R0, R2", '1881'), (" ADDS R1, R1, #200", '31C8'),
+                               (" SUBS R2, R3, #7", '1FDA'), (" LSLS R1, R2, #3", '00D1'), (" ASRS R1, R1, R2", '4111'),
+                               (" CMP R3, #255", '2BFF'), (" CMP R8, R1", '4588'), (" MOV R8, R1", '4688'),
+                               (" ADD R3, R3, R9", '444B'), (" ADD SP, SP, #16", 'B004'), (" SUB SP, SP, #8", 'B082'),
+                               (" ADD R3, PC, #8", 'A302'), (" LDR R0, [R1, #4]", '6848'),
+                               (" STRB R0, [R1, R2]", '5488'), (" LDR R0, [SP, #8]", '9802'),
+                               (" LDM R0!, {R1, R2}", 'C806'), (" STM R0!, {R1, R2}", 'C006'),
+                               (" REV16 R0, R1", 'BA48'), (" UXTB R2, R3", 'B2DA'),
+                               (" MSR APSR, R1", 'F381 8800'), (" BKPT #3", 'BE03'), (" BLX R2", '4790'),
+                               (" B .", 'E7FE')]:
+            self.assertEqual(self.encoding(line), expected, msg=line)
+
+    def test_image(self):
+        image = iarm.assembler.assemble(self.PROGRAM)
+        self.assertEqual(image.data.hex(), '070000000100341205208118fdd100f008f8eff300804843024a034b'
+                                           '10b510bdfee770477856341200000000')
+        self.assertEqual(image.symbols, {'table': 0, 'half': 6, 'loop': 10, 'sub': 34})
+        self.assertEqual(image.addresses, [8, 10, 12, 14, 18, 22, 24, 26, 28, 30, 32, 34])
+        self.assertEqual(image.code, [(8, 36)])
+        self.assertEqual(image.format_map(), "0x00000000 $d\n0x00000000 table\n0x00000006 half\n0x00000008 $t\n"
+                                             "0x0000000A loop\n0x00000022 sub\n0x00000024 $d\n")
+        self.assertIn("0x00000024  78 56 34 12 ... (literal pool)", image.format_listing())
+
+    def test_base(self):
+        image = iarm.assembler.assemble(self.PROGRAM, base=0x1000)
+        self.assertEqual(image.symbols['sub'], 0x1022)
+        self.assertEqual(image.data[-4:], b'\x00\x10\x00\x00')  # The address of table in the literal pool
+
+    def test_out_of_range(self):
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            iarm.assembler.assemble(" BEQ far\n SPACE 300\nfar")
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            iarm.assembler.assemble(" LDR R0, =4\n SPACE 1024")  # The literal pool is too far away
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            iarm.assembler.Assembler(base=2)
+
+    def test_forward_label_load(self):
+        # The interpreter decodes a load of a label that is defined further down
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(" LDR R0, =value\n LDR R1, value\n SPACE 8\nvalue DCD 42")
+        interp.run()
+        self.assertEqual((interp.register['R0'], interp.register['R1']), (8, 8))
+        self.assertEqual(interp.memory.read_word(8), 42)
+
+    def test_label_without_value(self):
+        # A DCD of more than one word only warns, so its label never gets a value
+        for program in (" LDR R0, =table\ntable DCD 10, 20", "table DCD 10, 20\n LDR R0, =table"):
+            interp = iarm.arm.Arm(1024, False)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                with self.assertRaises(iarm.exceptions.IarmError) as cm:
+                    interp.evaluate(program)
+            self.assertIn("' LDR R0, =table'", cm.exception.args[0])
+            self.assertEqual(interp.program, [])
+
+    def test_command_line(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'program.s')
+        with open(path, 'w') as f:
+            f.write(self.PROGRAM)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = iarm.__main__.main(['assemble', path, '--listing'])
+        self.assertEqual(status, 0)
+        self.assertIn("0x0000000A  81 18          loop ADDS R1, R0, R2", out.getvalue())
+        with open(os.path.join(directory.name, 'program.bin'), 'rb') as f:
+            self.assertEqual(f.read(), bytes(iarm.assembler.assemble(self.PROGRAM).data))
+        with open(os.path.join(directory.name, 'program.map')) as f:
+            self.assertIn("0x00000022 sub", f.read())
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+import unittest.mock
+import iarm.batch
+
+
+class TestBatch(unittest.TestCase):
+    FACTORIAL = """
+ MOVS R1, #1
+loop MULS R1, R0, R1
+ SUBS R0, R0, #1
+ BNE loop
+ MOVS R2, #100
+ STR R1, [R2, #0]
+"""
+
+    def run_jobs(self, *jobs, workers=0):
+        return list(iarm.batch.run_jobs(jobs, workers))
+
+    def test_inputs(self):
+        results = self.run_jobs(iarm.batch.Job('3', self.FACTORIAL, {'R0': 3}),
+                                iarm.batch.Job('5', self.FACTORIAL, {'R0': 5}))
+        self.assertEqual([result.name for result in results], ['3', '5'])
+        self.assertEqual(results[0].registers['R1'], 6)
+        self.assertEqual(results[0].memory, {100: 6})
+        self.assertEqual(results[0].steps, 12)
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].registers['R1'], 120)
+
+    def test_memory_inputs(self):
+        result, = self.run_jobs(iarm.batch.Job('load', " MOVS R1, #4\n LDR R0, [R1, #0]\n STR R0, [R1, #4]",
+                                               memory={4: 0x01020304}))
+        self.assertEqual(result.registers['R0'], 0x01020304)
+        self.assertEqual(result.memory, {8: 4, 9: 3, 10: 2, 11: 1})
+
+    def test_jobs_are_independent(self):
+        first, second = self.run_jobs(iarm.batch.Job('first', "data DCD 7\n MOVS R0, #1"),
+                                      iarm.batch.Job('second', " MOVS R1, #1"))
+        self.assertEqual(second.registers['R0'], 0)
+        self.assertEqual(second.registers['R15'], 2)  # Only one instruction in its program
+
+    def test_errors(self):
+        parsing, fault = self.run_jobs(iarm.batch.Job('parsing', " NOTANOP R0"),
+                                       iarm.batch.Job('fault', " MOVS R1, #3\n LDR R0, [R1, #0]\n MOVS R2, #1"))
+        self.assertTrue(parsing.error.startswith('ValidationError'))
+        self.assertTrue(fault.error.startswith('HardFault'))
+        self.assertEqual(fault.steps, 2)
+        self.assertEqual(fault.registers['R2'], 0)
+
+    def test_limits(self):
+        loop = "top ADDS R0, R0, #1\n B top"
+        steps, timeout = self.run_jobs(iarm.batch.Job('steps', loop, steps=10),
+                                       iarm.batch.Job('timeout', loop, timeout=0.05))
+        self.assertIsNone(steps.error)
+        self.assertEqual(steps.steps, 10)
+        self.assertEqual(steps.registers['R0'], 5)
+        self.assertTrue(timeout.error.startswith('Timeout'))
+        self.assertGreater(timeout.steps, 0)
+
+    def test_breakpoint_between_chunks(self):
+        with unittest.mock.patch.object(iarm.batch, 'CHUNK_STEPS', 2):
+            result, = self.run_jobs(iarm.batch.Job('bkpt', " MOVS R0, #1\n MOVS R1, #1\n BKPT #0\n MOVS R2, #1",
+                                                   timeout=5))
+        self.assertTrue(result.error.startswith('BreakpointHit'))
+        self.assertEqual(result.registers['R2'], 0)
+
+    def test_process_pool(self):
+        jobs = [iarm.batch.Job(str(i), self.FACTORIAL, {'R0': i}, steps=1000) for i in range(1, 6)]
+        results = self.run_jobs(*jobs, workers=2)
+        self.assertEqual([result.registers['R1'] for result in results], [1, 2, 6, 24, 120])
+
+    def test_memory_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'memory.bin')
+            with open(path, 'wb') as f:
+                f.write(bytes(range(64)))
+            program = " MOVS R1, #4\n LDR R0, [R1, #0]\n ADDS R0, R0, #1\n STR R0, [R1, #0]"
+            first, second = iarm.batch.run_jobs([iarm.batch.Job('first', program), iarm.batch.Job('second', program)],
+                                                0, memory_file=path)
+        self.assertEqual(first.memory, {4: 5})
+        self.assertEqual(second.memory, {4: 5})  # Each job starts with the file as it is
+        self.assertEqual(second.registers['R13'], 64)
+
+    def test_load_jobs(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'program.s')
+            with open(path, 'w') as f:
+                f.write(self.FACTORIAL)
+            single, = iarm.batch.load_jobs([path], steps=5)
+            self.assertEqual(single.name, path)
+            self.assertEqual(single.steps, 5)
+
+            vectors = {path: [{'registers': {'R0': 1}}, {'memory': {'0': 1}}]}
+            first, second = iarm.batch.load_jobs([path], vectors)
+            self.assertEqual(first.name, path + '[0]')
+            self.assertEqual(first.registers, {'R0': 1})
+            self.assertEqual(second.memory, {'0': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
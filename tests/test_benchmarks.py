@@ -0,0 +1,43 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import benchmarks.run
+import benchmarks.workloads
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_workloads(self):
+        """Every workload must still run and give correct results"""
+        for workload in benchmarks.workloads.WORKLOADS + [benchmarks.workloads.REFERENCE]:
+            trial = workload.setup(0.01)
+            if trial is None:
+                continue  # Missing an optional dependency
+            count, seconds = trial()
+            self.assertGreater(count, 0, msg=workload.name)
+            self.assertGreater(seconds, 0, msg=workload.name)
+
+    def test_compare(self):
+        baseline = {'fast': 100, 'slow': 100}
+        results = {'fast': 90, 'slow': 70, 'new': 1}
+        self.assertEqual(benchmarks.run.compare(results, baseline, 0.2), ['slow'])
+
+    def test_baseline(self):
+        """Without a baseline nothing regresses, and --save makes one of speeds relative to the reference"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            arguments = ['--scale', '0.01', '--repeat', '1', '--baseline', path, 'sum_loop']
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(benchmarks.run.main(arguments), 0)
+                self.assertFalse(os.path.exists(path))
+                self.assertEqual(benchmarks.run.main(arguments + ['--save']), 0)
+            with open(path) as f:
+                baseline = json.load(f)
+        self.assertEqual(list(baseline), ['sum_loop'])
+        self.assertLess(baseline['sum_loop'], 100)  # Not an absolute rate
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import iarm.arm
+import iarm.exceptions
+import iarm.history
+import iarm.tracer
+
+
+class TestBreakpoints(unittest.TestCase):
+    PROGRAM = """
+ MOVS R0, #0
+ MOVS R1, #5
+loop ADDS R0, R0, R1
+ STR R0, [R1, #4]
+ SUBS R1, R1, #1
+ BNE loop
+ MOVS R2, #1
+"""
+
+    def setUp(self):
+        self.interp = iarm.arm.Arm(1024, False)
+        self.interp.evaluate(self.PROGRAM)
+
+    def run_to_end(self, interp, exception):
+        """Run until the program ends, returning the messages of each stop"""
+        stops = []
+        while True:
+            try:
+                interp.run()
+            except exception as e:
+                stops.append(e.args[0])
+            else:
+                return stops
+
+    def test_breakpoint(self):
+        self.assertEqual(self.interp.add_breakpoint('loop'), 2)
+        with self.assertRaises(iarm.exceptions.BreakpointHit) as cm:
+            self.interp.run()
+        self.assertEqual(cm.exception.args[0], "Breakpoint at <evaluate 1>, line 4: 'loop ADDS R0, R0, R1'")
+        self.assertEqual(self.interp.steps_run, 2)
+        self.assertEqual(self.interp.register['PC'], 3)
+
+        self.assertEqual(len(self.run_to_end(self.interp, iarm.exceptions.BreakpointHit)), 4)
+        self.assertEqual(self.interp.register['R0'], 15)
+
+    def test_first_instruction(self):
+        self.interp.add_breakpoint(0)
+        with self.assertRaises(iarm.exceptions.BreakpointHit):
+            self.interp.run()
+        self.assertEqual(self.interp.steps_run, 0)
+        self.assertEqual(len(self.run_to_end(self.interp, iarm.exceptions.BreakpointHit)), 0)
+        self.assertEqual(self.interp.register['R0'], 15)
+
+    def test_after_steps(self):
+        # Running out of steps just before a breakpoint still stops at it
+        self.interp.add_breakpoint('loop')
+        self.assertEqual(self.interp.run(2), 2)
+        with self.assertRaises(iarm.exceptions.BreakpointHit):
+            self.interp.run()
+        self.assertEqual(self.interp.steps_run, 0)
+        self.interp.run(1)  # Carries on from the breakpoint that was hit
+        self.assertEqual(self.interp.register['R0'], 5)
+
+    def test_compiled(self):
+        interp = iarm.arm.Arm(1024, False, compile_blocks=True)
+        interp.evaluate(self.PROGRAM)
+        interp.run(3)  # Compile the loop before the breakpoint is added
+        interp.add_breakpoint(5)
+        self.assertEqual(len(self.run_to_end(interp, iarm.exceptions.BreakpointHit)), 5)
+        self.assertEqual(interp.register['R0'], 15)
+
+    def test_history(self):
+        self.interp.history = iarm.history.History(self.interp)
+        self.interp.add_breakpoint('loop')
+        self.run_to_end(self.interp, iarm.exceptions.BreakpointHit)
+        self.assertEqual(self.interp.history.step, 23)  # Breakpoints are not steps
+
+    def test_remove(self):
+        self.interp.add_breakpoint('loop')
+        snapshot = self.interp.snapshot()
+        self.assertEqual(snapshot.program[2].op, 'ADDS')
+        self.interp.restore(snapshot)
+        self.assertEqual(self.interp.program[2].op, 'BKPT')
+        self.interp.remove_breakpoint('loop')
+        self.assertEqual(self.interp.program[2].op, 'ADDS')
+        self.assertEqual(self.run_to_end(self.interp, iarm.exceptions.BreakpointHit), [])
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            self.interp.add_breakpoint('nowhere')
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            self.interp.add_breakpoint(7)
+
+    def test_BKPT(self):
+        self.interp.evaluate(" BKPT #1\n MOVS R3, #1")
+        self.assertEqual(len(self.run_to_end(self.interp, iarm.exceptions.BreakpointHit)), 1)
+        self.assertEqual(self.interp.register['R3'], 1)
+
+    def test_watch_while_tracing(self):
+        self.interp.tracer = iarm.tracer.Tracer(self.interp)
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            self.interp.add_watchpoint('R0')
+        self.interp.tracer = None
+        self.interp.add_watchpoint('R0')
+        self.interp.tracer = iarm.tracer.Tracer(self.interp)
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            self.interp.run()  # Not run without checking the watchpoint
+
+    def test_watch_memory(self):
+        self.interp.add_watchpoint(range(8, 12))
+        stops = self.run_to_end(self.interp, iarm.exceptions.WatchpointHit)
+        self.assertEqual(stops[0], "Watchpoint; 8-11 written at 9: 5")
+        self.assertEqual(len(stops), 5)
+
+        self.interp.remove_watchpoint(range(8, 12))
+        self.assertNotIn('write_word', vars(self.interp.memory))
+        self.interp.evaluate(" LDRB R3, [R1, #9]")
+        self.interp.add_watchpoint(9, 'r')
+        self.assertEqual(self.run_to_end(self.interp, iarm.exceptions.WatchpointHit), ["Watchpoint; 9 read at 9: 0"])
+
+    def test_watch_register(self):
+        self.interp.evaluate(" PUSH {R0, R1}\n POP {R2, R3}")
+        self.interp.add_watchpoint('R2')
+        self.interp.add_watchpoint('R3')
+        stops = self.run_to_end(self.interp, iarm.exceptions.WatchpointHit)
+        self.assertEqual(stops, ["Watchpoint; R2 written: 1", "Watchpoint; R2 written: 15"])  # R3 is still 0
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            self.interp.add_watchpoint('R0', 'r')
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            self.interp.add_watchpoint(4, 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
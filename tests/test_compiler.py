@@ -0,0 +1,146 @@
+import unittest
+import iarm.arm
+import iarm.exceptions
+
+
+class TestBlockCompiler(unittest.TestCase):
+    """Compiled blocks must leave the interpreter in the same state as running each instruction"""
+    PROGRAMS = {
+        'factorial': """
+ MOVS R0, #5
+ MOVS R1, #1
+loop MULS R1, R0, R1
+ SUBS R0, R0, #1
+ BNE loop
+""",
+        'flags': """
+ MOVS R0, #0
+ SUBS R0, R0, #1
+ ADDS R1, R0, #1
+ ADCS R2, R2, R2
+ CMP R0, #1
+ MOVS R3, #7
+ SBCS R3, R3, R1
+ CMN R0, R0
+ RSBS R4, R3, #0
+ MVNS R5, R4
+ TST R5, R0
+""",
+        'logic_and_shifts': """
+ MOVS R0, #0xF0
+ MOVS R1, #0x3C
+ ANDS R0, R0, R1
+ MOVS R2, #0x81
+ ORRS R2, R2, R1
+ EORS R2, R2, R0
+ BICS R2, R2, R1
+ LSLS R3, R2, #31
+ ASRS R4, R3, #4
+ LSRS R5, R3, #3
+ ASRS R6, R5, #1
+ MOVS R7, #2
+ LSLS R6, R6, R7
+""",
+        'conditions': """
+ MOVS R0, #0
+ MOVS R1, #10
+count ADDS R0, R0, #1
+ CMP R0, R1
+ BLT count
+ MOVS R2, #1
+ CMP R2, R1
+ BGT skip
+ BLS lower
+skip MOVS R3, #1
+lower MOVS R4, #1
+ CMP R1, R2
+ BHI done
+ MOVS R5, #1
+done MOVS R6, #1
+""",
+        'call': """
+ MOVS R0, #3
+ BL double
+ BL double
+ B finish
+double ADD R0, R0, R0
+ BX LR
+finish MOVS R1, #1
+""",
+        'memory': """
+ MOVS R0, #0
+ MOVS R1, #1
+ MOVS R2, #100
+ MOV R3, R13
+fill SUB SP, SP, #4
+ STR R1, [R2, #0]
+ PUSH {R1}
+ ADDS R0, R0, R1
+ ADDS R1, R1, #1
+ CMP R1, #10
+ BNE fill
+ LDR R4, [R2, #0]
+ POP {R5, R6}
+ MOV R13, R3
+""",
+    }
+
+    def run_program(self, code, compile_blocks, steps=None):
+        interp = iarm.arm.Arm(1024, False, compile_blocks=compile_blocks)
+        interp.evaluate(code)
+        interp.run(steps)
+        return interp
+
+    def assertSameState(self, name, interpreted, compiled):
+        self.assertEqual(interpreted.register.items(), compiled.register.items(), msg=name)
+        self.assertEqual(interpreted.steps_run, compiled.steps_run, msg=name)
+        self.assertEqual(interpreted.memory.data, compiled.memory.data, msg=name)
+
+    def test_programs(self):
+        for name, code in self.PROGRAMS.items():
+            self.assertSameState(name, self.run_program(code, False), self.run_program(code, True))
+
+    def test_steps(self):
+        for name, code in self.PROGRAMS.items():
+            for steps in (0, 1, 3, 7, 20):
+                self.assertSameState('{} {}'.format(name, steps),
+                                     self.run_program(code, False, steps),
+                                     self.run_program(code, True, steps))
+
+    def test_exception(self):
+        code = """
+ MOVS R0, #1
+ MOVS R1, #3
+ MOVS R2, #2
+ LDR R0, [R1, #0]
+ MOVS R3, #1
+"""
+        for compile_blocks in (False, True):
+            interp = iarm.arm.Arm(1024, False, compile_blocks=compile_blocks)
+            interp.evaluate(code)
+            with self.assertRaises(iarm.exceptions.HardFault):
+                interp.run()
+            self.assertEqual(interp.register['PC'], 4)
+            self.assertEqual(interp.register['R2'], 2)
+            self.assertEqual(interp.register['R3'], 0)
+
+    def test_end_of_program(self):
+        interp = iarm.arm.Arm(1024, False, compile_blocks=True)
+        interp.evaluate(" MOVS R0, #1\n B .")
+        with self.assertRaises(iarm.exceptions.EndOfProgram):
+            interp.run()
+        self.assertEqual(interp.register['PC'], 2)
+        self.assertEqual(interp.register['R0'], 1)
+
+    def test_blocks(self):
+        interp = iarm.arm.Arm(1024, False, compile_blocks=True)
+        interp.evaluate(self.PROGRAMS['factorial'])
+        self.assertEqual(interp.compiler.get(0).size, 2)  # Split before the label
+        self.assertEqual(interp.compiler.get(2).size, 3)  # Split after the branch
+
+        interp.evaluate(" MOVS R2, #1")
+        self.assertEqual(interp.compiler.blocks, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
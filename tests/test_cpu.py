@@ -1,9 +1,268 @@
+import os
+import tempfile
 import unittest
+import iarm.arm
 import iarm.cpu
+import iarm.exceptions
 
 
 class TestCpu(unittest.TestCase):
-    pass
+    class Cpu(iarm.cpu.RegisterCpu):
+        def NOP(self, params):
+            return self
+
+        def rule_anything(self, arg):
+            self.checked.append(arg)
+
+        def helper(self):
+            pass
+
+    def test_tables(self):
+        self.assertEqual(set(self.Cpu._OPS), {'NOP'})
+        self.assertEqual(set(self.Cpu._RULES), {'anything'})
+
+    def test_bound_methods(self):
+        cpu = self.Cpu(8, 4)
+        self.assertIn('NOP', cpu.ops)
+        self.assertEqual(list(cpu.ops), ['NOP'])
+        self.assertIs(cpu.ops['NOP'](''), cpu)
+        with self.assertRaises(KeyError):
+            cpu.ops['helper']
+
+    def test_check_arguments(self):
+        cpu = self.Cpu(8, 4)
+        cpu.checked = []
+        cpu.check_arguments(anything=(1, 2))
+        self.assertEqual(cpu.checked, [1, 2])
+        with self.assertRaises(LookupError):
+            cpu.check_arguments(nothing=(1,))
+
+
+class TestRegisterFile(unittest.TestCase):
+    def setUp(self):
+        self.register = iarm.cpu.RegisterFile(8, 4, ('APSR',))
+
+    def test_index(self):
+        self.assertEqual(self.register.index('R0'), 0)
+        self.assertEqual(self.register.index('R3'), 3)
+        self.assertEqual(self.register.index('APSR'), 4)
+        with self.assertRaises(KeyError):
+            self.register.index('R4')
+
+    def test_alias(self):
+        self.register.alias('SP', 'R3')
+        self.assertEqual(self.register.index('SP'), 3)
+
+        self.register['SP'] = 5
+        self.assertEqual(self.register['R3'], 5)
+
+        self.register['R3'] = 6
+        self.assertEqual(self.register['SP'], 6)
+        self.assertEqual(self.register.data[3], 6)
+
+    def test_overflow(self):
+        self.register['R1'] = 255
+        self.assertEqual(self.register['R1'], 255)
+        self.register['R1'] += 1
+        self.assertEqual(self.register['R1'], 0)
+        self.register['R1'] = -1
+        self.assertEqual(self.register['R1'], 255)
+
+    def test_randomize(self):
+        self.register['R0'] = 7
+        for i in range(16):
+            self.register.randomize('R0')
+            self.assertEqual(self.register['R0'], 7)
+            self.assertTrue(all(0 <= value <= 255 for value in self.register.data))
+
+
+class TestByteMemory(unittest.TestCase):
+    def setUp(self):
+        self.memory = iarm.cpu.ByteMemory(16)
+
+    def test_bytes(self):
+        self.memory[3] = 0x1FF
+        self.assertEqual(self.memory[3], 0xFF)
+        self.assertEqual(len(self.memory), 16)
+
+    def test_word(self):
+        self.memory.write_word(4, 0x12345678)
+        self.assertEqual([self.memory[i] for i in range(4, 8)], [0x78, 0x56, 0x34, 0x12])
+        self.assertEqual(self.memory.read_word(4), 0x12345678)
+        self.memory.write_word(4, -1)
+        self.assertEqual(self.memory.read_word(4), 0xFFFFFFFF)
+
+    def test_halfword(self):
+        self.memory.write_halfword(2, 0x12345)
+        self.assertEqual(self.memory.read_halfword(2), 0x2345)
+        self.assertEqual(self.memory.view[2:4].tobytes(), b'\x45\x23')
+
+    def test_out_of_range(self):
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory[16]
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory[16] = 0
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_word(13)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.write_halfword(15, 0)
+
+
+class TestMappedMemory(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'memory.bin')
+        with open(self.path, 'wb') as f:
+            f.write(bytes(range(16)))
+
+    def test_copy(self):
+        memory = iarm.cpu.MappedMemory(self.path)
+        self.addCleanup(memory.close)
+        self.assertEqual(len(memory), 16)
+        self.assertEqual(memory.read_word(4), 0x07060504)
+        memory.write_word(4, 0x12345678)
+        self.assertEqual(memory.read_word(4), 0x12345678)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), bytes(range(16)))  # Writes are private
+        memory.remap()
+        self.assertEqual(memory.read_word(4), 0x07060504)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            memory.read_word(14)
+
+    def test_read_only(self):
+        memory = iarm.cpu.MappedMemory(self.path, 'read')
+        self.addCleanup(memory.close)
+        self.assertEqual(memory[15], 15)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            memory.write_halfword(0, 1)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            memory[0] = 1
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            iarm.cpu.MappedMemory(self.path, 'write')
+
+    def test_interpreter(self):
+        interpreter = iarm.arm.Arm(1024, False, memory_file=self.path)
+        self.addCleanup(interpreter.memory.close)
+        self.assertEqual(interpreter.register['SP'], 16)
+        interpreter.evaluate(" MOVS R1, #8\n LDR R0, [R1, #0]\n PUSH {R0}")
+        interpreter.run()
+        self.assertEqual(interpreter.register['R0'], 0x0B0A0908)
+        self.assertEqual(interpreter.memory.read_word(12), 0x0B0A0908)
+
+
+class TestPagedMemory(unittest.TestCase):
+    REGIONS = [(0x00000000, 0x10000), (0x20000000, 0x8000)]  # Flash and SRAM
+
+    def setUp(self):
+        self.memory = iarm.cpu.PagedMemory(self.REGIONS)
+
+    def test_pages(self):
+        self.memory.write_word(0x20007FFC, 0x12345678)
+        self.memory[4] = 0x1FF
+        self.assertEqual(self.memory.read_word(0x20007FFC), 0x12345678)
+        self.assertEqual(self.memory.read_halfword(0x20007FFE), 0x1234)
+        self.assertEqual(self.memory[4], 0xFF)
+        self.assertEqual(self.memory.read_word(0x8000), 0)
+        self.assertEqual(sorted(self.memory.pages), [0, 8, 0x20007])  # Only the pages accessed
+        self.assertEqual(len(self.memory), 0x20008000)
+
+    def test_across_pages(self):
+        self.memory.write_word(0xFFE, 0x12345678)
+        self.assertEqual(self.memory.read_word(0xFFE), 0x12345678)
+        self.assertEqual(self.memory.read_halfword(0x1000), 0x1234)
+        self.memory.write_bytes(0xFFF, b'\x01\x02')
+        self.assertEqual(self.memory.read_halfword(0xFFF), 0x0201)
+
+    def test_unmapped(self):
+        for address in (0x10000, 0x1FFFFFFC, 0x20008000, -4, 1 << 32):
+            with self.assertRaises(iarm.exceptions.HardFault):
+                self.memory.read_word(address)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.write_word(0xFFFE, 1)  # Runs off the end of the region
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.write_bytes(0xFFFF, b'\x01\x02')
+        self.assertEqual(self.memory[0xFFFF], 0)  # Nothing is written
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            iarm.cpu.PagedMemory([(0x100, 0x1000)])
+
+    def test_save_and_restore(self):
+        self.memory.write_word(8, 1)
+        saved = self.memory.save()
+        self.memory.write_word(8, 2)
+        self.memory.write_word(0x20000000, 3)
+        self.assertEqual(self.memory.changes(saved), {8: 2, 0x20000000: 3})
+        self.memory.restore(saved)
+        self.assertEqual(self.memory.read_word(8), 1)
+        self.assertEqual(list(self.memory.pages), [0])
+
+    def test_interpreter(self):
+        interpreter = iarm.arm.Arm(1024, False, memory_regions=self.REGIONS)
+        self.assertEqual(interpreter.register['SP'], 0x20008000)  # The stack starts at the top of SRAM
+        interpreter.evaluate("value DCD 42\n LDR R1, =value\n LDR R0, [R1, #0]\n PUSH {R0}")
+        interpreter.run()
+        self.assertEqual(interpreter.memory.read_word(0x20007FFC), 42)
+        self.assertEqual(len(interpreter.memory.pages), 2)
+
+
+class TestDecodeCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = iarm.cpu.DecodeCache(2)
+
+    def test_hits_and_misses(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_least_recently_used(self):
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.get('a')
+        self.cache.put('c', 3)
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_clear(self):
+        self.cache.put('a', 1)
+        self.cache.get('a')
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.hits, 0)
+
+
+class TestSourceMap(unittest.TestCase):
+    def setUp(self):
+        self.source = iarm.cpu.SourceMap()
+        self.source.append('a.s', 1, ' MOVS R0, #1')
+        self.source.append('a.s', 3, ' B loop')
+        self.source.append('b.s', 1, ' MOVS R0, #1')
+
+    def test_lookup(self):
+        self.assertEqual(len(self.source), 3)
+        self.assertEqual(self.source[1], ('a.s', 3, ' B loop'))
+        self.assertEqual(self.source.text(2), ' MOVS R0, #1')
+
+    def test_strings_interned(self):
+        self.assertEqual(self.source.strings, ['a.s', ' MOVS R0, #1', ' B loop', 'b.s'])
+        self.assertEqual(list(self.source.texts), [1, 2, 1])
+
+    def test_extend(self):
+        other = iarm.cpu.SourceMap()
+        other.append('c.s', 7, ' B loop')
+        self.source.extend(other)
+        self.assertEqual(self.source[3], ('c.s', 7, ' B loop'))
+        self.assertEqual(len(self.source.strings), 5)
+
+    def test_copy(self):
+        copy = self.source.copy()
+        self.assertEqual(copy, self.source)
+        copy.append('c.s', 1, 'NOP')
+        self.assertNotEqual(copy, self.source)
+        self.assertEqual(len(self.source), 3)
 
 
 class TestRandomValueDict(unittest.TestCase):
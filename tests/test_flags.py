@@ -0,0 +1,165 @@
+import random
+import unittest
+import iarm.arm
+import iarm.arm_instructions
+
+
+class FlagsTest(unittest.TestCase):
+    """Random programs of flag setting instructions"""
+    INSTRUCTIONS = [
+        " ADDS R{0}, R{1}, R{2}", " ADDS R{0}, R{1}, #{3}", " SUBS R{0}, R{1}, R{2}", " SUBS R{0}, R{1}, #{3}",
+        " ADCS R{0}, R{0}, R{2}", " SBCS R{0}, R{0}, R{2}", " CMP R{1}, R{2}", " CMP R{1}, #{4}",
+        " CMN R{1}, R{2}", " RSBS R{0}, R{1}, #0", " ANDS R{0}, R{0}, R{2}", " EORS R{0}, R{0}, R{2}",
+        " MOVS R{0}, #{4}", " MULS R{0}, R{2}, R{0}", " LSLS R{0}, R{1}, #{3}", " LSRS R{0}, R{1}, #{5}",
+        " ASRS R{0}, R{1}, #{5}", " MVNS R{0}, R{1}",
+    ]
+
+    REGISTERS = 7  # R7 is left for loop counters
+
+    def random_lines(self, rng, length):
+        lines = []
+        for _ in range(length):
+            a, b, c = (rng.randrange(self.REGISTERS) for _ in range(3))
+            # Shifting by a register is by less than 40, the scalar shifts are slow for huge amounts
+            lines.append(rng.choice(self.INSTRUCTIONS).format(a, b, c, rng.randrange(8), rng.randrange(256),
+                                                               rng.randrange(1, 32), rng.randrange(8) * 4,
+                                                               rng.randrange(40)))
+        return lines
+
+    def random_program(self, rng, length):
+        return '\n'.join(self.random_lines(rng, length))
+
+    def interpreter(self, program, values, **kwargs):
+        interp = iarm.arm.Arm(1024, False, **kwargs)
+        for i, value in enumerate(values):
+            interp.register['R{}'.format(i)] = value
+        interp.evaluate(program)
+        return interp
+
+
+class TestLazyFlags(FlagsTest):
+    """Lazy flags must give the same flags as working them out for every instruction"""
+    def test_random_programs(self):
+        rng = random.Random(1234)
+        for _ in range(50):
+            program = self.random_program(rng, 30)
+            values = [rng.choice((0, 1, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF, rng.getrandbits(32))) for _ in range(8)]
+            eager = self.interpreter(program, values)
+            lazy = self.interpreter(program, values, lazy_flags=True)
+            self.assertIsInstance(lazy.register, iarm.arm_instructions.LazyApsrRegisterFile)
+            for step in range(30):
+                eager.run(1)
+                lazy.run(1)
+                self.assertEqual(lazy.register.apsr, eager.register.apsr,
+                                 msg="{}\nafter step {}".format(program, step))
+                self.assertEqual(lazy.register.data, eager.register.data)
+
+    def test_set_one_flag(self):
+        lazy = self.interpreter(" MOVS R0, #1\n SUBS R0, R0, #2", [], lazy_flags=True)
+        lazy.run()
+        self.assertEqual((lazy.register.n, lazy.register.z, lazy.register.c, lazy.register.v),
+                         (True, False, False, False))
+        lazy.register.c = True  # The other flags keep their values
+        self.assertEqual((lazy.register.n, lazy.register.z, lazy.register.c, lazy.register.v),
+                         (True, False, True, False))
+        lazy.register.z = True
+        self.assertEqual((lazy.register.n, lazy.register.z), (True, True))
+
+    def test_compiled(self):
+        rng = random.Random(99)
+        program = "loop" + self.random_program(rng, 20) + "\n SUBS R7, R7, #1\n BNE loop"
+        results = []
+        for kwargs in ({}, {'lazy_flags': True}, {'lazy_flags': True, 'compile_blocks': True}):
+            interp = self.interpreter(program, [3, 5, 7, 11, 13, 17, 19, 50], **kwargs)
+            interp.run()
+            results.append((interp.register.apsr, interp.register.data))
+        self.assertEqual(results[1], results[0])
+        self.assertEqual(results[2], results[0])
+
+
+class TestDeadFlags(FlagsTest):
+    """Leaving out dead flags must not change the result of a program"""
+    CONDITIONS = ('BEQ', 'BNE', 'BCS', 'BCC', 'BMI', 'BVS', 'BHI', 'BGE', 'BLT', 'BGT', 'BLE')
+
+    def random_program(self, rng, length):
+        # A loop with a conditional branch forward in it, so flags are read from more than one place
+        part = length // 3
+        return "loop{}\n {} skip\n{}\nskip{}\n SUBS R7, R7, #1\n BNE loop".format(
+            super().random_program(rng, part), rng.choice(self.CONDITIONS),
+            super().random_program(rng, part), super().random_program(rng, part))
+
+    def test_random_programs(self):
+        rng = random.Random(4321)
+        for _ in range(50):
+            program = self.random_program(rng, 30)
+            values = [rng.choice((0, 1, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF, rng.getrandbits(32))) for _ in range(7)]
+            values.append(rng.randrange(1, 20))
+            results = []
+            for kwargs in ({}, {'eliminate_dead_flags': True}, {'eliminate_dead_flags': True, 'lazy_flags': True},
+                           {'eliminate_dead_flags': True, 'compile_blocks': True}):
+                interp = self.interpreter(program, values, **kwargs)
+                interp.run()
+                results.append((interp.register.apsr, interp.register.data))
+            for kwargs, result in zip(('dead', 'dead lazy', 'dead compiled'), results[1:]):
+                self.assertEqual(result, results[0], msg="{}\n{}".format(kwargs, program))
+
+    def test_stepping(self):
+        # A run that stops after a number of steps shows the flags the program would have
+        rng = random.Random(2468)
+        for _ in range(20):
+            program = self.random_program(rng, 30)
+            values = [rng.getrandbits(32) for _ in range(7)] + [rng.randrange(1, 10)]
+            plain = self.interpreter(program, values)
+            dead = self.interpreter(program, values, eliminate_dead_flags=True,
+                                    compile_blocks=rng.choice((False, True)))
+            while True:
+                steps = rng.randrange(1, 8)
+                self.assertEqual(dead.run(steps), plain.run(steps))
+                self.assertEqual((dead.register.apsr, dead.register.data), (plain.register.apsr, plain.register.data),
+                                 msg=program)
+                if plain.steps_run < steps:
+                    break
+
+    def test_variants(self):
+        interp = self.interpreter("""
+ MOVS R0, #10
+ MOVS R1, #0
+loop ADDS R1, R1, R0
+ LSLS R2, R1, #1
+ SUBS R0, R0, #1
+ BNE loop
+ ADCS R2, R2, R2
+ CMP R1, #3""", [], eliminate_dead_flags=True)
+        self.assertEqual([getattr(instruction, 'dead_flags', None) for instruction in interp.program],
+                         ['nz', 'nz', 'nzcv', 'nzc', None, None, 'nzcv', None])
+        self.assertEqual([instruction.op for instruction in interp.program],
+                         ['MOVS', 'MOVS', 'ADDS', 'LSLS', 'SUBS', 'BNE', 'ADCS', 'CMP'])
+        interp.run()
+        self.assertEqual((interp.register['R1'], interp.register['R2']), (55, 221))
+
+    def test_new_code(self):
+        interp = self.interpreter(" CMP R0, #1", [], eliminate_dead_flags=True)
+        self.assertFalse(hasattr(interp.program[0], 'dead_flags'))  # The end of the program can read it
+        interp.evaluate(" CMP R0, #2")
+        self.assertEqual(interp.program[0].dead_flags, 'nzcv')
+        interp.evaluate(" BEQ done\ndone MOVS R0, #0")
+        self.assertEqual(interp.program[0].dead_flags, 'nzcv')
+        self.assertFalse(hasattr(interp.program[1], 'dead_flags'))  # Now read by the branch
+
+    def test_breakpoints(self):
+        interp = self.interpreter(" CMP R0, #1\n MOVS R1, #2\n CMP R0, #2", [], eliminate_dead_flags=True)
+        variant = interp.program[0]
+        self.assertEqual(variant.dead_flags, 'nzcv')
+        interp.add_breakpoint(1)  # The flags can be looked at when it stops
+        self.assertIs(interp.program[0], variant.original)
+        interp.remove_breakpoint(1)
+        self.assertIs(interp.program[0], variant)  # The same variant is used again
+
+        interp.eliminate_dead_flags = False
+        interp.find_dead_flags()
+        self.assertIs(interp.program[0], variant.original)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import iarm.arm
+import iarm.exceptions
+import iarm.history
+
+
+class TestHistory(unittest.TestCase):
+    PROGRAM = """
+ MOVS R0, #0
+ MOVS R1, #40
+ MOVS R4, #0
+loop ADDS R0, R0, R1
+ STR R0, [R4, #0]
+ STRB R1, [R4, #5]
+ STRH R1, [R4, #6]
+ PUSH {R0, R1}
+ POP {R2, R3}
+ ADDS R4, R4, #4
+ SUBS R1, R1, #1
+ BNE loop
+"""
+
+    def setUp(self):
+        self.interp = iarm.arm.Arm(1024, False)
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.history = iarm.history.History(self.interp, interval=50)
+
+    def state(self, interp):
+        return list(interp.register.data), interp.register.apsr, bytes(interp.memory.data)
+
+    def expected_states(self):
+        """The state after each step, from stepping a second interpreter"""
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(self.PROGRAM)
+        states = [self.state(interp)]
+        while interp.run(1):
+            states.append(self.state(interp))
+        return states
+
+    def test_back(self):
+        expected = self.expected_states()
+        self.interp.run()
+        history = self.interp.history
+        self.assertEqual(history.step, len(expected) - 1)
+        for step in range(len(expected) - 1, -1, -1):
+            self.assertEqual(history.step, step)
+            self.assertEqual(self.state(self.interp), expected[step], msg='step {}'.format(step))
+            if step:
+                history.back()
+        with self.assertRaises(IndexError):
+            history.back()
+
+    def test_goto(self):
+        expected = self.expected_states()
+        self.interp.run(200)
+        history = self.interp.history
+        for step in (120, 7, 51, 50, 0, 300, 299, len(expected) - 1, 1):
+            self.assertEqual(history.goto(step), step)
+            self.assertEqual(self.state(self.interp), expected[step], msg='step {}'.format(step))
+        self.assertEqual(history.goto(len(expected) + 10), len(expected) - 1)
+
+    def test_limit(self):
+        self.interp.history = history = iarm.history.History(self.interp, interval=10, limit=100)
+        self.interp.run()
+        self.assertLessEqual(len(history), 110)
+        self.assertEqual(len(history.pcs), len(history))
+        self.assertGreater(history.first, 0)
+        self.assertTrue(all(step >= history.first for step in history.stores))
+        expected = self.expected_states()
+        history.goto(history.first)
+        self.assertEqual(self.state(self.interp), expected[history.first])
+        with self.assertRaises(IndexError):
+            history.back()
+
+    def test_exception(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(" MOVS R0, #7\n MOVS R1, #0\n LDR R2, =1024\n PUSH {R0}\n STR R0, [R1, #0]\n STR R0, [R2, #0]")
+        interp.history = iarm.history.History(interp)
+        before = self.state(interp)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            interp.run()
+        self.assertEqual(interp.history.step, 6)
+        self.assertFalse(hasattr(interp.memory, '__dict__') and 'write_word' in interp.memory.__dict__)
+        interp.history.goto(0)
+        self.assertEqual(self.state(interp), before)
+
+    def test_cleared(self):
+        self.interp.run(20)
+        self.interp.restore(self.interp.snapshot())
+        self.assertEqual(self.interp.history.step, 0)
+        with self.assertRaises(IndexError):
+            self.interp.history.back()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import random
+import unittest
+import iarm.arm
+import iarm.exceptions
+import iarm.lanes
+import test_flags
+
+
+@unittest.skipIf(iarm.lanes.numpy is None, "numpy is not installed")
+class TestLanes(test_flags.FlagsTest):
+    """Every lane must end up where running the program on its own inputs does"""
+    INSTRUCTIONS = test_flags.FlagsTest.INSTRUCTIONS + [
+        " ORRS R{0}, R{0}, R{2}", " BICS R{0}, R{0}, R{2}", " TST R{1}, R{2}", " MOVS R{0}, R{1}", " MOV R{0}, R{1}",
+        " MOVS R{2}, #{7}\n LSLS R{0}, R{0}, R{2}", " MOVS R{2}, #{7}\n LSRS R{0}, R{0}, R{2}",
+        " MOVS R{2}, #{7}\n ASRS R{0}, R{0}, R{2}",
+        " ADD R{0}, R{0}, R{2}", " REV R{0}, R{1}", " REV16 R{0}, R{1}", " REVSH R{0}, R{1}",
+        " SXTB R{0}, R{1}", " SXTH R{0}, R{1}", " UXTB R{0}, R{1}", " UXTH R{0}, R{1}",
+        " LDR R{0}, [R6, #{6}]", " LDRB R{0}, [R6, #{3}]", " LDRH R{0}, [R6, #{6}]", " LDR R{0}, [R6, R{2}]",
+        " LDRSB R{0}, [R6, R{2}]", " LDRSH R{0}, [R6, R{2}]", " STR R{0}, [R6, #{6}]", " STRB R{0}, [R6, R{2}]",
+        " STRH R{0}, [R6, #{6}]", " PUSH {{R{0}, R{1}}}", " POP {{R{0}, R{1}}}",
+    ]
+    REGISTERS = 6  # R6 is a base address and R7 a loop counter
+    CONDITIONS = ('BEQ', 'BNE', 'BCS', 'BCC', 'BMI', 'BPL', 'BVS', 'BVC', 'BHI', 'BLS', 'BGE', 'BLT', 'BGT', 'BLE')
+
+    def random_loop(self, rng):
+        # A loop with a branch forward in it and a call, so lanes branch apart and join up again
+        return '\n'.join(
+            ["loop"] + self.random_lines(rng, 5) + [" {} skip".format(rng.choice(self.CONDITIONS))] +
+            self.random_lines(rng, 5) + ["skip", " BL sub"] + self.random_lines(rng, 3) +
+            [" SUBS R7, R7, #1", " BNE loop", " B done", "sub"] + self.random_lines(rng, 4) + [" BX LR", "done"])
+
+    def random_inputs(self, rng):
+        values = [rng.choice((0, 1, 2, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF, rng.getrandbits(32))) for _ in range(6)]
+        base = rng.choice((0, 256, 512, 1000, 1023, rng.randrange(1024)))  # Some lanes fault
+        return values + [base, rng.randrange(1, 4)], bytes(rng.getrandbits(8) for _ in range(1024))
+
+    def scalar(self, program, inputs, memory=None, steps=None):
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(program)
+        if memory is not None:
+            interp.memory.data[:] = memory
+        for i, value in enumerate(inputs):
+            interp.register['R{}'.format(i)] = value
+        try:
+            interp.run(steps)
+            error = None
+        except iarm.exceptions.IarmError as e:
+            error = (type(e), e.args)
+        return dict(interp.register.items()), bytes(interp.memory.data), interp.steps_run, error
+
+    def lanes(self, program, inputs, memory=None, steps=None):
+        lanes = iarm.lanes.Lanes(program, len(inputs))
+        for i in range(len(inputs[0])):
+            lanes.set_register('R{}'.format(i), [values[i] for values in inputs])
+        for lane, data in enumerate(memory or ()):
+            lanes.memory[lane] = list(data)
+        lanes.run(steps)
+        return lanes
+
+    def assertSameAsScalar(self, program, inputs, memory=None, steps=None):
+        lanes = self.lanes(program, inputs, memory, steps)
+        for lane, values in enumerate(inputs):
+            registers, data, steps_run, error = self.scalar(program, values, memory and memory[lane], steps)
+            message = "{}\nlane {}: {}".format(program, lane, values)
+            self.assertEqual(lanes.state(lane), registers, msg=message)
+            self.assertEqual(bytes(lanes.memory[lane]), data, msg=message)
+            self.assertEqual(lanes.steps[lane], steps_run, msg=message)
+            lane_error = lanes.errors[lane]
+            self.assertEqual(None if lane_error is None else (type(lane_error), lane_error.args), error, msg=message)
+
+    def test_random_programs(self):
+        rng = random.Random(2024)
+        for _ in range(100):
+            program = self.random_loop(rng)
+            inputs, memory = zip(*(self.random_inputs(rng) for _ in range(16)))
+            self.assertSameAsScalar(program, inputs, memory)
+
+    def test_steps(self):
+        rng = random.Random(7)
+        program = self.random_loop(rng)
+        inputs = [[1, 2, 3, 4, 5, 6, 512, 3]] * 4  # Lanes that never branch apart run one step at a time
+        for steps in (0, 1, 10, 25):
+            self.assertSameAsScalar(program, inputs, steps=steps)
+
+    def test_reconverge(self):
+        lanes = self.lanes(" CMP R0, #1\n BEQ one\n MOVS R1, #2\n B join\none\n MOVS R1, #1\njoin\n ADDS R1, R1, #1",
+                           [[0], [1], [0], [1]])
+        self.assertEqual(list(lanes.register('R1')), [3, 2, 3, 2])
+        self.assertEqual(list(lanes.steps), [5, 4, 5, 4])
+
+    def test_infinite_loop(self):
+        lanes = self.lanes(" CMP R0, #0\n BEQ done\n B .\ndone", [[0], [1]])
+        self.assertIsNone(lanes.errors[0])
+        self.assertIsInstance(lanes.errors[1], iarm.exceptions.EndOfProgram)
+        self.assertEqual((lanes.state(0)['R15'], lanes.state(1)['R15']), (4, 3))
+
+    def test_memory(self):
+        lanes = iarm.lanes.Lanes(" LDR R1, [R0, #0]\n ADDS R1, R1, #1\n STR R1, [R0, #4]", 3)
+        lanes.write_word(100, [10, 20, 30])
+        lanes.set_register('R0', 100)
+        lanes.run()
+        self.assertEqual(list(lanes.read_word(104)), [11, 21, 31])
+
+    def test_not_in_lanes(self):
+        with self.assertRaises(iarm.exceptions.NotImplementedError):
+            iarm.lanes.Lanes(" MRS R0, APSR", 2)
+
+    def test_run_vectors(self):
+        results = iarm.lanes.run_vectors(" ADDS R0, R0, R1\n STR R0, [R2, #0]",
+                                         [{'registers': {'R0': 1, 'R1': 2, 'R2': 16}},
+                                          {'registers': {'R0': 5, 'R1': 6, 'R2': 1024}}])
+        self.assertEqual(results[0].registers['R0'], 3)
+        self.assertEqual(results[0].memory, {16: 3})
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[1].steps, 2)
+        self.assertTrue(results[1].error.startswith('HardFault'))
@@ -0,0 +1,213 @@
+import os
+import random
+import tempfile
+import iarm.arm
+import iarm.assembler
+import iarm.exceptions
+import iarm.loader
+import test_flags
+
+
+class TestLoader(test_flags.FlagsTest):
+    """Loading an assembled program should give the program evaluating its source does"""
+    FORMS = """
+start ADCS R0, R0, R1
+ ADD R1, R1, R9
+ ADD SP, SP, #16
+ ADD R2, SP, #20
+ ADDS R0, R1, R2
+ ADDS R0, R1, #7
+ ADDS R3, R3, #200
+ ANDS R4, R4, R5
+ ASRS R0, R1, #32
+ ASRS R2, R2, R3
+ BICS R1, R1, R2
+ CMN R0, R7
+ CMP R0, R1
+ CMP R8, R1
+ CMP R5, #255
+ EORS R6, R6, R7
+ LDM R0!, {R1, R2, R7}
+ LDR R0, [R1, #124]
+ LDR R2, [R3, R4]
+ LDR R5, [SP, #1020]
+ LDRB R0, [R1, #31]
+ LDRH R0, [R1, R2]
+ LDRSB R3, [R4, R5]
+ LDRSH R3, [R4, R5]
+ LSLS R0, R1, #31
+ LSLS R0, R0, R2
+ LSRS R0, R1, #32
+ MOV R12, R0
+ MOV R14, R15
+ MOVS R7, #255
+ MOVS R1, R2
+ MRS R0, APSR
+ MSR APSR, R5
+ MULS R3, R4, R3
+ MVNS R0, R1
+ NOP
+ ORRS R0, R0, R1
+ POP {R0, R1, PC}
+ PUSH {R0, R7, LR}
+ REV R0, R1
+ REV16 R2, R3
+ REVSH R4, R5
+ RSBS R0, R1, #0
+ SBCS R2, R2, R3
+ STM R1!, {R0, R2}
+ STR R0, [SP, #4]
+ STRB R0, [R1, R2]
+ STRH R0, [R1, #2]
+ SUB SP, SP, #508
+ SUBS R0, R1, R2
+ SUBS R4, R4, #99
+ SXTB R0, R1
+ SXTH R0, R1
+ TST R0, R1
+ UXTB R0, R1
+ UXTH R0, R1
+ BKPT #5
+ BX R0
+ BLX LR
+back BEQ back
+ BNE start
+ BHI fwd
+ BLE fwd
+ B start
+ BL far
+fwd NOP
+far NOP
+"""
+
+    PROGRAM = """
+ MOVS R0, #0
+ MOVS R1, #10
+loop BL add
+ SUBS R1, R1, #1
+ BNE loop
+ LDR R2, =0x12345678
+ B done
+add PUSH {R4, LR}
+ MOVS R4, R1
+ ADDS R0, R0, R4
+ POP {R4, PC}
+done B .
+"""
+
+    def load(self, source, base=0):
+        image = iarm.assembler.assemble(source, base=base)
+        cpu = iarm.arm.Arm(1024, False)
+        iarm.loader.load(cpu, bytes(image.data), base, image.symbols, code=image.code)
+        return cpu, image
+
+    def test_table(self):
+        self.assertEqual(len(iarm.loader.TABLE), 1 << 16)
+        self.assertEqual(iarm.loader.TABLE[0x1881], ('instruction', 'ADDS', 'R1, R0, R2'))
+        self.assertEqual(iarm.loader.TABLE[0xE7FE], ('branch', 'B', -4))
+        self.assertEqual(iarm.loader.TABLE[0x4A02], ('literal', 'LDR', (2, 8)))
+        self.assertEqual(iarm.loader.TABLE[0xF000].kind, 'wide')
+        self.assertEqual(iarm.loader.TABLE[0xDE00].kind, 'undefined')
+        self.assertEqual(iarm.loader.decode_wide(0xF3EF, 0x8000), ('instruction', 'MRS', 'R0, APSR'))
+
+    def test_forms(self):
+        evaluated = iarm.arm.Arm(1024, False)
+        evaluated.evaluate(self.FORMS)
+        loaded, _ = self.load(self.FORMS)
+        self.assertEqual(len(loaded.program), len(evaluated.program))
+        for i, (expected, instruction) in enumerate(zip(evaluated.program, loaded.program)):
+            operands = instruction.operands
+            expected_operands = expected.operands
+            if expected.form == 'l':
+                # The labels are named after the addresses they are at, but are at the same index
+                operands = (loaded.labels.get(operands[0], operands[0]),)
+                expected_operands = (evaluated.labels.get(expected_operands[0], expected_operands[0]),)
+            self.assertEqual((instruction.op, instruction.form, operands),
+                             (expected.op, expected.form, expected_operands), msg=evaluated.source_text(i))
+
+    def test_run(self):
+        evaluated = iarm.arm.Arm(1024, False)
+        evaluated.evaluate(self.PROGRAM)
+        loaded, _ = self.load(self.PROGRAM)
+        for cpu in (evaluated, loaded):
+            with self.assertRaises(iarm.exceptions.EndOfProgram):
+                cpu.run()  # Both stop at the B .
+        self.assertEqual(dict(loaded.register.items()), dict(evaluated.register.items()))
+        self.assertEqual(loaded.register['R0'], 55)
+        self.assertEqual(loaded.steps_run, evaluated.steps_run)
+
+    def test_data_around_code(self):
+        # Only the code is decoded, so the data before it and the literal pool after it are never run
+        program = "table DCD 10\n DCD 20\nbuf SPACE 8\n LDR R4, =0x12345678\n MOVS R0, #7\n ADDS R0, R0, #1"
+        evaluated = iarm.arm.Arm(1024, False)
+        evaluated.evaluate(program)
+        loaded, image = self.load(program)
+        self.assertEqual(image.code, [(16, 22)])
+        self.assertEqual([instruction.op for instruction in loaded.program], ['LDR', 'MOVS', 'ADDS'])
+        for cpu in (evaluated, loaded):
+            cpu.run()
+        self.assertEqual((loaded.register['R0'], loaded.register['R4']), (8, 0x12345678))
+        self.assertEqual(dict(loaded.register.items()), dict(evaluated.register.items()))
+
+    def test_random_programs(self):
+        # Encodings shared by two instructions, like LSLS Ra, Rb, #0 and MOVS Ra, Rb, must run the same
+        rng = random.Random(9876)
+        for _ in range(100):
+            program = self.random_program(rng, 30)
+            values = [rng.choice((0, 1, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF, rng.getrandbits(32))) for _ in range(8)]
+            evaluated = self.interpreter(program, values)
+            loaded, _ = self.load(program)
+            for i, value in enumerate(values):
+                loaded.register['R{}'.format(i)] = value
+            evaluated.run()
+            loaded.run()
+            self.assertEqual(dict(loaded.register.items()), dict(evaluated.register.items()), msg=program)
+
+    def test_data(self):
+        cpu, image = self.load(" LDR R0, value\n ADR R1, value\n LDR R2, [R1, #4]\n B .\n"
+                               "value DCD 0xDEADBEEF\n DCD 7", base=64)
+        self.assertEqual(cpu.memory.read_word(image.symbols['value']), 0xDEADBEEF)
+        with self.assertRaises(iarm.exceptions.EndOfProgram):
+            cpu.run()
+        self.assertEqual([cpu.register[r] for r in ('R0', 'R1', 'R2')], [0xDEADBEEF, image.symbols['value'], 7])
+
+    def test_undefined(self):
+        # Without the code marked, the whole image is decoded
+        cpu = iarm.arm.Arm(1024, False)
+        iarm.loader.load(cpu, bytes(iarm.assembler.assemble(" MOVS R0, #1\n DCH 0xDE00").data))
+        with self.assertRaisesRegex(iarm.exceptions.HardFault, 'Undefined instruction 0xDE00'):
+            cpu.run()
+        self.assertEqual(cpu.register['R0'], 1)
+        svc = iarm.arm.Arm(1024, False)
+        iarm.loader.load(svc, b'\x01\xDF')  # SVC #1
+        with self.assertRaises(iarm.exceptions.NotImplementedError):
+            svc.run()
+        with self.assertRaises(iarm.exceptions.ValidationError):
+            iarm.loader.load(cpu, bytes(2000))
+
+    def test_load_file(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'program.bin')
+        iarm.assembler.assemble(self.PROGRAM).save(path)
+        cpu = iarm.arm.Arm(1024, False)
+        iarm.loader.load_file(cpu, path)
+        cpu.add_breakpoint('add')  # Named from the symbol map
+        with self.assertRaises(iarm.exceptions.BreakpointHit):
+            cpu.run()
+        self.assertEqual(cpu.register['R1'], 10)
+        self.assertEqual(iarm.loader.read_map("0x00000010 add\n"), {'add': 16})
+        self.assertIsNone(iarm.loader.read_code("0x00000010 add\n", 32))
+        self.assertEqual(iarm.loader.read_code("0x00000000 $d\n0x00000008 $t\n0x00000010 add\n0x00000014 $d\n", 32),
+                         [(8, 20)])
+
+    def test_load_file_data(self):
+        # The symbol map marks the code, so data before it isn't run
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'program.bin')
+        iarm.assembler.assemble("table DCD 10\n LDR R0, =table\n LDR R1, [R0, #0]").save(path)
+        cpu = iarm.arm.Arm(1024, False)
+        iarm.loader.load_file(cpu, path)
+        cpu.run()
+        self.assertEqual((cpu.register['R0'], cpu.register['R1']), (0, 10))
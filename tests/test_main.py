@@ -0,0 +1,67 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import iarm.__main__
+
+
+class TestMain(unittest.TestCase):
+    PROGRAM = """
+ MOVS R0, #5
+ MOVS R1, #100
+ STR R0, [R1, #0]
+"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'program.s')
+        with open(self.path, 'w') as f:
+            f.write(self.PROGRAM)
+
+    def main(self, *argv):
+        out = io.StringIO()
+        err = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            status = iarm.__main__.main(list(argv))
+        return status, out.getvalue(), err.getvalue()
+
+    def test_parse_dump(self):
+        self.assertEqual(iarm.__main__.parse_dump('regs'), (None, []))
+        self.assertEqual(iarm.__main__.parse_dump('R0, SP,mem:4-6'), (['R0', 'SP'], [4, 5, 6]))
+        self.assertEqual(iarm.__main__.parse_dump('R0,regs,mem:0x10'), (None, [16]))
+
+    def test_run(self):
+        status, out, err = self.main('run', self.path, '--dump', 'R0,mem:100-101')
+        self.assertEqual(status, 0)
+        self.assertEqual(out, "R0: 5\n100: 5\n101: 0\n")
+
+    def test_run_json(self):
+        status, out, err = self.main('run', self.path, '--steps', '1', '--json')
+        self.assertEqual(status, 0)
+        result = json.loads(out)
+        self.assertEqual(result['registers']['R0'], 5)
+        self.assertEqual(result['registers']['R1'], 0)
+        self.assertEqual(result['steps'], 1)
+        self.assertIsNone(result['error'])
+
+    def test_run_error(self):
+        with open(self.path, 'a') as f:
+            f.write(" B .\n")
+        status, out, err = self.main('run', self.path, '--dump', 'R0', '--json')
+        self.assertEqual(status, 1)
+        self.assertTrue(json.loads(out)['error'].startswith('EndOfProgram'))
+
+    def test_run_binary(self):
+        status, out, err = self.main('assemble', self.path)
+        self.assertEqual(status, 0)
+        binary = os.path.splitext(self.path)[0] + '.bin'
+        status, out, err = self.main('run', binary, '--binary', '--dump', 'R0,mem:100')
+        self.assertEqual(status, 0)
+        self.assertEqual(out, "R0: 5\n100: 5\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import iarm.arm
+import iarm.exceptions
+import iarm.profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.interp = iarm.arm.Arm(1024, False)
+        self.interp.evaluate("""
+ MOVS R0, #3
+loop SUBS R0, R0, #1
+ BNE loop
+ MOVS R1, #1
+""")
+        self.profiler = iarm.profiler.Profiler(self.interp)
+        self.interp.profiler = self.profiler
+
+    def test_counts(self):
+        self.assertEqual(self.interp.run(), 8)
+        self.assertEqual(self.profiler.counts, [1, 3, 3, 1])
+        self.assertTrue(all(t >= 0 for t in self.profiler.times))
+
+        lines = {line.index: line for line in self.profiler.lines()}
+        self.assertEqual(lines[1].op, 'SUBS')
+        self.assertEqual(lines[1].text, 'loop SUBS R0, R0, #1')
+        self.assertEqual(lines[1].count, 3)
+
+        ops = {op.op: op.count for op in self.profiler.ops()}
+        self.assertEqual(ops, {'MOVS': 2, 'SUBS': 3, 'BNE': 3})
+
+    def test_steps(self):
+        self.assertEqual(self.interp.run(2), 2)
+        self.assertEqual(self.profiler.counts, [1, 1, 0, 0])
+        self.assertEqual(self.interp.register['PC'], 3)
+
+    def test_same_results(self):
+        """Profiling must not change what a program does, even with compiled blocks"""
+        self.interp.compile_blocks = True
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 0)
+        self.assertEqual(self.interp.register['R1'], 1)
+        self.assertEqual(self.interp.compiler.blocks, {})
+
+    def test_exception(self):
+        self.interp.evaluate(" MOVS R2, #3\n LDR R3, [R2, #0]")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.interp.run()
+        self.assertEqual(self.profiler.counts[-1], 1)
+        self.assertEqual(self.interp.register['PC'], 6)
+
+    def test_report(self):
+        self.assertEqual(self.profiler.format_report(), "Nothing has been profiled")
+        self.interp.run()
+        report = self.profiler.format_report(limit=2)
+        self.assertEqual(len(report.splitlines()), 1 + 2 + 1 + 1 + 3)
+        self.assertIn('BNE', report)
+
+        self.profiler.clear()
+        self.assertEqual(self.profiler.lines(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+import iarm.arm
+import iarm.exceptions
+import iarm.tracer
+
+
+class TestTracer(unittest.TestCase):
+    PROGRAM = """
+ MOVS R0, #5
+ MOVS R1, #0
+loop ADDS R1, R1, R0
+ PUSH {R0, R1}
+ MOVS R0, #0
+ POP {R0, R2}
+ CMP R1, #9
+ SUBS R0, R0, #1
+ BNE loop
+ MOVS R3, #1
+"""
+
+    def interpreter(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(self.PROGRAM)
+        return interp
+
+    def expected_states(self):
+        """The state after each step, from stepping a second interpreter"""
+        interp = self.interpreter()
+        states = []
+        while interp.run(1):
+            state = {name: interp.register[name] for name in interp.register if name.startswith('R') or name == 'APSR'}
+            state.update(N=interp.register.n, Z=interp.register.z, C=interp.register.c, V=interp.register.v)
+            states.append(state)
+        return states
+
+    def assertStates(self, reader, expected):
+        for step in range(reader.first_step, reader.last_step + 1):
+            state = reader.state(step)
+            for name, value in expected[step].items():
+                self.assertEqual(state[name], value, msg='{} at step {}'.format(name, step))
+
+    def test_states(self):
+        interp = self.interpreter()
+        interp.tracer = iarm.tracer.Tracer(interp, 1000)
+        steps = interp.run()
+        expected = self.expected_states()
+        self.assertEqual(steps, len(expected))
+
+        reader = interp.tracer.reader()
+        self.assertEqual(reader.first_step, 0)
+        self.assertEqual(reader.last_step, steps - 1)
+        self.assertStates(reader, expected)
+        with self.assertRaises(IndexError):
+            reader.state(steps)
+
+    def test_records(self):
+        interp = self.interpreter()
+        interp.tracer = iarm.tracer.Tracer(interp, 1000)
+        interp.run(6)
+        records = list(interp.tracer.reader().records())
+        self.assertEqual([record.op for record in records], ['MOVS', 'MOVS', 'ADDS', 'PUSH', 'MOVS', 'POP'])
+        self.assertEqual([(r.step, r.index) for r in records[4:]], [(4, 4), (5, 5)])
+        self.assertEqual(interp.tracer.loads, [5, 5])  # Only the values read by the POP are kept
+
+    def test_changed_between_runs(self):
+        interp = self.interpreter()
+        interp.tracer = iarm.tracer.Tracer(interp, 1000)
+        interp.run(4)
+        interp.register['R1'] = 100
+        interp.run()
+        reader = interp.tracer.reader()
+        self.assertEqual(reader.state(3)['R1'], 5)
+        self.assertEqual(reader.state(4)['R1'], 100)
+        self.assertEqual(reader.state(reader.last_step)['R1'], interp.register['R1'])
+
+    def test_wrap_around(self):
+        interp = self.interpreter()
+        interp.tracer = iarm.tracer.Tracer(interp, 32)
+        for _ in range(10):
+            interp.run(4)  # Tracing carries on between runs
+        interp.run()
+        expected = self.expected_states()
+
+        reader = interp.tracer.reader()
+        self.assertEqual(reader.last_step, len(expected) - 1)
+        self.assertGreater(reader.first_step, 0)
+        self.assertLessEqual(len(reader), 32)
+        self.assertStates(reader, expected)
+
+    def test_exception(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(" MOVS R1, #3\n LDR R0, [R1, #0]")
+        interp.tracer = iarm.tracer.Tracer(interp, 10)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            interp.run()
+        self.assertEqual(interp.steps_run, 2)
+        self.assertEqual(interp.tracer.steps, 1)
+        self.assertEqual(interp.tracer.reader().last_step, 0)
+
+    def test_save(self):
+        interp = self.interpreter()
+        interp.tracer = iarm.tracer.Tracer(interp, 16)
+        interp.run()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.trace')
+            interp.tracer.save(path)
+            loaded = iarm.tracer.TraceReader.load(path, interp)
+        self.assertEqual(list(loaded.records()), list(interp.tracer.reader().records()))
+        self.assertStates(loaded, self.expected_states())
+
+
+if __name__ == '__main__':
+    unittest.main()